@@ -1,6 +1,5 @@
 from mesa import Agent
 import numpy as np
-import networkx as nx
 
 PARKING = 3
 INTERSECTION_ENTRY = 4
@@ -15,24 +14,37 @@ class TrafficManagerAgent(Agent):
         self.state = "RED"
         self.time_remaining = 0
         self.next_manager = None 
+        self.lights = []
 
     def set_next(self, manager_agent):
         self.next_manager = manager_agent
 
+    def add_light(self, light):
+        """Registra un semáforo ya colocado en la grilla"""
+        self.lights.append(light)
+        self.model.red_cells[light.pos] = self.state == "RED"
+
+    def set_state(self, state):
+        """Cambia de fase y actualiza el mapa de celdas en rojo del modelo"""
+        self.state = state
+        red = state == "RED"
+        for light in self.lights:
+            self.model.red_cells[light.pos] = red
+
     def activate(self):
-        self.state = "GREEN"
+        self.set_state("GREEN")
         self.time_remaining = self.green_time
 
     def step(self):
         if self.state == "GREEN":
             self.time_remaining -= 1
             if self.time_remaining <= 0:
-                self.state = "YELLOW"
+                self.set_state("YELLOW")
                 self.time_remaining = self.yellow_time
         elif self.state == "YELLOW":
             self.time_remaining -= 1
             if self.time_remaining <= 0:
-                self.state = "RED"
+                self.set_state("RED")
                 if self.next_manager:
                     self.next_manager.activate()
 
@@ -68,18 +80,25 @@ class VehicleAgent(Agent):
         self.destination = destination_node
         self.path = []
         self.state = "DRIVING"
+        self.spawn_step = model.step_count
+        self.arrival_step = None
+        self.blocked_steps = 0   # pasos sin avanzar por rojo u ocupación (can_move_to falso)
+        self.yield_steps = 0     # pasos cediendo en la entrada de una rotonda
+        self.reserved = None   # celda reservada en el paso actual (modo "reservation")
+        self.route_key = None  # (estacionamiento origen, destino)
 
     def is_in_roundabout(self):
         """Verifica si el vehículo está dentro de la rotonda"""
         return self.pos in self.model.roundabout_ring
 
     def count_vehicles_in_roundabout(self):
-        """Cuenta vehículos actualmente en la rotonda"""
-        count = 0
-        for agent in self.model.agents_list:
-            if isinstance(agent, VehicleAgent) and agent is not self:
-                if agent.state != "ARRIVED" and agent.pos in self.model.roundabout_ring:
-                    count += 1
+        """Cuenta vehículos actualmente en la rotonda (sin contarse a sí mismo)"""
+        rid = self.model.roundabout_id.get(self.pos)
+        if rid is None:
+            return 0
+        count = self.model.roundabout_counts[rid]
+        if self.is_in_roundabout():
+            count -= 1
         return count
 
     def should_yield_at_roundabout(self):
@@ -91,60 +110,84 @@ class VehicleAgent(Agent):
         if self.count_vehicles_in_roundabout() >= self.model.roundabout_capacity:
             return True
         
-        # Regla 2: Ceder a vehículos circulando dentro
-        for agent in self.model.agents_list:
-            if agent is self or not isinstance(agent, VehicleAgent):
-                continue
-            if agent.state == "ARRIVED":
-                continue
-            if agent.is_in_roundabout():
-                # Si el otro está cerca de mi entrada
-                if agent.path:
-                    dist = abs(agent.pos[0] - self.pos[0]) + abs(agent.pos[1] - self.pos[1])
-                    if dist <= 2:
-                        return True
+        # Regla 2: Ceder a vehículos circulando dentro cerca de mi entrada
+        occupied = self.model.roundabout_cells
+        for cell in self.model.roundabout_watch[self.pos]:
+            if cell in occupied:
+                return True
         return False
 
     def can_move_to(self, next_pos):
         """Verifica si puede moverse a la siguiente celda"""
         # 1. Verificar semáforos
-        cell_contents = self.model.grid.get_cell_list_contents([next_pos])
-        for agent in cell_contents:
-            if isinstance(agent, TrafficLightAgent) and agent.state == "RED":
-                return False
+        if self.model.red_cells[next_pos]:
+            return False
         
         # 2. Verificar si hay otro vehículo
-        for agent in cell_contents:
-            if isinstance(agent, VehicleAgent) and agent.state != "ARRIVED":
-                return False
+        if self.model.vehicle_occupancy[next_pos]:
+            return False
         
         return True
 
     def step(self):
+        if self.model.update == "reservation":
+            self.reserve()
+            return
         if self.state == "ARRIVED":
             return
         
         # ¿Llegamos al destino?
         if not self.path:
             self.state = "ARRIVED"
-            self.model.grid.remove_agent(self)
+            self.model.remove_vehicle(self)
             return
         
         next_pos = self.path[0]
         
         # Verificar yield en rotonda
         if self.should_yield_at_roundabout():
+            self.model.vehicles_yielding += 1
+            self.yield_steps += 1
             return
         
         # Verificar si podemos avanzar
         if not self.can_move_to(next_pos):
+            self.model.vehicles_blocked += 1
+            self.blocked_steps += 1
             return
         
         # Mover
-        self.model.grid.move_agent(self, next_pos)
+        self.advance(next_pos)
+
+    def reserve(self):
+        """Fase 1 del modo por reservas: solo lee el estado al inicio del paso"""
+        self.reserved = None
+        if self.state == "ARRIVED":
+            return
+        # Igual que step(): sin ruta restante el vehículo ya llegó
+        if not self.path:
+            self.state = "ARRIVED"
+            self.model.remove_vehicle(self)
+            return
+        next_pos = self.path[0]
+        if self.should_yield_at_roundabout():
+            self.model.vehicles_yielding += 1
+            self.yield_steps += 1
+        elif not self.can_move_to(next_pos):
+            self.model.vehicles_blocked += 1
+            self.blocked_steps += 1
+        else:
+            self.reserved = next_pos
+            self.model.reserve(self, next_pos)
+
+    def advance(self, next_pos=None):
+        """Aplica el movimiento a next_pos (por defecto, la celda reservada)"""
+        if next_pos is None:
+            next_pos = self.reserved
+        self.model.move_vehicle(self, next_pos)
         self.path.pop(0)
         
         # Verificar si llegamos
         if not self.path:
             self.state = "ARRIVED"
-            self.model.grid.remove_agent(self)
\ No newline at end of file
+            self.model.remove_vehicle(self)
@@ -1,19 +1,19 @@
 import solara
-import matplotlib.pyplot as plt
 import matplotlib.patches as patches
-from matplotlib.collections import PatchCollection
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.collections import PatchCollection, PolyCollection
+from matplotlib.colors import to_rgba
 from matplotlib.figure import Figure
 import numpy as np
 import time
 import asyncio
+import threading
 
 from model import TrafficModel, BUILDING, ROAD, ROUNDABOUT, PARKING
-from agents import VehicleAgent, TrafficLightAgent
+from city_cache import default_city
+from trajectory import LIGHT_CODES, TrajectoryReader
 
 # --- CONFIGURATION ---
-GRID_WIDTH = 25
-GRID_HEIGHT = 25
-
 COLOR_MAP = {
     BUILDING: "#4682B4",   # Steel Blue
     ROAD: "#D3D3D3",       # Light Gray
@@ -29,159 +29,338 @@ AGENT_COLORS = {
     "light_red": "#FF0000"
 }
 
-# --- PRE-LOAD ---
-static_model = TrafficModel(num_vehicles=0)
-CITY_LAYOUT = static_model.city_layout
-
 # --- STATE ---
 model_state = solara.reactive(None)
 current_step = solara.reactive(0)
 is_playing = solara.reactive(False)
 play_speed = solara.reactive(0.1) 
 num_vehicles_param = solara.reactive(5)
+steps_per_frame = solara.reactive(1)
+latest_frame = solara.reactive(None)   # (paso, snapshot) que se está mostrando
+replay = solara.reactive(None)         # TrajectoryReader en modo reproducción
+replay_path = solara.reactive("")
+replay_error = solara.reactive("")
+
+MAX_FPS = 20   # Tope de cuadros por segundo de la interfaz
+
+_worker = None
+
+
+class SimulationWorker:
+    """
+    Avanza el modelo en un hilo propio, independiente del dibujo.
+
+    En cada tick da steps_per_frame pasos y deja publicado el último snapshot;
+    la interfaz lo lee a su propio ritmo y se salta los pasos intermedios.
+    El lock protege al modelo: el snapshot se toma dentro, el dibujo se hace fuera.
+    """
+    def __init__(self, model):
+        self.model = model
+        self.lock = threading.Lock()
+        self.interval = play_speed.value      # segundos entre ticks
+        self.steps_per_tick = steps_per_frame.value
+        self._stop = threading.Event()
+        self._thread = None
+        self._publish()
+
+    def _publish(self):
+        self.frame = (self.model.step_count, CityRenderer.snapshot(self.model))
+
+    def advance(self, steps=1):
+        with self.lock:
+            for _ in range(steps):
+                self.model.step()
+            self._publish()
+        return self.frame
+
+    def _run(self):
+        while not self._stop.is_set():
+            t0 = time.perf_counter()
+            self.advance(self.steps_per_tick)
+            self._stop.wait(max(0.0, self.interval - (time.perf_counter() - t0)))
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        if self.running:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="traffic-sim", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+
+def show_frame(frame):
+    latest_frame.value = frame
+    current_step.value = frame[0]
 
 def initialize_model():
-    model_state.value = TrafficModel(num_vehicles=num_vehicles_param.value)
-    current_step.value = 0
+    global _worker
+    if _worker is not None:
+        _worker.stop()
+    # La ciudad compilada se carga de disco la primera vez y luego se reutiliza
+    model_state.value = TrafficModel(num_vehicles=num_vehicles_param.value, city=default_city())
+    _worker = SimulationWorker(model_state.value)
     is_playing.value = False
+    show_frame(_worker.frame)
 
 def step_model():
-    if model_state.value is not None:
-        model_state.value.step()
-        model_state.value = model_state.value 
-        current_step.value += 1
+    if replay.value is not None:
+        show_replay_frame(current_step.value + 1)
+    elif _worker is not None:
+        show_frame(_worker.advance(1))
 
-def create_city_visualization(model: TrafficModel) -> Figure:
-    fig, ax = plt.subplots(figsize=(10, 10))
-    
-    # 1. DRAW MAP
-    rects = []
-    colors = []
-    for x in range(GRID_WIDTH):
-        for y in range(GRID_HEIGHT):
-            cell_type = CITY_LAYOUT[x][y]
-            # CORRECCIÓN: Usar (x, y) directamente
-            rect = patches.Rectangle((x, y), 1, 1)
-            rects.append(rect)
-            colors.append(COLOR_MAP[cell_type])
-
-    collection = PatchCollection(rects, facecolors=colors, edgecolors='white', linewidths=0.5, zorder=0)
-    ax.add_collection(collection)
-    
-    # 2. DRAW PARKING
-    for pid, pos in model.parking_spots.items():
-        px, py = pos
-        border = patches.Rectangle((px, py), 1, 1, linewidth=2, edgecolor='black', facecolor='none', zorder=5)
-        ax.add_patch(border)
-        ax.text(px + 0.5, py + 0.5, "P", color='black', fontsize=10, ha='center', va='center', fontweight='bold', zorder=6)
-
-    # 3. DRAW AGENTS
-    vehicle_count = 0
-    
-    for agent in model.agents_list:
-        # --- NUEVA PROTECCIÓN ---
-        # Los TrafficManagerAgent no tienen posición física.
-        # Si intentamos leer agent.pos, daría error. Los saltamos.
-        if not hasattr(agent, "pos") or agent.pos is None:
-            continue
-        
-        # Mesa guarda posiciones como (float, float). Ej: (12.5, 3.5)
-        x, y = agent.pos
-        
-        if isinstance(agent, VehicleAgent):
-            vehicle_count += 1
-            color = AGENT_COLORS["moving"]
-            
-            # Centrar el círculo en la celda
-            circle = patches.Circle((x + 0.5, y + 0.5), radius=0.35, facecolor=color, edgecolor='white', linewidth=1, zorder=15)
-            ax.add_patch(circle)
-            
-        elif isinstance(agent, TrafficLightAgent):
-            if agent.state == "GREEN": c = AGENT_COLORS["light_green"]
-            elif agent.state == "YELLOW": c = AGENT_COLORS["light_yellow"]
-            else: c = AGENT_COLORS["light_red"]
-            
-            rect = patches.Rectangle(
-                (x, y), 
-                1.0, 1.0, 
-                facecolor=c, 
-                edgecolor='none', 
-                alpha=0.6, 
-                zorder=20
-            )
-            ax.add_patch(rect)
-
-    ax.set_aspect("equal")
-    ax.set_xlim(0, 25)
-    ax.set_ylim(0, 25)
-    ax.invert_yaxis()
-    
-    ax.set_xticks(np.arange(0.5, 25.5, 1))
-    ax.set_yticks(np.arange(0.5, 25.5, 1))
-    ax.set_xticklabels(range(25))
-    ax.set_yticklabels(range(25))
-    ax.tick_params(left=False, bottom=False, labeltop=True, labelbottom=False)
-    
-    ax.set_title(f"Step: {current_step.value} | Vehicles: {vehicle_count}", fontsize=14)
-    
-    return fig
+# --- REPRODUCCIÓN DE GRABACIONES (TrafficModel(record=...)) ---
+def show_replay_frame(i):
+    reader = replay.value
+    i = min(max(int(i), 0), len(reader) - 1)
+    show_frame((i, reader.frame(i)))
+
+def load_replay():
+    try:
+        reader = TrajectoryReader(replay_path.value)
+    except (OSError, ValueError, KeyError) as exc:
+        replay_error.value = f"No se pudo abrir la grabación: {exc}"
+        return
+    model = model_state.value
+    lights = [light.pos for light in model.traffic_lights]
+    if (reader.width, reader.height) != (model.grid.width, model.grid.height) or reader.light_positions != lights:
+        replay_error.value = "La grabación es de otra ciudad"
+        return
+    if len(reader) == 0:
+        replay_error.value = "La grabación está vacía"
+        return
+    replay_error.value = ""
+    is_playing.value = False
+    replay.value = reader
+    show_replay_frame(0)
+
+def exit_replay():
+    is_playing.value = False
+    replay.value = None
+    show_frame(_worker.frame)
+
+LIGHT_COLORS = np.array([to_rgba(AGENT_COLORS[k], alpha=0.6) for k in ("light_green", "light_yellow", "light_red")])
+
+# Fondos ya rasterizados, por ciudad (layout + estacionamientos)
+_BACKGROUNDS = {}
+_renderer = None
+
+
+def render_background(model):
+    """
+    Rasteriza una sola vez el mapa estático y los estacionamientos (borde y "P").
+    Devuelve un arreglo RGBA que se dibuja con imshow en cada cuadro.
+    """
+    width, height = model.grid.width, model.grid.height
+    layout = np.array(model.city_layout, dtype=np.int8)
+    key = (width, height, layout.tobytes(), tuple(sorted(model.parking_spots.values())))
+    if key in _BACKGROUNDS:
+        return _BACKGROUNDS[key]
+
+    px = min(16, max(2, 2000 // max(width, height)))   # píxeles por celda
+    dpi = 100
+    fig = Figure(figsize=(width * px / dpi, height * px / dpi), dpi=dpi)
+    canvas = FigureCanvasAgg(fig)
+    ax = fig.add_axes([0, 0, 1, 1])
+    ax.set_axis_off()
+    palette = np.array([to_rgba(COLOR_MAP[t]) for t in sorted(COLOR_MAP)])
+    ax.imshow(palette[layout.T], extent=(0, width, height, 0), interpolation="nearest")
+    if px >= 6:
+        ax.vlines(np.arange(width + 1), 0, height, colors="white", linewidths=0.5)
+        ax.hlines(np.arange(height + 1), 0, width, colors="white", linewidths=0.5)
+    borders = [patches.Rectangle((px_, py_), 1, 1) for px_, py_ in model.parking_spots.values()]
+    ax.add_collection(PatchCollection(borders, facecolor="none", edgecolor="black", linewidths=2))
+    if px >= 10:
+        for px_, py_ in model.parking_spots.values():
+            ax.text(px_ + 0.5, py_ + 0.5, "P", color="black", fontsize=10 * px / 16,
+                    ha="center", va="center", fontweight="bold")
+    ax.set_xlim(0, width)
+    ax.set_ylim(height, 0)
+    canvas.draw()
+    image = np.asarray(canvas.buffer_rgba()).copy()
+    _BACKGROUNDS[key] = image
+    return image
+
+
+class CityRenderer:
+    """
+    Figura persistente: el fondo es un raster cacheado y en cada cuadro solo se
+    actualizan dos colecciones (vehículos como scatter, semáforos como PolyCollection).
+    """
+    def __init__(self, model, figsize=(10, 10)):
+        self.width, self.height = model.grid.width, model.grid.height
+        self.layout = model.city_layout
+        self.fig = Figure(figsize=figsize)
+        FigureCanvasAgg(self.fig)
+        self.ax = self.fig.subplots()
+        ax = self.ax
+        ax.imshow(render_background(model), extent=(0, self.width, self.height, 0), zorder=0)
+
+        ax.set_aspect("equal")
+        ax.set_xlim(0, self.width)
+        ax.set_ylim(self.height, 0)
+        if max(self.width, self.height) <= 50:
+            ax.set_xticks(np.arange(0.5, self.width + 0.5, 1))
+            ax.set_yticks(np.arange(0.5, self.height + 0.5, 1))
+            ax.set_xticklabels(range(self.width))
+            ax.set_yticklabels(range(self.height))
+            ax.tick_params(left=False, bottom=False, labeltop=True, labelbottom=False)
+        else:
+            ax.set_xticks([])
+            ax.set_yticks([])
+
+        # Tamaño del marcador: círculo de radio 0.35 celdas, en puntos^2
+        cell_pt = ax.get_position().width * figsize[0] * 72 / self.width
+        self.vehicles = ax.scatter([], [], s=(0.7 * cell_pt) ** 2, c=AGENT_COLORS["moving"],
+                                   edgecolors="white", linewidths=1, zorder=15)
+
+        light_xy = np.array([light.pos for light in model.traffic_lights], dtype=float).reshape(-1, 2)
+        square = np.array([[0, 0], [1, 0], [1, 1], [0, 1]], dtype=float)
+        self.lights = PolyCollection(light_xy[:, None, :] + square[None, :, :],
+                                     edgecolors="none", zorder=20)
+        ax.add_collection(self.lights)
+        self.title = ax.set_title("", fontsize=14)
+
+    def matches(self, model):
+        return model.city_layout is self.layout
+
+    @staticmethod
+    def snapshot(model):
+        """Estado dinámico mínimo para dibujar: celdas de vehículos y códigos de semáforo"""
+        vehicles = model.vehicle_positions()
+        lights = np.array([LIGHT_CODES.get(light.state, 2) for light in model.traffic_lights], dtype=np.int8)
+        return vehicles, lights
+
+    def draw(self, snapshot, step):
+        vehicles, lights = snapshot
+        self.vehicles.set_offsets(vehicles + 0.5 if len(vehicles) else np.empty((0, 2)))
+        self.lights.set_facecolors(LIGHT_COLORS[lights])
+        self.title.set_text(f"Step: {step} | Vehicles: {len(vehicles)}")
+        return self.fig
+
+
+def get_renderer(model):
+    """Reutiliza la figura mientras la ciudad no cambie"""
+    global _renderer
+    if _renderer is None or not _renderer.matches(model):
+        _renderer = CityRenderer(model)
+    return _renderer
+
+
+def create_city_visualization(model: TrafficModel, frame=None) -> Figure:
+    """Dibuja frame (paso, snapshot) o, si no se da, el estado actual del modelo"""
+    renderer = get_renderer(model)
+    if frame is None:
+        frame = (model.step_count, renderer.snapshot(model))
+    step, snapshot = frame
+    return renderer.draw(snapshot, step)
 
 @solara.component
 def StatisticsPanel():
     if model_state.value is None: return
-    vehicles = [a for a in model_state.value.agents_list if isinstance(a, VehicleAgent)]
-    total = len(vehicles)
-    stopped = 0
+    model = model_state.value   # Solo contadores del modelo, sin recorrer agentes
     
     with solara.Card("Live Statistics"):
         solara.Markdown(f"**Step:** {current_step.value}")
-        solara.Markdown(f"**Vehicles:** {total}")
+        if replay.value is not None:
+            solara.Markdown(f"**Vehicles:** {len(latest_frame.value[1][0])}")
+            return
+        solara.Markdown(f"**Vehicles:** {model.vehicles_active}")
+        solara.Markdown(f"**Arrived:** {model.vehicles_arrived} / {model.vehicles_spawned}")
+        solara.Markdown(f"**Stopped:** {model.vehicles_blocked + model.vehicles_yielding} "
+                        f"({model.vehicles_yielding} yielding)")
+
+@solara.component
+def ReplayPanel():
+    with solara.Card("Replay"):
+        if replay.value is None:
+            solara.InputText("Recording directory", value=replay_path)
+            solara.Button("📂 Load recording", on_click=load_replay, disabled=not replay_path.value, block=True)
+        else:
+            solara.SliderInt("Frame", value=current_step.value, min=0, max=len(replay.value) - 1,
+                             on_value=show_replay_frame)
+            solara.Button("⏹️ Back to live", on_click=exit_replay, block=True)
+        if replay_error.value:
+            solara.Error(replay_error.value)
 
 @solara.component
 def TrafficSimulation():
     if model_state.value is None:
         initialize_model()
 
+    # Los controles se leen en cada tick del hilo, sin reiniciarlo
+    if _worker is not None:
+        _worker.interval = play_speed.value
+        _worker.steps_per_tick = steps_per_frame.value
+
     # Definimos el efecto de forma SÍNCRONA
     def run_loop_effect():
-        # Definimos la lógica asíncrona dentro
+        # Reproducción: avanzar por la grabación, sin simular
+        async def replay_logic():
+            while is_playing.value:
+                nxt = current_step.value + steps_per_frame.value
+                show_replay_frame(nxt)
+                if nxt >= len(replay.value) - 1:
+                    is_playing.value = False
+                    break
+                await asyncio.sleep(max(play_speed.value, 1 / MAX_FPS))
+
+        # La simulación corre en el hilo; aquí solo se muestrea a MAX_FPS
         async def loop_logic():
             while is_playing.value:
-                step_model()
-                await asyncio.sleep(play_speed.value)
+                frame = _worker.frame
+                if frame[0] != current_step.value:
+                    show_frame(frame)
+                await asyncio.sleep(1 / MAX_FPS)
+
+        if is_playing.value and replay.value is not None:
+            task = asyncio.create_task(replay_logic())
+            return task.cancel
 
-        # Si está reproduciendo, creamos la tarea en segundo plano
+        # Si está reproduciendo, arrancamos el hilo y el muestreo
         if is_playing.value:
+            _worker.start()
             task = asyncio.create_task(loop_logic())
             
-            # Devolvemos una función de limpieza para cancelar la tarea
+            # Devolvemos una función de limpieza para detener ambos
             def cleanup():
                 task.cancel()
+                _worker.stop()
+                show_frame(_worker.frame)
             return cleanup
             
         return None 
 
     # Pasamos la función síncrona al use_effect
-    solara.use_effect(run_loop_effect, [is_playing.value])
+    solara.use_effect(run_loop_effect, [is_playing.value, replay.value])
 
     with solara.Sidebar():
         solara.Markdown("## 🎮 Controls")
-        solara.Button("🔄 Reset", color="primary", on_click=initialize_model, block=True)
+        solara.Button("🔄 Reset", color="primary", on_click=initialize_model, disabled=replay.value is not None, block=True)
         if is_playing.value:
             solara.Button("⏸️ Pause", color="warning", on_click=lambda: is_playing.set(False), block=True)
         else:
             solara.Button("▶️ Play", color="success", on_click=lambda: is_playing.set(True), block=True)
         solara.Button("⏭️ Step +1", color="info", on_click=step_model, disabled=is_playing.value, block=True)
-        solara.SliderFloat("Speed", value=play_speed, min=0.01, max=1.0, step=0.05)
+        solara.SliderFloat("Speed", value=play_speed, min=0.0, max=1.0, step=0.05)
+        solara.SliderInt("Steps per frame", value=steps_per_frame, min=1, max=50)
         solara.SliderInt("Vehicles", value=num_vehicles_param, min=1, max=400)
+        ReplayPanel()
         StatisticsPanel()
 
     with solara.Column(style={"padding": "20px", "align-items": "center"}):
         solara.Markdown("# 🚦 Traffic Jam Simulation")
         if model_state.value is not None:
-            fig = create_city_visualization(model_state.value)
+            fig = create_city_visualization(model_state.value, latest_frame.value)
             solara.FigureMatplotlib(fig, dependencies=[current_step.value])
-            plt.close(fig)
 
 @solara.component
 def Page():
@@ -0,0 +1,126 @@
+"""
+Barrido de parámetros de TrafficModel sin interfaz gráfica.
+
+Cada combinación (num_vehicles, spawn_cooldown, roundabout_capacity, green_time, seed)
+se corre en un proceso del pool y su resumen se escribe al archivo de salida
+en cuanto termina (JSONL o CSV según la extensión).
+
+Ejemplo:
+    python batch_run.py --vehicles 100 400 --cooldown 10 30 --capacity 2 4 \\
+        --green 20 40 --seeds 0 1 2 --out sweep.jsonl
+"""
+import argparse
+import csv
+import itertools
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from city_cache import default_city
+from model import TrafficModel
+
+SWEEP_PARAMS = ("num_vehicles", "spawn_cooldown", "roundabout_capacity", "green_time")
+
+SUMMARY_FIELDS = SWEEP_PARAMS + (
+    "seed", "engine", "steps", "completion_step", "vehicles_spawned",
+    "vehicles_arrived", "throughput", "mean_travel_time", "elapsed_s",
+)
+
+
+def parameter_grid(num_vehicles, spawn_cooldown, roundabout_capacity, green_time, seeds):
+    """Producto cartesiano de los valores a barrer, una dict de kwargs por corrida"""
+    for values in itertools.product(num_vehicles, spawn_cooldown, roundabout_capacity, green_time, seeds):
+        params = dict(zip(SWEEP_PARAMS, values[:-1]))
+        params["seed"] = values[-1]
+        yield params
+
+
+def run_once(params, max_steps=5000, engine="agents"):
+    """
+    Corre un modelo hasta que todos los vehículos lleguen o se alcance max_steps.
+    Devuelve un resumen plano (apto para JSONL/CSV).
+    """
+    start = time.perf_counter()
+    model = TrafficModel(engine=engine, city=default_city(), **params)
+    completion_step = None
+    while model.step_count < max_steps:
+        model.step()
+        if model.is_finished():
+            completion_step = model.last_arrival_step
+            break
+    arrived = model.vehicles_arrived
+    summary = dict(params)
+    summary.update({
+        "engine": engine,
+        "steps": model.step_count,
+        "completion_step": completion_step,
+        "vehicles_spawned": model.vehicles_spawned,
+        "vehicles_arrived": arrived,
+        "throughput": arrived / model.step_count if model.step_count else 0.0,
+        "mean_travel_time": model.total_travel_time / arrived if arrived else None,
+        "elapsed_s": time.perf_counter() - start,
+    })
+    return summary
+
+
+class _SummaryWriter:
+    """Escribe resúmenes uno por uno y hace flush para poder seguir el archivo en vivo"""
+    def __init__(self, path):
+        self.file = open(path, "w", newline="")
+        self.csv = None
+        if path.endswith(".csv"):
+            self.csv = csv.DictWriter(self.file, fieldnames=SUMMARY_FIELDS)
+            self.csv.writeheader()
+
+    def write(self, summary):
+        if self.csv is not None:
+            self.csv.writerow(summary)
+        else:
+            self.file.write(json.dumps(summary) + "\n")
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+def run_sweep(grid, out_path, max_steps=5000, engine="agents", processes=None):
+    """
+    Corre todas las combinaciones de grid en un pool de procesos.
+    Devuelve cuántas corridas se escribieron en out_path.
+    """
+    grid = list(grid)
+    default_city()  # Compila el artefacto antes de repartir trabajo a los procesos
+    writer = _SummaryWriter(out_path)
+    done = 0
+    try:
+        with ProcessPoolExecutor(max_workers=processes) as pool:
+            futures = [pool.submit(run_once, params, max_steps, engine) for params in grid]
+            for future in as_completed(futures):
+                writer.write(future.result())
+                done += 1
+                print(f"[{done}/{len(grid)}] corridas terminadas", flush=True)
+    finally:
+        writer.close()
+    return done
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Barrido de parámetros de TrafficModel")
+    parser.add_argument("--vehicles", type=int, nargs="+", default=[400])
+    parser.add_argument("--cooldown", type=int, nargs="+", default=[30])
+    parser.add_argument("--capacity", type=int, nargs="+", default=[4])
+    parser.add_argument("--green", type=int, nargs="+", default=[40])
+    parser.add_argument("--seeds", type=int, nargs="+", default=[0])
+    parser.add_argument("--max-steps", type=int, default=5000)
+    parser.add_argument("--engine", choices=("agents", "batch"), default="agents")
+    parser.add_argument("--processes", type=int, default=os.cpu_count())
+    parser.add_argument("--out", default="sweep.jsonl", help="archivo .jsonl o .csv")
+    args = parser.parse_args(argv)
+
+    grid = parameter_grid(args.vehicles, args.cooldown, args.capacity, args.green, args.seeds)
+    run_sweep(grid, args.out, max_steps=args.max_steps, engine=args.engine, processes=args.processes)
+
+
+if __name__ == "__main__":
+    main()
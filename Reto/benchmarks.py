@@ -0,0 +1,289 @@
+"""
+Benchmarks reproducibles de las rutas críticas del modelo de tráfico.
+
+Todas las corridas usan semillas fijas y escriben un JSON con los resultados,
+para comparar dos revisiones:
+
+    python benchmarks.py --out base.json
+    python benchmarks.py --out nuevo.json
+    python benchmarks.py --compare base.json nuevo.json
+
+"steps" corre el mapa por defecto (cuyos 17 estacionamientos con cooldown limitan la
+flota viva a unas decenas de coches); "fleet_steps" y los micro-benchmarks usan
+ciudades generadas con estacionamientos y cooldown suficientes para que la flota
+viva llegue al tamaño pedido. Cada corrida reporta el máximo de vehículos activos.
+"""
+import argparse
+import json
+import math
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from functools import lru_cache
+
+from city import generate_city
+from model import TrafficModel
+
+SEED = 1234
+FLEET_COOLDOWN = 1
+
+
+def _timed(fn, repeats):
+    """Corre fn repeats veces; devuelve la lista de tiempos en segundos"""
+    times = []
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    return times
+
+
+def _result(name, times, ops=1, **params):
+    best = min(times)
+    return {
+        "name": name,
+        "params": params,
+        "repeats": len(times),
+        "ops": ops,
+        "best_s": best,
+        "median_s": statistics.median(times),
+        "per_op_us": 1e6 * best / ops,
+    }
+
+
+def _warm_model(num_vehicles, steps, engine="agents"):
+    model = TrafficModel(num_vehicles=num_vehicles, engine=engine, seed=SEED)
+    for _ in range(steps):
+        model.step()
+    return model
+
+
+@lru_cache(maxsize=None)
+def fleet_city(num_vehicles):
+    """
+    Ciudad generada donde caben num_vehicles en circulación: ~7 celdas de ciudad por
+    vehículo y un estacionamiento cada 20, así que con FLEET_COOLDOWN la flota
+    completa sale en unas decenas de pasos. Las rutas se precalculan una vez
+    (fuera de las mediciones) y se comparten entre repeticiones y motores.
+    """
+    side = max(50, math.ceil(math.sqrt(7 * num_vehicles)))
+    blocks = (side // 6) ** 2
+    city = generate_city(side, side, block_size=4, roundabouts=max(1, side // 50),
+                         parking_density=min(1.0, num_vehicles / 20 / blocks), seed=SEED)
+    model = TrafficModel(num_vehicles=0, city=city, seed=SEED)
+    ids = model.parking_ids
+    for start_id in ids:
+        model.get_route(start_id, ids[1] if start_id == ids[0] else ids[0])   # rutas de todo el origen
+    city.routes = model.route_table
+    return city
+
+
+def _fleet_model(num_vehicles, engine="agents"):
+    return TrafficModel(num_vehicles=num_vehicles, engine=engine, seed=SEED,
+                        spawn_cooldown=FLEET_COOLDOWN, city=fleet_city(num_vehicles))
+
+
+def _run_steps(name, make_model, repeats, steps, **params):
+    """Mide steps pasos desde un modelo nuevo; agrega vehículos generados y máximo activo"""
+    times = []
+    for _ in range(repeats):
+        model = make_model()
+        peak = model.vehicles_active
+        t0 = time.perf_counter()
+        for _ in range(steps):
+            model.step()
+            peak = max(peak, model.vehicles_active)
+        times.append(time.perf_counter() - t0)
+    res = _result(name, times, ops=steps, steps=steps, **params)
+    res["steps_per_s"] = steps / res["best_s"]
+    res["spawned"] = model.vehicles_spawned
+    res["peak_active"] = peak
+    return res
+
+
+def bench_construction(repeats):
+    times = _timed(lambda: TrafficModel(num_vehicles=0, seed=SEED), repeats)
+    return [_result("construction", times)]
+
+
+def bench_spawn(repeats):
+    times = []
+    for _ in range(repeats):
+        model = TrafficModel(num_vehicles=0, seed=SEED)
+        model.num_vehicles = len(model.parking_spots)
+        t0 = time.perf_counter()
+        model.spawn_vehicles()
+        times.append(time.perf_counter() - t0)
+    return [_result("spawn_vehicles", times, ops=len(model.parking_spots))]
+
+
+def bench_steps(repeats, vehicle_counts, steps, engines):
+    """Pasos por segundo en el mapa por defecto"""
+    return [_run_steps("steps", lambda: TrafficModel(num_vehicles=n, engine=engine, seed=SEED),
+                       repeats, steps, num_vehicles=n, engine=engine)
+            for engine in engines for n in vehicle_counts]
+
+
+def bench_fleet_steps(repeats, fleet_sizes, steps, engines):
+    """Pasos por segundo con flotas grandes en ciudades generadas (ver fleet_city)"""
+    return [_run_steps("fleet_steps", lambda: _fleet_model(n, engine),
+                       repeats, steps, num_vehicles=n, engine=engine)
+            for engine in engines for n in fleet_sizes]
+
+
+def bench_vehicle_checks(repeats, fleet_sizes, ops=20000):
+    """
+    Micro-benchmarks de can_move_to y should_yield_at_roundabout sobre flotas en marcha:
+    la de 400 vehículos del mapa por defecto y las de fleet_sizes ya desplegadas
+    """
+    models = [("default", _warm_model(400, 300))]
+    for n in fleet_sizes:
+        model = _fleet_model(n)
+        while model.vehicles_spawned < n:
+            model.step()
+        models.append((f"fleet_{n}", model))
+
+    results = []
+    for city, model in models:
+        vehicles = [v for v in model.vehicles if v.path]
+        if not vehicles:
+            continue
+        targets = [(v, v.path[0]) for v in vehicles]
+        inner = max(1, ops // len(vehicles))
+
+        def run_can_move():
+            for _ in range(inner):
+                for v, pos in targets:
+                    v.can_move_to(pos)
+
+        def run_yield():
+            for _ in range(inner):
+                for v in vehicles:
+                    v.should_yield_at_roundabout()
+
+        n_ops = inner * len(vehicles)
+        results.append(_result("can_move_to", _timed(run_can_move, repeats), ops=n_ops,
+                               city=city, vehicles=len(vehicles)))
+        results.append(_result("should_yield_at_roundabout", _timed(run_yield, repeats), ops=n_ops,
+                               city=city, vehicles=len(vehicles)))
+    return results
+
+
+def bench_render(repeats):
+    """
+    Cuadro en caliente (figura y raster de fondo ya cacheados: solo se actualizan
+    vehículos y semáforos) y primer cuadro en frío (arma el raster y la figura)
+    """
+    try:
+        import matplotlib
+        matplotlib.use("Agg")
+        import app
+    except ImportError as exc:
+        return [{"name": "create_city_visualization", "skipped": str(exc)}]
+    model = _warm_model(400, 300)
+
+    def render():
+        app.create_city_visualization(model).canvas.draw()
+
+    def render_cold():
+        app._renderer = None
+        render()
+
+    cold = _timed(render_cold, repeats)
+    render()   # el caché queda armado fuera de la medición en caliente
+    return [_result("create_city_visualization", _timed(render, repeats), frame="warm"),
+            _result("create_city_visualization", cold, frame="cold")]
+
+
+def _git_revision():
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True)
+        return out.stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_all(repeats=5, vehicle_counts=(5, 50, 400), steps=500, engines=("agents", "batch"), only=None,
+            fleet_sizes=(2000, 5000), fleet_steps=200):
+    suites = {
+        "construction": lambda: bench_construction(repeats),
+        "spawn": lambda: bench_spawn(repeats),
+        "steps": lambda: bench_steps(repeats, vehicle_counts, steps, engines),
+        "fleet": lambda: bench_fleet_steps(repeats, fleet_sizes, fleet_steps, engines),
+        "checks": lambda: bench_vehicle_checks(repeats, fleet_sizes),
+        "render": lambda: bench_render(repeats),
+    }
+    results = []
+    for name, suite in suites.items():
+        if only and name not in only:
+            continue
+        results.extend(suite())
+    return {
+        "meta": {
+            "revision": _git_revision(),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "seed": SEED,
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "results": results,
+    }
+
+
+def _key(res):
+    return (res["name"], json.dumps(res.get("params", {}), sort_keys=True))
+
+
+def compare(base_path, new_path):
+    """Imprime la razón nuevo/base del mejor tiempo por benchmark (y los activos máximos base/nuevo)"""
+    with open(base_path) as f:
+        base = {_key(r): r for r in json.load(f)["results"] if "best_s" in r}
+    with open(new_path) as f:
+        new = [r for r in json.load(f)["results"] if "best_s" in r]
+    print(f"{'benchmark':<58} {'base us/op':>12} {'nuevo us/op':>12} {'razón':>8} {'activos':>12}")
+    for res in new:
+        old = base.get(_key(res))
+        label = res["name"] + (" " + " ".join(f"{k}={v}" for k, v in res["params"].items()) if res["params"] else "")
+        peak = str(res.get("peak_active", ""))
+        if old is None:
+            print(f"{label:<58} {'-':>12} {res['per_op_us']:>12.2f} {'-':>8} {peak:>12}")
+            continue
+        ratio = res["best_s"] / old["best_s"]
+        if "peak_active" in old:
+            peak = f"{old['peak_active']}/{peak}"
+        print(f"{label:<58} {old['per_op_us']:>12.2f} {res['per_op_us']:>12.2f} {ratio:>7.2f}x {peak:>12}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks del modelo de tráfico")
+    parser.add_argument("--out", default="bench.json")
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--steps", type=int, default=500)
+    parser.add_argument("--vehicles", type=int, nargs="+", default=[5, 50, 400])
+    parser.add_argument("--fleet", type=int, nargs="+", default=[2000, 5000],
+                        help="tamaños de flota en ciudades generadas (fleet y checks)")
+    parser.add_argument("--fleet-steps", type=int, default=200)
+    parser.add_argument("--engines", nargs="+", default=["agents", "batch"])
+    parser.add_argument("--only", nargs="+", help="construction spawn steps fleet checks render")
+    parser.add_argument("--compare", nargs=2, metavar=("BASE", "NUEVO"))
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        compare(*args.compare)
+        return
+    report = run_all(args.repeats, args.vehicles, args.steps, args.engines, args.only,
+                     args.fleet, args.fleet_steps)
+    with open(args.out, "w") as f:
+        json.dump(report, f, indent=2)
+    for res in report["results"]:
+        if "skipped" in res:
+            print(f"{res['name']}: omitido ({res['skipped']})")
+        else:
+            peak = f" (máx. activos {res['peak_active']})" if "peak_active" in res else ""
+            print(f"{res['name']} {res['params']}: {res['per_op_us']:.2f} us/op{peak}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,206 @@
+"""
+Checkpoints de TrafficModel para arrancar experimentos desde un estado ya calentado.
+
+save_checkpoint(model, path) guarda en un solo archivo binario (pickle comprimido con
+zlib) todo lo que cambia durante la corrida: vehículos con su ruta restante,
+parking_schedule, fase y temporizador de cada gestor, estado de ambos RNG,
+contadores, series, estadísticas de viaje y, con reroute, costos y cache del router. El mapa no se guarda: al restaurar se pasa la misma ciudad
+(se verifica con una huella del layout).
+
+load_checkpoint(path, city=None, **overrides) construye un modelo nuevo en ese estado;
+overrides cambia parámetros para ramas what-if (green_time, roundabout_capacity,
+spawn_cooldown, num_vehicles, ...). Con seed en overrides se resiembra en lugar
+de restaurar el RNG.
+"""
+import hashlib
+import pickle
+import zlib
+
+import numpy as np
+
+from engine import FLEET_ARRAYS
+from trajectory import TrajectoryRecorder
+
+MAGIC = b"TRAFFICCKPT"
+CHECKPOINT_VERSION = 5
+
+# Parámetros del constructor que se guardan y se pueden cambiar al restaurar
+PARAMS = ("num_vehicles", "spawn_cooldown", "roundabout_capacity", "green_time", "update", "reroute")
+# Estado de CongestionRouter que cambia durante la corrida
+ROUTER_STATE = ("dwell", "last_waits", "cost_level", "cost", "cache", "cache_cells", "reroutes")
+
+
+def layout_digest(model):
+    layout = np.array(model.city_layout, dtype=np.int8)
+    return hashlib.sha1(layout.tobytes() + repr(sorted(model.parking_spots.items())).encode()).hexdigest()
+
+
+def _capture(model):
+    if model.engine_name == "sharded":
+        raise ValueError('engine="sharded" no admite checkpoints; use "agents" o "batch"')
+    state = {
+        "version": CHECKPOINT_VERSION,
+        "engine": model.engine_name,
+        "layout": layout_digest(model),
+        "params": {name: getattr(model, name) for name in PARAMS},
+        "counters": {name: getattr(model, name) for name in (
+            "step_count", "vehicles_spawned", "vehicles_active", "vehicles_arrived",
+            "total_travel_time", "last_arrival_step", "vehicles_blocked", "vehicles_yielding")},
+        "parking_schedule": dict(model.parking_schedule),
+        "managers": [(m.state, m.time_remaining) for m in model.managers],
+        "random": model.random.getstate(),
+        "rng": model.rng.bit_generator.state,
+        "datacollector": model.datacollector,
+        "demand": model.demand,
+        "trip_stats": model.trip_stats,
+        "router": None if model.router is None else {name: getattr(model.router, name) for name in ROUTER_STATE},
+    }
+    engine = model.engine
+    if engine is None:
+        state["vehicles"] = [
+            (v.vehicle_id, v.pos, v.spawn_step, v.route_key, list(v.path), v.blocked_steps, v.yield_steps)
+            for v in model.vehicles]
+    else:
+        # Arreglos de la flota tal cual: mismo orden de slots
+        state["fleet"] = {name: getattr(engine, name).copy() for name in FLEET_ARRAYS}
+        state["fleet"].update({
+            "route_cells": engine.route_cells[:engine.route_size].copy(),
+            "route_offsets": dict(engine.route_offsets),
+            "route_keys": dict(engine.route_keys),
+            "free_slots": list(engine.free_slots),
+            "num_active": engine.num_active,
+        })
+    return state
+
+
+def _unpicklable(name, value):
+    """Nombre con puntos del primer campo de value que pickle no puede guardar (o None)"""
+    try:
+        pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        return None
+    except (pickle.PicklingError, AttributeError, TypeError):
+        pass
+    fields = value.items() if isinstance(value, dict) else vars(value).items() if hasattr(value, "__dict__") else ()
+    for field, item in fields:
+        found = _unpicklable(f"{name}.{field}", item)
+        if found is not None:
+            return found
+    return name
+
+
+def save_checkpoint(model, path):
+    """
+    Escribe el estado dinámico de model en path. ValueError si algún campo no se puede
+    guardar (p. ej. un profile de DemandModel que es lambda o closure)
+    """
+    state = _capture(model)
+    try:
+        data = pickle.dumps(state, protocol=pickle.HIGHEST_PROTOCOL)
+    except (pickle.PicklingError, AttributeError, TypeError) as exc:
+        field = next(filter(None, (_unpicklable(name, value) for name, value in state.items())), "?")
+        raise ValueError(f"no se puede guardar {field} en el checkpoint ({exc}); "
+                         "use una función definida a nivel de módulo") from exc
+    payload = zlib.compress(data, 6)
+    with open(path, "wb") as f:
+        f.write(MAGIC)
+        f.write(payload)
+    return path
+
+
+def read_checkpoint(path):
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path}: no es un checkpoint de TrafficModel")
+        state = pickle.loads(zlib.decompress(f.read()))
+    if state["version"] != CHECKPOINT_VERSION:
+        raise ValueError(f"{path}: versión {state['version']}, se esperaba {CHECKPOINT_VERSION}")
+    return state
+
+
+def load_checkpoint(path, city=None, **overrides):
+    """
+    Modelo nuevo en el estado guardado en path. city debe ser la misma ciudad de la
+    corrida original (None para el mapa por defecto); engine, si se pasa, debe ser el
+    mismo de la corrida original.
+    """
+    from model import TrafficModel
+    state = read_checkpoint(path)
+    params = dict(state["params"])
+    reseed = "seed" in overrides
+    params.update(overrides)
+    num_vehicles = params.pop("num_vehicles")
+    record = params.pop("record", None)   # La grabación empieza en el paso del checkpoint
+    # Vehículos y flota se guardan en formatos distintos: no se cambia de motor al restaurar
+    engine = params.pop("engine", state["engine"])
+    if engine != state["engine"]:
+        raise ValueError(f'{path}: el checkpoint es de engine="{state["engine"]}", no se puede restaurar con engine="{engine}"')
+    model = TrafficModel(num_vehicles=0, engine=engine, city=city, **params)
+    if layout_digest(model) != state["layout"]:
+        raise ValueError(f"{path}: el checkpoint es de otra ciudad")
+    model.num_vehicles = num_vehicles
+
+    for name, value in state["counters"].items():
+        setattr(model, name, value)
+    model.parking_schedule = dict(state["parking_schedule"])
+    model.spawner = type(model.spawner)(model.parking_ids, model.spawn_cooldown, model.parking_schedule)
+    model.demand = state["demand"] if "demand" not in overrides else overrides["demand"]
+    model.trip_stats = state["trip_stats"]
+    # Con otro series_maxlen se copian los últimos pasos guardados que caben
+    series = state["datacollector"]
+    maxlen = model.datacollector.maxlen
+    model.datacollector = series if series.maxlen == maxlen else series.resized(maxlen)
+
+    # Con reroute activado solo al restaurar, el router arranca sin historial
+    if model.router is not None and state["router"] is not None:
+        for name, value in state["router"].items():
+            setattr(model.router, name, value)
+
+    for manager, (phase, remaining) in zip(model.managers, state["managers"]):
+        manager.set_state(phase)
+        manager.time_remaining = remaining
+
+    if model.engine is None:
+        _restore_agents(model, state["vehicles"])
+    else:
+        _restore_fleet(model, state["fleet"])
+
+    if not reseed:
+        model.random.setstate(state["random"])
+        model.rng.bit_generator.state = state["rng"]
+    if record is not None:
+        model.recorder = TrajectoryRecorder.for_model(model, record)
+        model.recorder.record_model(model)
+    return model
+
+
+def _restore_agents(model, vehicles):
+    from agents import VehicleAgent
+    for vehicle_id, pos, spawn_step, route_key, path, blocked, yielded in vehicles:
+        start_id, dest_id = route_key
+        vehicle = VehicleAgent(f"Car_{vehicle_id}", model, model.parking_nodes[start_id],
+                               model.parking_nodes[dest_id])
+        vehicle.vehicle_id = vehicle_id
+        vehicle.route_key = route_key
+        vehicle.blocked_steps = blocked
+        vehicle.yield_steps = yielded
+        vehicle.spawn_step = spawn_step
+        vehicle.path = list(path)
+        model.grid.place_agent(vehicle, tuple(pos))
+        model._enter_cell(tuple(pos))
+        model._register_vehicle(vehicle)
+
+
+def _restore_fleet(model, fleet):
+    engine = model.engine
+    for name in FLEET_ARRAYS:
+        setattr(engine, name, fleet[name].copy())
+    engine.route_cells = np.zeros(max(fleet["route_cells"].size, 1024), dtype=np.int64)
+    engine.route_cells[:fleet["route_cells"].size] = fleet["route_cells"]
+    engine.route_size = fleet["route_cells"].size
+    engine.route_offsets = dict(fleet["route_offsets"])
+    engine.route_keys = dict(fleet["route_keys"])
+    engine.free_slots = list(fleet["free_slots"])
+    engine.num_active = fleet["num_active"]
+    engine.agents = {}
+    for cid in engine.pos[engine.active].tolist():
+        model._enter_cell(engine.cell_pos(cid))
@@ -0,0 +1,142 @@
+import random
+
+from csr import GraphBuilder
+
+# --- CONSTANTES DE TIPOS DE CELDA (mismos valores que model.py) ---
+BUILDING = 0
+ROAD = 1
+ROUNDABOUT = 2
+PARKING = 3
+
+
+class CityPlan:
+    """
+    Descripción estática de una ciudad lista para TrafficModel(city=...).
+
+    - graph: csr.CSRGraph de celdas (x, y) con pesos por arista
+    - city_layout: city_layout[x][y] con los tipos de celda
+    - roundabouts: lista de (celdas del anillo, celdas de entrada)
+    - signals: lista de (x, y, grupo, fase); cada grupo es un cruce cuyos gestores
+      se alternan en orden de fase
+    - parking_spots: {id: (x, y)}
+    - routes: rutas precalculadas opcionales {(origen, destino): tupla de nodos o None}
+    """
+    def __init__(self, width, height, graph, city_layout, parking_spots,
+                 roundabouts=(), signals=(), stop_lines=(), routes=None):
+        self.width = width
+        self.height = height
+        self.graph = graph
+        self.city_layout = city_layout
+        self.parking_spots = dict(parking_spots)
+        self.roundabouts = [(set(ring), set(entries)) for ring, entries in roundabouts]
+        self.signals = list(signals)
+        self.stop_lines = list(stop_lines)
+        self.routes = routes
+
+
+def _road_positions(size, period):
+    """Coordenadas de inicio de cada calle doble; siempre incluye 0 y size - 2"""
+    positions = list(range(0, size - 2, period))
+    last = size - 2
+    if last - positions[-1] < 3:
+        positions[-1] = last   # Cuadra demasiado angosta: se recorre la última calle
+    else:
+        positions.append(last)
+    return positions
+
+
+def generate_city(width=50, height=50, block_size=5, roundabouts=1,
+                  signal_density=0.5, parking_density=0.3, seed=None):
+    """
+    Genera una ciudad en cuadrícula de calles dobles de un sentido por carril.
+
+    Calle vertical en x: carril x hacia abajo (+y), carril x + 1 hacia arriba (-y).
+    Calle horizontal en y: carril y hacia la izquierda (-x), carril y + 1 hacia la derecha (+x).
+    Cada cruce de 2x2 ya forma un ciclo antihorario, así que los giros salen solos
+    y el perímetro garantiza que el grafo sea fuertemente conexo.
+
+    - block_size: celdas de edificio entre calles
+    - roundabouts: cruces interiores que funcionan como rotonda (sin semáforos)
+    - signal_density: fracción de los cruces interiores restantes con semáforos
+    - parking_density: fracción de cuadras con un estacionamiento
+    """
+    if width < 8 or height < 8:
+        raise ValueError("la ciudad debe medir al menos 8x8")
+    if block_size < 1:
+        raise ValueError("block_size debe ser >= 1")
+    rng = random.Random(seed)
+    period = block_size + 2
+    xs = _road_positions(width, period)
+    ys = _road_positions(height, period)
+
+    graph = GraphBuilder()
+    layout = [[BUILDING for y in range(height)] for x in range(width)]
+
+    # --- CALLES ---
+    for x in xs:
+        for y in range(height - 1):
+            graph.add_edge((x, y), (x, y + 1), weight=1)
+            graph.add_edge((x + 1, y + 1), (x + 1, y), weight=1)
+        for y in range(height):
+            layout[x][y] = ROAD
+            layout[x + 1][y] = ROAD
+    for y in ys:
+        for x in range(width - 1):
+            graph.add_edge((x + 1, y), (x, y), weight=1)
+            graph.add_edge((x, y + 1), (x + 1, y + 1), weight=1)
+        for x in range(width):
+            layout[x][y] = ROAD
+            layout[x][y + 1] = ROAD
+
+    # --- CRUCES: ROTONDAS, SEMÁFOROS Y ALTOS ---
+    interior = [(x, y) for x in xs[1:-1] for y in ys[1:-1]]
+    rng.shuffle(interior)
+    roundabout_sites = interior[:roundabouts]
+    signal_sites = [site for site in interior[roundabouts:] if rng.random() < signal_density]
+    signalized = set(signal_sites) | set(roundabout_sites)
+
+    def approaches(x, y):
+        # (desde arriba, desde abajo) verticales, (desde la derecha, desde la izquierda) horizontales
+        return [(x, y - 1), (x + 1, y + 2)], [(x + 2, y), (x - 1, y + 1)]
+
+    ring_list = []
+    for (x, y) in roundabout_sites:
+        ring = {(x, y), (x + 1, y), (x, y + 1), (x + 1, y + 1)}
+        vertical, horizontal = approaches(x, y)
+        ring_list.append((ring, set(vertical + horizontal)))
+        for cx, cy in ring:
+            layout[cx][cy] = ROUNDABOUT
+
+    signals = []
+    for group, (x, y) in enumerate(sorted(signal_sites)):
+        vertical, horizontal = approaches(x, y)
+        signals.extend((px, py, group, 0) for px, py in vertical)
+        signals.extend((px, py, group, 1) for px, py in horizontal)
+
+    stop_lines = []
+    for x in xs:
+        for y in ys:
+            if (x, y) in signalized: continue
+            vertical, horizontal = approaches(x, y)
+            stop_lines.extend(p for p in vertical + horizontal
+                              if 0 <= p[0] < width and 0 <= p[1] < height and p in graph)
+
+    # --- ESTACIONAMIENTOS (uno por cuadra, junto a la calle) ---
+    blocks = []
+    for x0, x1 in zip(xs, xs[1:]):
+        for y0, y1 in zip(ys, ys[1:]):
+            cells = [(x, y) for x in range(x0 + 2, x1) for y in range(y0 + 2, y1)
+                     if x in (x0 + 2, x1 - 1) or y in (y0 + 2, y1 - 1)]
+            if cells:
+                blocks.append(cells)
+    chosen = [cells for cells in blocks if rng.random() < parking_density]
+    if len(chosen) < 2:
+        chosen = rng.sample(blocks, min(2, len(blocks)))
+    parking_spots = {}
+    for pid, cells in enumerate(chosen, start=1):
+        pos = rng.choice(cells)
+        parking_spots[pid] = pos
+        layout[pos[0]][pos[1]] = PARKING
+
+    return CityPlan(width, height, graph.to_csr(width, height), layout, parking_spots,
+                    roundabouts=ring_list, signals=signals, stop_lines=stop_lines)
@@ -0,0 +1,178 @@
+import hashlib
+import inspect
+import json
+import os
+
+import numpy as np
+
+from city import CityPlan, generate_city
+from csr import CSRGraph
+
+# Subir cuando cambie el formato del artefacto. Los cambios de mapa o de generador no
+# hace falta anotarlos: source_key() los detecta por el código que arma la ciudad.
+CACHE_VERSION = 2
+CACHE_DIR = os.environ.get("TRAFFIC_CITY_CACHE", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".city_cache"))
+# Módulos que construyen la ciudad, su grafo y sus rutas (se hashean enteros)
+SOURCE_MODULES = ("city", "csr", "spatial", "city_cache")
+# De model.py solo los métodos y constantes que arman el mapa y la tabla de rutas:
+# cambiar step() o los motores no invalida los artefactos
+MODEL_METHODS = ("build_default_city", "build_city_graph", "load_city", "setup_roundabouts",
+                 "create_signals", "get_nearest_node", "build_route_table", "_build_route",
+                 "_build_routes_from", "get_route")
+MODEL_CONSTANTS = ("BUILDING", "ROAD", "ROUNDABOUT", "PARKING", "INTERSECTION_ENTRY", "EAGER_ROUTE_LIMIT")
+
+_memo = {}
+
+
+def source_key(params=None):
+    """
+    Huella de todo lo que determina un artefacto: CACHE_VERSION, el código de
+    SOURCE_MODULES (generador, grafo, rutas), los métodos y constantes de model.py
+    que arman la ciudad (MODEL_METHODS, MODEL_CONSTANTS) y los parámetros del generador
+    """
+    import model
+    digest = hashlib.sha1(f"v{CACHE_VERSION}".encode())
+    here = os.path.dirname(os.path.abspath(__file__))
+    for name in SOURCE_MODULES:
+        with open(os.path.join(here, f"{name}.py"), "rb") as f:
+            digest.update(f.read())
+    for name in MODEL_METHODS:
+        digest.update(inspect.getsource(getattr(model.TrafficModel, name)).encode())
+    digest.update(repr([getattr(model, name) for name in MODEL_CONSTANTS]).encode())
+    digest.update(json.dumps(params, sort_keys=True).encode())
+    return digest.hexdigest()
+
+
+def compile_city(model, path, include_routes=True, key=""):
+    """
+    Guarda la ciudad ya construida de un TrafficModel en un .npz versionado:
+    grafo, layout, estacionamientos, semáforos, rotondas y (opcional) la tabla de rutas.
+    key (ver source_key) queda guardada para detectar artefactos desactualizados.
+    """
+    graph = model.graph
+    nodes = graph.nodes
+    node_index = {node: i for i, node in enumerate(nodes)}
+    sources = np.repeat(np.arange(graph.num_nodes), np.diff(graph.indptr))
+    rings, entries = [], []
+    for cell, rid in model.roundabout_id.items():
+        (rings if cell in model.roundabout_ring else entries).append((rid, cell[0], cell[1]))
+
+    arrays = {
+        "version": np.array(CACHE_VERSION),
+        "source_key": np.array(key),
+        "size": np.array([model.grid.width, model.grid.height]),
+        "layout": np.array(model.city_layout, dtype=np.int8),
+        "nodes": np.array(nodes, dtype=np.int32).reshape(-1, 2),
+        "edges": np.column_stack((sources, graph.indices)).astype(np.int32).reshape(-1, 2),
+        "weights": graph.weights.copy(),
+        "rev_edges": graph.rev_edges.astype(np.int32),
+        "parking": np.array([(pid, x, y) for pid, (x, y) in model.parking_spots.items()], dtype=np.int32).reshape(-1, 3),
+        "signals": np.array(model.signals, dtype=np.int32).reshape(-1, 4),
+        "ring_cells": np.array(sorted(rings), dtype=np.int32).reshape(-1, 3),
+        "entry_cells": np.array(sorted(entries), dtype=np.int32).reshape(-1, 3),
+        "num_roundabouts": np.array(len(model.roundabout_counts)),
+        "stop_lines": np.array(model.stop_lines, dtype=np.int32).reshape(-1, 2),
+    }
+    if include_routes:
+        keys, offsets, flat = [], [0], []
+        for key, route in model.route_table.items():
+            keys.append(key)
+            if route is not None:
+                flat.extend(node_index[n] for n in route)
+            offsets.append(len(flat) if route is not None else -1)
+        arrays["route_keys"] = np.array(keys, dtype=np.int32).reshape(-1, 2)
+        # offsets[i + 1] == -1 marca un par sin camino
+        arrays["route_offsets"] = np.array(offsets, dtype=np.int64)
+        arrays["route_nodes"] = np.array(flat, dtype=np.int32)
+
+    # Escritura atómica: varios procesos pueden compilar la misma ciudad a la vez
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp.npz"
+    np.savez(tmp, **arrays)
+    os.replace(tmp, path)
+    return path
+
+
+def load_city(path, key=None):
+    """
+    Lee un artefacto de compile_city y devuelve un CityPlan; ValueError si la versión
+    no coincide o, con key, si el artefacto se compiló con otro código o parámetros
+    """
+    with np.load(path) as data:
+        if int(data["version"]) != CACHE_VERSION:
+            raise ValueError(f"{path}: versión {int(data['version'])}, se esperaba {CACHE_VERSION}")
+        if key is not None and str(data["source_key"]) != key:
+            raise ValueError(f"{path}: compilado con otro código o parámetros")
+        width, height = (int(v) for v in data["size"])
+        nodes = [tuple(n) for n in data["nodes"].tolist()]
+        edges = data["edges"]
+        graph = CSRGraph.from_edges(width, height, nodes,
+                                    list(zip(edges[:, 0].tolist(), edges[:, 1].tolist(), data["weights"].tolist())),
+                                    rev_edges=data["rev_edges"])
+
+        roundabouts = [(set(), set()) for _ in range(int(data["num_roundabouts"]))]
+        for rid, x, y in data["ring_cells"].tolist():
+            roundabouts[rid][0].add((x, y))
+        for rid, x, y in data["entry_cells"].tolist():
+            roundabouts[rid][1].add((x, y))
+
+        routes = None
+        if "route_keys" in data:
+            routes = {}
+            offsets = data["route_offsets"].tolist()
+            flat = data["route_nodes"].tolist()
+            start = 0
+            for i, (o, d) in enumerate(data["route_keys"].tolist()):
+                end = offsets[i + 1]
+                if end < 0:
+                    routes[(o, d)] = None
+                    continue
+                routes[(o, d)] = tuple(nodes[n] for n in flat[start:end])
+                start = end
+
+        return CityPlan(
+            width, height, graph, data["layout"].tolist(),
+            {pid: (x, y) for pid, x, y in data["parking"].tolist()},
+            roundabouts=roundabouts,
+            signals=[tuple(s) for s in data["signals"].tolist()],
+            stop_lines=[tuple(p) for p in data["stop_lines"].tolist()],
+            routes=routes,
+        )
+
+
+def _cached(name, build, params=None):
+    """
+    Memo en proceso + artefacto en disco; build() devuelve un TrafficModel ya construido.
+    Si el artefacto no coincide con source_key(params) se recompila encima.
+    """
+    if name in _memo:
+        return _memo[name]
+    path = os.path.join(CACHE_DIR, f"{name}_v{CACHE_VERSION}.npz")
+    key = source_key(params)
+    plan = None
+    if os.path.exists(path):
+        try:
+            plan = load_city(path, key)
+        except (ValueError, KeyError, OSError):
+            plan = None
+    if plan is None:
+        compile_city(build(), path, key=key)
+        plan = load_city(path, key)
+    _memo[name] = plan
+    return plan
+
+
+def default_city():
+    """Mapa fijo de 25x25 compilado (se construye una sola vez por máquina)"""
+    from model import TrafficModel
+    return _cached("default", lambda: TrafficModel(num_vehicles=0))
+
+
+def generated_city(**params):
+    """Ciudad de generate_city(**params) compilada, cacheada por sus parámetros"""
+    from model import TrafficModel
+    digest = hashlib.sha1(json.dumps(params, sort_keys=True).encode()).hexdigest()[:12]
+
+    # Las rutas solo se guardan si la ciudad las precalcula (pocos estacionamientos)
+    return _cached(f"city_{digest}", lambda: TrafficModel(num_vehicles=0, city=generate_city(**params)), params)
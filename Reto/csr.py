@@ -0,0 +1,389 @@
+"""
+Grafo vial compacto en formato CSR (compressed sparse row).
+
+Los nodos son celdas (x, y) numeradas 0..n-1 en orden de inserción. Las aristas
+salientes del nodo u son indices[indptr[u]:indptr[u + 1]] con pesos en weights,
+en el mismo orden en que se agregaron (así las rutas y los desempates coinciden
+con los de networkx). cell_node mapea el id de celda plano x * height + y al nodo
+(-1 si la celda no es calle). Las aristas entrantes se guardan en rev_indptr /
+rev_edges (ids de arista) en orden global de inserción, como G.pred de networkx,
+para consultas de predecesores y la búsqueda hacia atrás de shortest_path.
+
+GraphBuilder junta nodos y aristas durante la construcción de la ciudad con la
+misma interfaz mínima que nx.DiGraph (add_node / add_edge / nodes / in) y
+to_csr() congela el resultado. networkx solo se usa en to_networkx(), para depurar.
+"""
+import heapq
+from collections import deque
+from itertools import count
+
+import numpy as np
+
+
+def manhattan(a, b):
+    return abs(a[0] - b[0]) + abs(a[1] - b[1])
+
+
+class GraphBuilder:
+    """Grafo mutable de construcción: {nodo: {sucesor: peso}} en orden de inserción"""
+    def __init__(self):
+        self.succ = {}
+        self.order = {}   # (u, v) -> orden global de inserción (repetir una arista no la mueve)
+
+    def add_node(self, node):
+        self.succ.setdefault(node, {})
+
+    def add_edge(self, u, v, weight=1):
+        self.succ.setdefault(u, {})[v] = weight
+        self.succ.setdefault(v, {})
+        self.order.setdefault((u, v), len(self.order))
+
+    @property
+    def nodes(self):
+        return list(self.succ)
+
+    def __contains__(self, node):
+        return node in self.succ
+
+    def __len__(self):
+        return len(self.succ)
+
+    def to_csr(self, width, height):
+        nodes = list(self.succ)
+        index = {node: i for i, node in enumerate(nodes)}
+        edges = [(index[u], index[v], self.succ[u][v]) for u, v in self.order]
+        return CSRGraph.from_edges(width, height, nodes, edges)
+
+
+class CSRGraph:
+    """Grafo dirigido inmutable sobre celdas de la grilla, con Dijkstra y A* propios"""
+    def __init__(self, width, height, node_cells, indptr, indices, weights, rev_edges=None):
+        self.width = width
+        self.height = height
+        self.node_cells = np.asarray(node_cells, dtype=np.int64)
+        self.indptr = np.asarray(indptr, dtype=np.int64)
+        self.indices = np.asarray(indices, dtype=np.int64)
+        self.weights = np.asarray(weights, dtype=np.float64)
+        self.cell_node = np.full(width * height, -1, dtype=np.int64)
+        self.cell_node[self.node_cells] = np.arange(self.node_cells.size)
+        # Aristas entrantes: ids de arista agrupados por destino (sin orden dado: orden CSR)
+        if rev_edges is None:
+            rev_edges = np.argsort(self.indices, kind="stable")
+        self.rev_edges = np.asarray(rev_edges, dtype=np.int64)
+        self.rev_indptr = np.zeros(self.num_nodes + 1, dtype=np.int64)
+        np.cumsum(np.bincount(self.indices, minlength=self.num_nodes), out=self.rev_indptr[1:])
+        self._lists = None
+        self._rev_lists = None
+
+    @classmethod
+    def from_edges(cls, width, height, nodes, edges, rev_edges=None):
+        """
+        nodes: celdas (x, y); edges: (u, v, peso) con u, v índices en nodes, en orden de
+        inserción (de ahí salen el orden CSR por origen y el de predecesores por destino).
+        rev_edges reemplaza ese orden de predecesores (ids de arista CSR, p. ej. de un artefacto).
+        """
+        n = len(nodes)
+        node_cells = [x * height + y for x, y in nodes]
+        src = np.array([e[0] for e in edges], dtype=np.int64)
+        dst = np.array([e[1] for e in edges], dtype=np.int64)
+        order = np.argsort(src, kind="stable")
+        indices = dst[order]
+        weights = np.array([e[2] for e in edges], dtype=np.float64)[order]
+        indptr = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(src, minlength=n), out=indptr[1:])
+        if rev_edges is None:
+            position = np.empty_like(order)
+            position[order] = np.arange(order.size)   # arista i de la entrada -> id CSR
+            rev_edges = position[np.argsort(dst, kind="stable")]
+        return cls(width, height, node_cells, indptr, indices, weights, rev_edges)
+
+    @classmethod
+    def from_networkx(cls, graph, width, height):
+        nodes = list(graph.nodes)
+        index = {node: i for i, node in enumerate(nodes)}
+        edges = [(index[u], index[v], data.get("weight", 1)) for u, v, data in graph.edges(data=True)]
+        edge_ids = {(u, v): e for e, (u, v, _) in enumerate(edges)}   # graph.edges va en orden CSR
+        rev_edges = [edge_ids[(index[u], index[v])] for v in nodes for u in graph.pred[v]]
+        return cls.from_edges(width, height, nodes, edges, rev_edges)
+
+    def to_networkx(self):
+        """
+        nx.DiGraph equivalente (para depurar, dibujar o comparar rutas). Las aristas se
+        agregan en un orden que respeta a la vez el orden CSR por origen y rev_edges por
+        destino, así G.succ y G.pred quedan como en el grafo original y las rutas de
+        networkx (desempates incluidos) son las mismas.
+        """
+        import networkx as nx
+        # Orden topológico de las aristas: cada una va después de la anterior de su
+        # origen y de la anterior de su destino
+        m = self.num_edges
+        after = [[] for _ in range(m)]
+        before = [0] * m
+        for indptr, order in ((self.indptr.tolist(), list(range(m))),
+                              (self.rev_indptr.tolist(), self.rev_edges.tolist())):
+            for lo, hi in zip(indptr, indptr[1:]):
+                for prev, e in zip(order[lo:hi], order[lo + 1:hi]):
+                    after[prev].append(e)
+                    before[e] += 1
+        ready = deque(e for e in range(m) if before[e] == 0)
+        edges = list(self.edges())
+        graph = nx.DiGraph()
+        graph.add_nodes_from(self.nodes)
+        while ready:
+            e = ready.popleft()
+            u, v, w = edges[e]
+            graph.add_edge(u, v, weight=w)
+            for nxt in after[e]:
+                before[nxt] -= 1
+                if before[nxt] == 0:
+                    ready.append(nxt)
+        return graph
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_lists"] = state["_rev_lists"] = None   # se reconstruyen en el proceso que las use
+        return state
+
+    def lists(self):
+        """
+        (indptr, indices, weights, celdas) como listas de Python para los ciclos de
+        las búsquedas (indexar listas es mucho más rápido que indexar arreglos NumPy).
+        Se arman en la primera consulta y se reutilizan.
+        """
+        if self._lists is None:
+            self._lists = (self.indptr.tolist(), self.indices.tolist(), self.weights.tolist(),
+                           [divmod(c, self.height) for c in self.node_cells.tolist()])
+        return self._lists
+
+    def rev_lists(self):
+        """(rev_indptr, origen por arista entrante, id de arista) como listas, igual que lists()"""
+        if self._rev_lists is None:
+            sources = np.repeat(np.arange(self.num_nodes), np.diff(self.indptr))
+            self._rev_lists = (self.rev_indptr.tolist(), sources[self.rev_edges].tolist(),
+                               self.rev_edges.tolist())
+        return self._rev_lists
+
+    # --- CONSULTAS ---
+    @property
+    def num_nodes(self):
+        return self.node_cells.size
+
+    @property
+    def num_edges(self):
+        return self.indices.size
+
+    @property
+    def nbytes(self):
+        return sum(a.nbytes for a in (self.node_cells, self.indptr, self.indices, self.weights,
+                                      self.cell_node, self.rev_edges, self.rev_indptr))
+
+    @property
+    def nodes(self):
+        """Celdas (x, y) en orden de id de nodo"""
+        return list(self.lists()[3])
+
+    def __len__(self):
+        return self.num_nodes
+
+    def __contains__(self, pos):
+        x, y = pos
+        return 0 <= x < self.width and 0 <= y < self.height and self.cell_node[x * self.height + y] >= 0
+
+    def node(self, pos):
+        """Id de nodo de la celda pos (-1 si no es parte del grafo)"""
+        x, y = pos
+        if not (0 <= x < self.width and 0 <= y < self.height):
+            return -1
+        return int(self.cell_node[x * self.height + y])
+
+    def cell(self, node):
+        return self.lists()[3][node]
+
+    def edges(self):
+        """Aristas (u, v, peso) como celdas, en orden CSR"""
+        indptr, indices, weights, cells = self.lists()
+        for u in range(self.num_nodes):
+            for e in range(indptr[u], indptr[u + 1]):
+                yield cells[u], cells[indices[e]], weights[e]
+
+    def successors(self, pos):
+        indptr, indices, _, cells = self.lists()
+        u = self.node(pos)
+        return [cells[v] for v in indices[indptr[u]:indptr[u + 1]]]
+
+    def predecessors(self, pos):
+        rev_indptr, sources, _ = self.rev_lists()
+        v = self.node(pos)
+        cells = self.lists()[3]
+        return [cells[u] for u in sources[rev_indptr[v]:rev_indptr[v + 1]]]
+
+    def in_edges(self, pos):
+        """Ids de las aristas que entran a pos"""
+        v = self.node(pos)
+        return self.rev_edges[self.rev_indptr[v]:self.rev_indptr[v + 1]]
+
+    def edge_id(self, u_pos, v_pos):
+        """Id de la arista u -> v, o -1 si no existe"""
+        u, v = self.node(u_pos), self.node(v_pos)
+        if u < 0 or v < 0:
+            return -1
+        indptr, indices, _, _ = self.lists()
+        for e in range(indptr[u], indptr[u + 1]):
+            if indices[e] == v:
+                return e
+        return -1
+
+    # --- RUTAS ---
+    def dijkstra(self, source, targets=None, weights=None):
+        """
+        Árbol de caminos mínimos desde la celda source: (dist, pred) como listas por nodo
+        (inf / -1 si no se alcanza). Con targets (celdas) se detiene al fijarlos todos.
+        Desempates como nx.dijkstra_predecessor_and_distance (primer predecesor).
+        """
+        indptr, indices, default, _ = self.lists()
+        weights = default if weights is None else np.asarray(weights).tolist()
+        n = self.num_nodes
+        inf = float("inf")
+        dist = [inf] * n
+        seen = [inf] * n
+        pred = [-1] * n
+        done = [False] * n
+        s = self.node(source)
+        remaining = None
+        if targets is not None:
+            remaining = {self.node(t) for t in targets} - {-1}
+        seen[s] = 0
+        tick = count().__next__   # desempate por orden de inserción, como networkx
+        heap = [(0, tick(), s)]
+        pop, push = heapq.heappop, heapq.heappush
+        while heap:
+            d, _, u = pop(heap)
+            if done[u]:
+                continue
+            done[u] = True
+            dist[u] = d
+            if remaining is not None:
+                remaining.discard(u)
+                if not remaining:
+                    break
+            for e in range(indptr[u], indptr[u + 1]):
+                v = indices[e]
+                nd = d + weights[e]
+                if nd < seen[v] and not done[v]:
+                    seen[v] = nd
+                    pred[v] = u
+                    push(heap, (nd, tick(), v))
+        return dist, pred
+
+    def path_from_tree(self, pred, source, target):
+        """Tupla de celdas source..target según pred de dijkstra(), o None sin camino"""
+        s, t = self.node(source), self.node(target)
+        if t < 0 or (t != s and pred[t] < 0):
+            return None
+        path = [t]
+        while path[-1] != s:
+            path.append(pred[path[-1]])
+        cells = self.lists()[3]
+        return tuple(cells[u] for u in reversed(path))
+
+    def shortest_path(self, source, target, weights=None):
+        """
+        Camino mínimo source -> target (tupla de celdas) o None, con Dijkstra bidireccional.
+        Mismo orden de expansión y desempates que nx.shortest_path(G, s, t, weight=...),
+        que para un par de nodos usa nx.bidirectional_dijkstra.
+        """
+        indptr, indices, default, cells = self.lists()
+        rev_indptr, rev_sources, rev_ids = self.rev_lists()
+        weights = default if weights is None else np.asarray(weights).tolist()
+        s, t = self.node(source), self.node(target)
+        if s < 0 or t < 0:
+            return None
+        if s == t:
+            return (source,)
+        n = self.num_nodes
+        inf = float("inf")
+        dists = ([inf] * n, [inf] * n)     # distancias finales por dirección
+        seen = ([inf] * n, [inf] * n)
+        preds = ([-1] * n, [-1] * n)
+        seen[0][s] = seen[1][t] = 0
+        c = count()
+        fringe = ([(0, next(c), s)], [(0, next(c), t)])
+        pop, push = heapq.heappop, heapq.heappush
+        finaldist = inf
+        meet = -1
+        direction = 1
+        while fringe[0] and fringe[1]:
+            direction = 1 - direction
+            dist, _, v = pop(fringe[direction])
+            done = dists[direction]
+            if done[v] < inf:
+                continue
+            done[v] = dist
+            if dists[1 - direction][v] < inf:
+                forward, backward = [meet], []
+                while forward[-1] != s:
+                    forward.append(preds[0][forward[-1]])
+                node = preds[1][meet]
+                while node != -1:
+                    backward.append(node)
+                    node = preds[1][node]
+                return tuple(cells[u] for u in forward[::-1] + backward)
+            if direction == 0:
+                arcs = ((indices[e], e) for e in range(indptr[v], indptr[v + 1]))
+            else:
+                arcs = ((rev_sources[i], rev_ids[i]) for i in range(rev_indptr[v], rev_indptr[v + 1]))
+            known, pred, other = seen[direction], preds[direction], seen[1 - direction]
+            for w, e in arcs:
+                length = dist + weights[e]
+                if done[w] < inf or length >= known[w]:
+                    continue
+                known[w] = length
+                push(fringe[direction], (length, next(c), w))
+                pred[w] = v
+                if other[w] < inf and length + other[w] < finaldist:
+                    finaldist, meet = length + other[w], w
+        return None
+
+    def astar(self, source, target, weights=None, heuristic=manhattan):
+        """
+        Camino mínimo source -> target (lista de celdas, incluye ambas) o None.
+        heuristic(celda, objetivo) debe ser admisible; mismo orden de exploración que
+        nx.astar_path.
+        """
+        indptr, indices, default, cells = self.lists()
+        weights = default if weights is None else weights
+        s, t = self.node(source), self.node(target)
+        if s < 0 or t < 0:
+            return None
+        c = count()
+        heap = [(0, next(c), s, 0, -1)]
+        enqueued = {}    # nodo -> (costo encolado, heurística)
+        explored = {}    # nodo -> padre
+        pop, push = heapq.heappop, heapq.heappush
+        while heap:
+            _, _, u, dist, parent = pop(heap)
+            if u == t:
+                path = [u]
+                node = parent
+                while node != -1:
+                    path.append(node)
+                    node = explored[node]
+                return [cells[v] for v in reversed(path)]
+            if u in explored:
+                if explored[u] == -1:
+                    continue
+                if enqueued[u][0] < dist:
+                    continue
+            explored[u] = parent
+            for e in range(indptr[u], indptr[u + 1]):
+                v = indices[e]
+                ncost = dist + weights[e]
+                if v in enqueued:
+                    qcost, h = enqueued[v]
+                    if qcost <= ncost:
+                        continue
+                else:
+                    h = heuristic(cells[v], target)
+                enqueued[v] = ncost, h
+                push(heap, (ncost + h, next(c), v, ncost, u))
+        return None
@@ -0,0 +1,140 @@
+import heapq
+import math
+from bisect import bisect_left, bisect_right, insort
+from collections import deque
+from itertools import accumulate
+
+
+class SpawnScheduler:
+    """
+    Estacionamientos ordenados por fin de cooldown.
+
+    Los que aún esperan viven en un heap (paso en que quedan libres, id); al vencer
+    pasan a ready, una lista que se mantiene ordenada por posición en parking_spots
+    (insort), así que ready_spots() no reordena nada y el barajado del modelo es el
+    mismo que con el escaneo completo. Con demanda solo se recorren los orígenes que
+    además tienen viajes en cola.
+    """
+    def __init__(self, parking_ids, cooldown, schedule):
+        self.cooldown = cooldown
+        self.ids = list(parking_ids)
+        self.order = {pid: i for i, pid in enumerate(self.ids)}
+        self.ready = set()
+        self.ready_order = []   # posiciones (self.order) de ready, ordenadas
+        self.waiting = [(schedule[pid] + cooldown, self.order[pid], pid) for pid in parking_ids]
+        heapq.heapify(self.waiting)
+
+    def ready_spots(self, step, origins=None):
+        """
+        Ids con el cooldown vencido en step, en orden de parking_spots.
+        Con origins (conjunto) solo los que además están en origins.
+        """
+        waiting = self.waiting
+        while waiting and waiting[0][0] <= step:
+            _, index, pid = heapq.heappop(waiting)
+            self.ready.add(pid)
+            insort(self.ready_order, index)
+        if origins is None:
+            return [self.ids[i] for i in self.ready_order]
+        # La intersección de conjuntos recorre el más chico de los dos
+        return sorted(self.ready & origins, key=self.order.__getitem__)
+
+    def release(self, pid, step):
+        """El estacionamiento pid generó un vehículo en step: vuelve a esperar"""
+        if pid in self.ready:
+            self.ready.discard(pid)
+            index = self.order[pid]
+            del self.ready_order[bisect_left(self.ready_order, index)]
+        heapq.heappush(self.waiting, (step + self.cooldown, self.order[pid], pid))
+
+    def next_ready_step(self, step, pids=None):
+        """Primer paso >= step en que algún estacionamiento (de pids, si se da) está listo"""
+        if pids is None:
+            if self.ready:
+                return step
+            return max(self.waiting[0][0], step) if self.waiting else math.inf
+        best = math.inf
+        for pid in pids:
+            if pid in self.ready:
+                return step
+        for ready_step, _, pid in self.waiting:
+            if pid in pids:
+                best = min(best, ready_step)
+        return max(best, step)
+
+
+class DemandModel:
+    """
+    Demanda origen-destino con llegadas de Poisson.
+
+    od_rates: {(origen, destino): viajes por paso}. Cada origen genera viajes con
+    tasa total sum_d od_rates[(o, d)] y destino proporcional a su tasa. profile(step)
+    escala las tasas en el tiempo (hora pico, etc.); max_factor debe acotar a
+    profile para el muestreo por thinning. Los viajes quedan pendientes en su origen
+    hasta que el estacionamiento esté libre y fuera de cooldown.
+    """
+    def __init__(self, od_rates, profile=None, max_factor=1.0):
+        self.profile = profile
+        self.max_factor = max_factor if profile is not None else 1.0
+        rows = {}
+        for (origin, dest), rate in od_rates.items():
+            if rate > 0 and origin != dest:
+                rows.setdefault(origin, []).append((dest, rate))
+        self.rates = {}
+        self.destinations = {}
+        self.cumulative = {}
+        for origin, row in rows.items():
+            self.rates[origin] = sum(rate for _, rate in row)
+            self.destinations[origin] = [dest for dest, _ in row]
+            self.cumulative[origin] = list(accumulate(rate for _, rate in row))
+        self.pending = {origin: deque() for origin in rows}   # destinos en cola por origen
+        self.waiting = set()   # orígenes con pending no vacío
+        self.events = None   # heap (tiempo de la siguiente llegada candidata, origen)
+
+    @classmethod
+    def uniform(cls, parking_ids, trips_per_step, **kwargs):
+        """Misma tasa total por origen, destinos uniformes"""
+        ids = list(parking_ids)
+        rate = trips_per_step / (len(ids) - 1)
+        return cls({(o, d): rate for o in ids for d in ids if o != d}, **kwargs)
+
+    def _schedule(self, origin, t, rng):
+        t += rng.expovariate(self.rates[origin] * self.max_factor)
+        heapq.heappush(self.events, (t, origin))
+
+    def poll(self, step, rng):
+        """Agrega a pending los viajes que llegan hasta step (inclusive)"""
+        if self.events is None:
+            self.events = []
+            for origin in self.rates:
+                self._schedule(origin, step, rng)
+        events = self.events
+        while events and events[0][0] <= step:
+            t, origin = heapq.heappop(events)
+            factor = self.profile(t) if self.profile is not None else 1.0
+            if self.profile is None or rng.random() * self.max_factor < factor:
+                cumulative = self.cumulative[origin]
+                k = bisect_right(cumulative, rng.random() * cumulative[-1])
+                self.pending[origin].append(self.destinations[origin][min(k, len(cumulative) - 1)])
+                self.waiting.add(origin)
+            self._schedule(origin, t, rng)
+
+    def has_trip(self, origin):
+        return bool(self.pending.get(origin))
+
+    def pop_trip(self, origin):
+        trips = self.pending[origin]
+        dest = trips.popleft()
+        if not trips:
+            self.waiting.discard(origin)
+        return dest
+
+    def next_event_step(self):
+        """Paso en que se procesa la siguiente llegada candidata"""
+        if not self.events:
+            return math.inf
+        return math.ceil(self.events[0][0])
+
+    def waiting_origins(self):
+        """Orígenes con viajes en cola (el conjunto que se mantiene; no modificarlo)"""
+        return self.waiting
@@ -0,0 +1,308 @@
+import numpy as np
+
+from agents import VehicleAgent
+from reservation import ReservationRules
+
+
+_NOBODY = np.iinfo(np.int64).max   # rango "ningún vehículo" en los borradores de step()
+
+# Arreglos por slot de la flota
+FLEET_ARRAYS = ("pos", "cursor", "route_end", "spawn_step", "vehicle_id", "blocked_steps", "yield_steps", "active")
+
+
+def _ranked_sums(groups, ranks, weights, n):
+    """
+    Suma de weights por grupo contando solo rangos anteriores: devuelve
+    before(g, k) = sum(weights[(groups == g) & (ranks < k)]) vectorizado (rangos < n).
+    """
+    keys = groups * n + ranks
+    order = np.argsort(keys, kind="stable")
+    keys = keys[order]
+    csum = np.concatenate(([0], np.cumsum(weights[order])))
+
+    def before(g, k):
+        return csum[np.searchsorted(keys, g * n + k)] - csum[np.searchsorted(keys, g * n)]
+    return before
+
+
+class BatchVehicleEngine:
+    """
+    Motor vectorizado de vehículos (struct-of-arrays).
+
+    Guarda posición, cursor de ruta y estado de toda la flota en arreglos NumPy
+    y resuelve los movimientos en lote con las reglas de VehicleAgent.step aplicadas
+    en el orden aleatorio del paso:
+      - ceder en entradas de rotonda (capacidad y vehículos cercanos en el anillo)
+      - no entrar a celdas en rojo ni ocupadas
+    Cada coche ve el estado que dejaron los anteriores en el orden: se decide en la
+    primera pasada en que ya están decididos todos los anteriores que pueden tocar su
+    celda destino (o su rotonda, si está en una entrada), y la ocupación se cuenta solo
+    con los movimientos de esos anteriores. Para un mismo orden el resultado es el del
+    recorrido secuencial; el orden sale de model.rng, no del shuffle de engine="agents",
+    así que con la misma semilla las corridas coinciden solo estadísticamente.
+
+    Las posiciones son ids de celda planos (x * height + y), compartiendo memoria
+    con model.vehicle_occupancy y model.red_cells.
+    """
+    def __init__(self, model, capacity=1024):
+        self.model = model
+        self.height = model.grid.height
+        self.occupancy = model.vehicle_occupancy.reshape(-1)
+        self.red = model.red_cells.reshape(-1)
+
+        # --- ROTONDAS (tablas compartidas con el modo por reservas) ---
+        self.rules = ReservationRules(model)
+        self.ring_ids = self.rules.ring_ids
+        self.ring_rid = self.rules.ring_rid
+        self.num_roundabouts = self.rules.num_roundabouts
+        self.ring_mask = self.rules.ring_mask
+        self.entry_index = self.rules.entry_index
+        self.entry_rid = self.rules.entry_rid
+        self.watch = self.rules.watch
+        self.ring_cell_rid = np.full(self.occupancy.size, -1, dtype=np.int64)
+        self.ring_cell_rid[self.ring_ids] = self.ring_rid
+        # Celdas vigiladas por entrada en formato CSR (para contarlas pares entrada-celda)
+        e_idx, r_idx = np.nonzero(self.watch)
+        self.watch_ptr = np.zeros(self.watch.shape[0] + 1, dtype=np.int64)
+        np.cumsum(np.bincount(e_idx, minlength=self.watch.shape[0]), out=self.watch_ptr[1:])
+        self.watch_cells = self.ring_ids[r_idx]
+        self._first = np.full(self.occupancy.size, _NOBODY, dtype=np.int64)
+
+        # --- RUTAS (tabla del modelo aplanada, se agrega bajo demanda) ---
+        self.route_offsets = {}
+        self.route_cells = np.zeros(1024, dtype=np.int64)
+        self.route_size = 0
+        for key, path in model.route_table.items():
+            if path is not None:
+                self._store_route(key, path)
+
+        # --- FLOTA ---
+        self.pos = np.zeros(capacity, dtype=np.int64)
+        self.cursor = np.zeros(capacity, dtype=np.int64)
+        self.route_end = np.zeros(capacity, dtype=np.int64)
+        self.spawn_step = np.zeros(capacity, dtype=np.int64)
+        self.vehicle_id = np.zeros(capacity, dtype=np.int64)
+        self.blocked_steps = np.zeros(capacity, dtype=np.int64)   # esperas como en VehicleAgent
+        self.yield_steps = np.zeros(capacity, dtype=np.int64)
+        self.active = np.zeros(capacity, dtype=bool)
+        self.free_slots = list(range(capacity - 1, -1, -1))
+        self.num_active = 0
+        self.route_keys = {}   # slot -> (origen, destino), solo para sincronizar con Mesa
+        self.agents = {}       # slot -> VehicleAgent espejo (solo tras sync_agents)
+
+    def cell_id(self, pos):
+        return pos[0] * self.height + pos[1]
+
+    def cell_pos(self, cid):
+        return (int(cid) // self.height, int(cid) % self.height)
+
+    def _store_route(self, key, path):
+        needed = self.route_size + len(path)
+        if needed > self.route_cells.size:
+            grown = np.zeros(max(needed, 2 * self.route_cells.size), dtype=np.int64)
+            grown[:self.route_size] = self.route_cells[:self.route_size]
+            self.route_cells = grown
+        self.route_cells[self.route_size:needed] = [self.cell_id(n) for n in path]
+        self.route_offsets[key] = (self.route_size, needed)
+        self.route_size = needed
+
+    def _grow(self):
+        old = self.active.size
+        new = old * 2
+        for name in FLEET_ARRAYS:
+            arr = getattr(self, name)
+            grown = np.zeros(new, dtype=arr.dtype)
+            grown[:old] = arr
+            setattr(self, name, grown)
+        self.free_slots.extend(range(new - 1, old - 1, -1))
+
+    def add_vehicle(self, vehicle_id, start_id, dest_id, start_pos):
+        """Agrega un vehículo estacionado en start_pos con la ruta (origen, destino)"""
+        if not self.free_slots:
+            self._grow()
+        slot = self.free_slots.pop()
+        key = (start_id, dest_id)
+        if key not in self.route_offsets:
+            self._store_route(key, self.model.get_route(start_id, dest_id))
+        start, end = self.route_offsets[key]
+        cid = self.cell_id(start_pos)
+        self.pos[slot] = cid
+        self.cursor[slot] = start
+        self.route_end[slot] = end
+        self.spawn_step[slot] = self.model.step_count
+        self.vehicle_id[slot] = vehicle_id
+        self.blocked_steps[slot] = 0
+        self.yield_steps[slot] = 0
+        self.active[slot] = True
+        self.route_keys[slot] = (start_id, dest_id)
+        self.occupancy[cid] += 1
+        self.num_active += 1
+        return slot
+
+    def _order(self, pending):
+        """Orden aleatorio del paso (equivale al shuffle de los vehículos)"""
+        return pending[self.model.rng.permutation(pending.size)]
+
+    def step(self):
+        """Avanza un paso toda la flota (recorrido secuencial en el orden del paso)"""
+        occ = self.occupancy
+        pending = np.flatnonzero(self.active)
+        if pending.size == 0:
+            return
+        slots = self._order(pending)
+        n = slots.size
+        rank = np.arange(n)
+        cur = self.pos[slots]
+        nxt = self.route_cells[self.cursor[slots]]
+        arrives = self.cursor[slots] + 1 >= self.route_end[slots]
+        entry = self.entry_index[cur]
+        cur_rid = self.ring_cell_rid[cur]
+        nxt_rid = self.ring_cell_rid[nxt]
+        capacity = self.model.roundabout_capacity
+        counts0 = np.bincount(self.ring_rid, weights=occ[self.ring_ids], minlength=self.num_roundabouts)
+
+        MOVED, YIELDED, BLOCKED = 1, 2, 3
+        state = np.zeros(n, dtype=np.int8)
+        undecided = rank
+        moved = rank[:0]
+        first = self._first
+        while undecided.size:
+            # Anterior sin decidir más temprano por celda (origen o destino) y por rotonda
+            cells = np.concatenate((cur[undecided], nxt[undecided]))
+            np.minimum.at(first, cells, np.concatenate((undecided, undecided)))
+            wait = first[nxt[undecided]] < undecided
+            first[cells] = _NOBODY
+            at_entry = entry[undecided] >= 0
+            if at_entry.any():
+                touch = np.concatenate((cur_rid[undecided], nxt_rid[undecided]))
+                in_ring = touch >= 0
+                ring_first = np.full(self.num_roundabouts, n, dtype=np.int64)
+                np.minimum.at(ring_first, touch[in_ring], np.concatenate((undecided, undecided))[in_ring])
+                e_rid = self.entry_rid[entry[undecided[at_entry]]]
+                wait[at_entry] |= ring_first[e_rid] < undecided[at_entry]
+            ready = undecided[~wait]
+            undecided = undecided[wait]
+
+            # Efecto de los movimientos ya decididos, por celda y por rotonda
+            stays = ~arrives[moved]
+            cell_delta = _ranked_sums(np.concatenate((cur[moved], nxt[moved])), np.concatenate((moved, moved)),
+                                      np.concatenate((np.full(moved.size, -1), stays.astype(np.int64))), n)
+
+            def occ_at(c, k):
+                """Ocupación de las celdas c cuando le toca al rango k"""
+                return occ[c] + cell_delta(c, k)
+
+            # Ceder en la rotonda con el anillo como lo dejaron los anteriores
+            e_ready = ready[entry[ready] >= 0]
+            if e_ready.size:
+                leave = cur_rid[moved] >= 0
+                enter = (nxt_rid[moved] >= 0) & stays
+                ring_delta = _ranked_sums(
+                    np.concatenate((cur_rid[moved][leave], nxt_rid[moved][enter])),
+                    np.concatenate((moved[leave], moved[enter])),
+                    np.concatenate((np.full(leave.sum(), -1), np.ones(enter.sum(), dtype=np.int64))), n)
+                e_idx = entry[e_ready]
+                rid = self.entry_rid[e_idx]
+                inside = counts0[rid] + ring_delta(rid, e_ready) - self.ring_mask[cur[e_ready]]
+                sizes = self.watch_ptr[e_idx + 1] - self.watch_ptr[e_idx]
+                owner = np.repeat(np.arange(e_ready.size), sizes)
+                offsets = np.arange(owner.size) - np.repeat(np.cumsum(sizes) - sizes, sizes)
+                watched = self.watch_cells[self.watch_ptr[e_idx][owner] + offsets]
+                near = np.bincount(owner, weights=occ_at(watched, e_ready[owner]) > 0,
+                                   minlength=e_ready.size) > 0
+                state[e_ready[(inside >= capacity) | near]] = YIELDED
+                ready = ready[state[ready] == 0]
+
+            free = ~self.red[nxt[ready]] & (occ_at(nxt[ready], ready) == 0)
+            state[ready[free]] = MOVED
+            state[ready[~free]] = BLOCKED
+            moved = np.flatnonzero(state == MOVED)
+
+        movers = slots[moved]
+        np.subtract.at(occ, cur[moved], 1)
+        np.add.at(occ, nxt[moved], 1)
+        self.pos[movers] = nxt[moved]
+        self.cursor[movers] += 1
+        self._arrive(movers[arrives[moved]])   # en orden del paso, como remove_vehicle
+
+        yielded = slots[state == YIELDED]
+        blocked = slots[state == BLOCKED]
+        self.yield_steps[yielded] += 1
+        self.blocked_steps[blocked] += 1
+        self.model.vehicles_yielding += int(yielded.size)
+        self.model.vehicles_blocked += int(blocked.size)
+
+    def step_reservation(self):
+        """Paso síncrono por reservas (ver reservation.py): no depende del orden ni usa el RNG"""
+        active = np.flatnonzero(self.active)
+        if active.size == 0:
+            return
+        cur = self.pos[active]
+        nxt = self.route_cells[self.cursor[active]]
+        movers, yielding = self.rules.resolve(cur, nxt, self.vehicle_id[active], self.occupancy,
+                                              self.red, self.model.roundabout_capacity)
+        yields = int(yielding.sum())
+        self.model.vehicles_yielding += yields
+        self.model.vehicles_blocked += active.size - movers.size - yields
+        stalled = ~yielding
+        stalled[movers] = False
+        self.yield_steps[active[yielding]] += 1
+        self.blocked_steps[active[stalled]] += 1
+        if movers.size == 0:
+            return
+        winners = active[movers]
+        targets = nxt[movers]
+        np.subtract.at(self.occupancy, self.pos[winners], 1)
+        self.occupancy[targets] += 1
+        self.pos[winners] = targets
+        self.cursor[winners] += 1
+        self._arrive(winners[self.cursor[winners] >= self.route_end[winners]])
+
+    def _arrive(self, slots):
+        if slots.size == 0:
+            return
+        np.subtract.at(self.occupancy, self.pos[slots], 1)
+        self.active[slots] = False
+        self.num_active -= slots.size
+        travel = slots.size * (self.model.step_count + 1) - int(self.spawn_step[slots].sum())
+        self.model.record_arrivals(int(slots.size), travel)
+        keys = [self.route_keys[slot] for slot in slots.tolist()]
+        self.model.record_trips(self.vehicle_id[slots], [k[0] for k in keys], [k[1] for k in keys],
+                                self.spawn_step[slots], self.blocked_steps[slots], self.yield_steps[slots])
+        for slot in slots.tolist():
+            self.route_keys.pop(slot, None)
+            self.free_slots.append(slot)
+
+    def positions(self):
+        """Posiciones (x, y) de los vehículos activos como arreglo (N, 2)"""
+        cids = self.pos[self.active]
+        return np.column_stack((cids // self.height, cids % self.height))
+
+    def sync_agents(self):
+        """
+        Refleja la flota en la grilla de Mesa con VehicleAgent espejo.
+        Solo hace falta para visualizar; devuelve la lista de espejos activos.
+        """
+        grid = self.model.grid
+        for slot in list(self.agents):
+            # El slot pudo liberarse o reutilizarse para otro vehículo
+            if not self.active[slot] or self.agents[slot].vehicle_id != self.vehicle_id[slot]:
+                proxy = self.agents.pop(slot)
+                grid.remove_agent(proxy)
+                proxy.remove()
+        for slot in np.flatnonzero(self.active).tolist():
+            pos = self.cell_pos(self.pos[slot])
+            start, end = self.route_offsets[self.route_keys[slot]]
+            proxy = self.agents.get(slot)
+            if proxy is None:
+                start_id, dest_id = self.route_keys[slot]
+                proxy = VehicleAgent(f"Car_{self.vehicle_id[slot]}", self.model,
+                                     self.model.parking_nodes[start_id], self.model.parking_nodes[dest_id])
+                proxy.vehicle_id = int(self.vehicle_id[slot])
+                proxy.route_key = (start_id, dest_id)
+                grid.place_agent(proxy, pos)
+                self.agents[slot] = proxy
+            elif proxy.pos != pos:
+                grid.move_agent(proxy, pos)
+            proxy.path = [self.cell_pos(c) for c in self.route_cells[self.cursor[slot]:end]]
+        return list(self.agents.values())
@@ -0,0 +1,258 @@
+"""
+Exportación de métricas en streaming mientras corre la simulación.
+
+TrafficModel empuja un registro por paso a una cola acotada y un hilo escritor
+los agrupa en bloques de batch_steps pasos y los agrega a disco; la memoria no
+crece con la duración de la corrida y los archivos se pueden leer (tail) en vivo.
+Si la cola se llena, el paso espera al escritor (presión hacia atrás).
+
+Tablas (una por archivo, columnas fijas):
+    steps    step, active, spawned, arrived, blocked, yielding
+    lights   step, light, queue      cola detrás de cada semáforo (índice en traffic_lights)
+    trips    vehicle_id, origin, destination, spawn_step, arrival_step, travel_time,
+             blocked_steps, yield_steps
+    parking  step, parking_id, departures, arrivals   (solo estacionamientos con movimiento)
+
+step es el número de pasos ya simulados (como en TrajectoryRecorder). Formatos:
+    "csv"    <tabla>.csv con encabezado
+    "jsonl"  <tabla>.jsonl, un objeto por fila
+    "npz"    <tabla>_00000.npz, ... un bloque columnar por escritura (read_table los une)
+"""
+import csv
+import glob
+import json
+import os
+import queue
+import threading
+
+import numpy as np
+
+FORMATS = ("csv", "jsonl", "npz")
+TABLES = {
+    "steps": ("step", "active", "spawned", "arrived", "blocked", "yielding"),
+    "lights": ("step", "light", "queue"),
+    "trips": ("vehicle_id", "origin", "destination", "spawn_step", "arrival_step", "travel_time",
+              "blocked_steps", "yield_steps"),
+    "parking": ("step", "parking_id", "departures", "arrivals"),
+}
+_STOP = object()
+
+
+class LightQueues:
+    """
+    Largo de la cola detrás de cada semáforo.
+
+    Para cada semáforo se arma (una vez) el árbol de celdas que llegan a él recorriendo
+    el grafo hacia atrás hasta depth aristas. La cola son las celdas del árbol ocupadas
+    y unidas al semáforo solo por celdas ocupadas; se calcula por niveles en lote.
+    """
+    def __init__(self, model, depth=10):
+        height = model.grid.height
+        graph = model.graph
+        cells, parents, owners, levels = [], [], [], []
+        for light_index, light in enumerate(model.traffic_lights):
+            root = light.pos
+            if root not in graph:
+                continue
+            seen = {root}
+            frontier = [(root, -1)]
+            for level in range(depth):
+                nxt = []
+                for node, parent in frontier:
+                    for pred in graph.predecessors(node):
+                        if pred in seen:
+                            continue
+                        seen.add(pred)
+                        cells.append(pred[0] * height + pred[1])
+                        parents.append(parent)
+                        owners.append(light_index)
+                        levels.append(level)
+                        nxt.append((pred, len(cells) - 1))
+                frontier = nxt
+        self.num_lights = len(model.traffic_lights)
+        self.cells = np.array(cells, dtype=np.int64)
+        self.parents = np.array(parents, dtype=np.int64)
+        self.owners = np.array(owners, dtype=np.int64)
+        levels = np.array(levels, dtype=np.int64)
+        self.levels = [np.flatnonzero(levels == d) for d in range(1, depth)]
+
+    def compute(self, occupancy):
+        """Vehículos en cola por semáforo según la ocupación (arreglo plano por celda)"""
+        queued = occupancy[self.cells] > 0
+        for nodes in self.levels:
+            queued[nodes] &= queued[self.parents[nodes]]
+        return np.bincount(self.owners, weights=queued, minlength=self.num_lights).astype(np.int64)
+
+
+class MetricsStream:
+    """Sumidero de métricas: cola acotada + hilo escritor en batch_steps pasos"""
+    def __init__(self, path, format="csv", batch_steps=64, queue_size=256, queue_depth=10):
+        if format not in FORMATS:
+            raise ValueError(f"format debe ser uno de {FORMATS}, no {format!r}")
+        self.path = path
+        self.format = format
+        self.batch_steps = batch_steps
+        self.queue_depth = queue_depth
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.error = None
+        self.queues = None
+        self._trips = []
+        self._departures = []
+        os.makedirs(path, exist_ok=True)
+        self._files = {}
+        self._chunks = dict.fromkeys(TABLES, 0)
+        self._thread = threading.Thread(target=self._run, name="metrics-writer", daemon=True)
+        self._thread.start()
+
+    def bind(self, model):
+        """Prepara las tablas que dependen del mapa (colas de semáforos, estacionamientos)"""
+        self.queues = LightQueues(model, self.queue_depth)
+        self.parking_ids = list(model.parking_ids)
+        self.parking_index = {pid: i for i, pid in enumerate(self.parking_ids)}
+
+    # --- LADO DE LA SIMULACIÓN ---
+    def departure(self, parking_id):
+        self._departures.append(parking_id)
+
+    def trips(self, vehicle_ids, origins, destinations, spawn_steps, arrival_step, blocked_steps, yield_steps):
+        """Viajes terminados en el paso actual (arreglos alineados)"""
+        spawn_steps = np.asarray(spawn_steps, dtype=np.int64)
+        arrival = np.full(spawn_steps.size, arrival_step, dtype=np.int64)
+        self._trips.append(tuple(np.asarray(col, dtype=np.int64) for col in (
+            vehicle_ids, origins, destinations, spawn_steps, arrival, arrival - spawn_steps,
+            blocked_steps, yield_steps)))
+
+    def record_step(self, model):
+        """Registro del paso recién terminado (model.step_count ya incrementado)"""
+        step = model.step_count
+        occupancy = model.vehicle_occupancy.reshape(-1)
+        if model.engine_name == "sharded":
+            # El modelo principal solo lleva la ocupación de los estacionamientos
+            positions = model.vehicle_positions()
+            cells = positions[:, 0] * model.grid.height + positions[:, 1]
+            occupancy = np.bincount(cells, minlength=occupancy.size)
+        queue_len = self.queues.compute(occupancy)
+        record = {
+            "steps": np.array([[step, model.vehicles_active, model.vehicles_spawned, model.vehicles_arrived,
+                                model.vehicles_blocked, model.vehicles_yielding]], dtype=np.int64),
+            "lights": np.column_stack((np.full(queue_len.size, step), np.arange(queue_len.size), queue_len)),
+        }
+        trips = None
+        if self._trips:
+            trips = np.column_stack([np.concatenate(c) for c in zip(*self._trips)])
+            record["trips"] = trips
+            self._trips = []
+        if self._departures or trips is not None:
+            n = len(self.parking_ids)
+            out = np.bincount([self.parking_index[p] for p in self._departures], minlength=n)
+            into = np.bincount([self.parking_index[p] for p in trips[:, 2].tolist()], minlength=n) \
+                if trips is not None else np.zeros(n, dtype=np.int64)
+            moved = np.flatnonzero(out + into)
+            ids = np.array(self.parking_ids, dtype=np.int64)[moved]
+            record["parking"] = np.column_stack((np.full(moved.size, step), ids, out[moved], into[moved]))
+            self._departures = []
+        self._put(record)
+
+    def record_idle(self, model, k):
+        """
+        k pasos sin vehículos (run_until): mismos contadores, colas vacías.
+        model.step_count es el primer paso del tramo, todavía sin incrementar.
+        Se encola en bloques de batch_steps pasos: la memoria no crece con k.
+        """
+        values = [model.vehicles_active, model.vehicles_spawned, model.vehicles_arrived,
+                  model.vehicles_blocked, model.vehicles_yielding]
+        n = self.queues.num_lights
+        first = model.step_count + 1
+        for start in range(0, k, self.batch_steps):
+            steps = first + np.arange(start, min(start + self.batch_steps, k), dtype=np.int64)
+            size = steps.size
+            self._put({
+                "steps": np.column_stack([steps] + [np.full(size, v, dtype=np.int64) for v in values]),
+                "lights": np.column_stack((np.repeat(steps, n), np.tile(np.arange(n), size),
+                                           np.zeros(size * n, dtype=np.int64))),
+            })
+
+    def _put(self, record):
+        if self.error is not None:
+            raise RuntimeError("falló el escritor de métricas") from self.error
+        self.queue.put(record)
+
+    def close(self):
+        """Vacía la cola, escribe lo pendiente y espera al hilo escritor"""
+        if self._thread.is_alive():
+            self.queue.put(_STOP)
+            self._thread.join()
+        if self.error is not None:
+            raise RuntimeError("falló el escritor de métricas") from self.error
+
+    # --- HILO ESCRITOR ---
+    def _run(self):
+        pending = {name: [] for name in TABLES}
+        steps = 0
+        try:
+            while True:
+                record = self.queue.get()
+                if record is _STOP:
+                    break
+                for name, rows in record.items():
+                    pending[name].append(rows)
+                steps += len(record["steps"])
+                if steps >= self.batch_steps:
+                    self._write(pending)
+                    steps = 0
+            self._write(pending)
+        except Exception as exc:   # se reporta en el hilo de la simulación
+            self.error = exc
+            # Seguir vaciando la cola para que la simulación no quede bloqueada en put()
+            while self.queue.get() is not _STOP:
+                pass
+        finally:
+            for f in self._files.values():
+                f.close()
+
+    def _write(self, pending):
+        for name, blocks in pending.items():
+            if not blocks:
+                continue
+            rows = np.concatenate(blocks)
+            blocks.clear()
+            if self.format == "npz":
+                chunk = os.path.join(self.path, f"{name}_{self._chunks[name]:05d}.npz")
+                np.savez(chunk, **{col: rows[:, j] for j, col in enumerate(TABLES[name])})
+                self._chunks[name] += 1
+                continue
+            f = self._file(name)
+            if self.format == "csv":
+                csv.writer(f).writerows(rows.tolist())
+            else:
+                columns = TABLES[name]
+                f.writelines(json.dumps(dict(zip(columns, row))) + "\n" for row in rows.tolist())
+            f.flush()
+
+    def _file(self, name):
+        f = self._files.get(name)
+        if f is None:
+            f = open(os.path.join(self.path, f"{name}.{self.format}"), "w", newline="")
+            if self.format == "csv":
+                csv.writer(f).writerow(TABLES[name])
+            self._files[name] = f
+        return f
+
+
+def read_table(path, name):
+    """Una tabla escrita por MetricsStream como {columna: arreglo int64}"""
+    columns = TABLES[name]
+    if os.path.exists(os.path.join(path, f"{name}.csv")):
+        rows = np.loadtxt(os.path.join(path, f"{name}.csv"), delimiter=",", skiprows=1,
+                          dtype=np.int64, ndmin=2).reshape(-1, len(columns))
+    elif os.path.exists(os.path.join(path, f"{name}.jsonl")):
+        with open(os.path.join(path, f"{name}.jsonl")) as f:
+            rows = np.array([[json.loads(line)[c] for c in columns] for line in f],
+                            dtype=np.int64).reshape(-1, len(columns))
+    else:
+        chunks = sorted(glob.glob(os.path.join(path, f"{name}_*.npz")))
+        if not chunks:
+            return {col: np.zeros(0, dtype=np.int64) for col in columns}
+        parts = [np.load(chunk) for chunk in chunks]
+        return {col: np.concatenate([p[col] for p in parts]) for col in columns}
+    return {col: rows[:, j] for j, col in enumerate(columns)}
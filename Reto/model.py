@@ -1,9 +1,21 @@
+import time
 import mesa
 from mesa import Model
-from mesa.datacollection import DataCollector
-import networkx as nx
+import numpy as np
 from agents import VehicleAgent, TrafficLightAgent, TrafficManagerAgent
 from mesa.space import MultiGrid
+from spatial import GridNodeIndex
+from csr import GraphBuilder
+from engine import BatchVehicleEngine
+from sharded import ShardedEngine
+from profiling import StepProfiler
+from timeseries import TimeSeriesCollector
+from demand import SpawnScheduler
+from reroute import CongestionRouter
+from trajectory import LIGHT_CODES, TrajectoryRecorder
+from metrics import MetricsStream
+from stats import TripStats
+import checkpoint
 
 # --- CONSTANTES DE TIPOS DE CELDA ---
 BUILDING = 0
@@ -12,24 +24,143 @@ ROUNDABOUT = 2
 PARKING = 3
 INTERSECTION_ENTRY = 4  # <--- NUEVO TIPO
 
+ENGINES = ("agents", "batch", "sharded")
+UPDATES = ("sequential", "reservation")   # ver reservation.py
+EAGER_ROUTE_LIMIT = 64  # Con más estacionamientos las rutas se calculan bajo demanda
+
 class TrafficModel(Model):
-    def __init__(self, num_vehicles=400): 
-        super().__init__()
+    def __init__(self, num_vehicles=400, engine="agents", profile=False, profile_maxlen=None,
+                 spawn_cooldown=30, roundabout_capacity=4, green_time=40, seed=None, city=None,
+                 record=None, series_maxlen=None, demand=None,
+                 reroute=False, update=None, regions=(2, 1), metrics=None):
+        super().__init__(seed=seed)
+        if engine not in ENGINES:
+            raise ValueError(f"engine debe ser uno de {ENGINES}, no {engine!r}")
+        if update is None:
+            # "sharded" solo tiene sentido con reglas que no dependen del orden
+            update = "reservation" if engine == "sharded" else "sequential"
+        if update not in UPDATES:
+            raise ValueError(f"update debe ser uno de {UPDATES}, no {update!r}")
+        if engine == "sharded" and update != "reservation":
+            raise ValueError('engine="sharded" requiere update="reservation"')
+        self.update = update
+        self.engine_name = engine
         self.num_vehicles = num_vehicles 
         self.vehicles_spawned = 0        
         self.step_count = 0
-        self.spawn_cooldown = 30 
+        self.spawn_cooldown = spawn_cooldown 
+        self.green_time = green_time
+        # Llegadas y tiempos de viaje (en pasos) para resúmenes de corridas
+        self.vehicles_arrived = 0
+        self.total_travel_time = 0
+        self.last_arrival_step = None
+        # Tiempo de viaje y esperas por par origen-destino (acumuladores en línea, ver stats.py)
+        self.trip_stats = TripStats()
+        # Contadores que se actualizan donde ocurre cada evento (collect() solo los lee)
+        self.vehicles_active = 0
+        self.vehicles_blocked = 0     # bloqueados por rojo u ocupación en el último paso
+        self.vehicles_yielding = 0    # cediendo en rotonda en el último paso
+        # Instrumentación por fase (apagada por defecto); ver profiler.report()
+        # con profile_maxlen la línea de tiempo guarda solo los últimos pasos
+        self.profiler = StepProfiler(enabled=profile, maxlen=profile_maxlen)
         self.parking_schedule = {} 
         
-        self.grid = MultiGrid(width=25, height=25, torus=False)
-        self.agents_list = [] 
+        width, height = (25, 25) if city is None else (city.width, city.height)
+        self.grid = MultiGrid(width=width, height=height, torus=False)
+        # Mapas densos para can_move_to: vehículos por celda y celdas con semáforo en rojo
+        self.vehicle_occupancy = np.zeros((self.grid.width, self.grid.height), dtype=np.int32)
+        self.red_cells = np.zeros((self.grid.width, self.grid.height), dtype=bool)
+        # Registro por tipo: los semáforos son pasivos y solo se barajan los vehículos
+        self.managers = []
+        self.traffic_lights = [] 
+        self.vehicles = []            # activos; cada uno guarda su índice para quitarlo en O(1)
+        self._arrivals = []           # llegados en el paso actual, se quitan al final
+        self.reservations = {}        # celda -> vehículo que la reservó (modo "reservation")
+        self.roundabout_capacity = roundabout_capacity  # Máximo de coches dentro de cada rotonda
+        self.route_table = None
+        self.pairwise_routes = False  # ver _build_route
+
+        if city is None:
+            self.build_default_city()
+        else:
+            self.load_city(city)
+
+        for pid in self.parking_spots:
+            self.parking_schedule[pid] = -self.spawn_cooldown
+        # --- GENERACIÓN DE VEHÍCULOS ---
+        # Estacionamientos por fin de cooldown; demand (DemandModel) reemplaza el
+        # spawn "cada estacionamiento libre con destino uniforme" por viajes origen-destino
+        self.parking_ids = list(self.parking_spots)
+        self.parking_order = {pid: i for i, pid in enumerate(self.parking_ids)}
+        self.spawner = SpawnScheduler(self.parking_ids, self.spawn_cooldown, self.parking_schedule)
+        self.demand = demand
+
+        # --- TABLA DE RUTAS ENTRE ESTACIONAMIENTOS ---
+        self.build_route_table()
+
+        # --- MOTOR DE VEHÍCULOS ---
+        # "agents": un VehicleAgent por coche; "batch": flota vectorizada en BatchVehicleEngine;
+        # "sharded": la flota repartida por regiones en varios procesos (ver sharded.py)
+        if engine == "batch":
+            self.engine = BatchVehicleEngine(self)
+        elif engine == "sharded":
+            params = {"roundabout_capacity": roundabout_capacity, "green_time": green_time}
+            self.engine = ShardedEngine(self, city, params, regions)
+        else:
+            self.engine = None
+
+        # --- RERUTEO POR CONGESTIÓN (opcional, solo "agents": el motor batch usa rutas fijas) ---
+        if reroute and self.engine is not None:
+            raise ValueError("reroute solo está disponible con engine=\"agents\"")
+        self.reroute = reroute
+        self.router = CongestionRouter(self) if reroute else None
+
+        # --- MÉTRICAS EN STREAMING (opcional: directorio o MetricsStream en metrics) ---
+        if isinstance(metrics, str):
+            metrics = MetricsStream(metrics)
+        self.metrics = metrics
+        if metrics is not None:
+            metrics.bind(self)
+            
+        # Series por paso en arreglos tipados; con series_maxlen solo se guardan los últimos pasos
+        self.datacollector = TimeSeriesCollector(
+            model_reporters={
+                "Total_Vehicles": "vehicles_active",
+                "Arrived": "vehicles_arrived",
+                "Blocked": "vehicles_blocked",
+                "Yielding": "vehicles_yielding",
+            },
+            maxlen=series_maxlen,
+        )
+        self.spawn_vehicles()
+
+        # --- GRABACIÓN DE TRAYECTORIAS (opcional, directorio en record) ---
+        self.recorder = None
+        if record is not None:
+            self.recorder = TrajectoryRecorder.for_model(self, record)
+            self.recorder.record_model(self)
+        
+        # --- DEBUG: Ver nodos con múltiples salidas ---
+        # print("Nodos con 2+ salidas (posibles bifurcaciones):")
+        # for node in self.graph.nodes:
+        #     successors = list(self.graph.successors(node))
+        #     if len(successors) >= 2:
+        #         print(f"  {node} → {successors}")
+        
+
+    
+    def build_default_city(self):
+        """Mapa fijo de 25x25 con una rotonda central y cuatro cruces con semáforo"""
         self.city_layout = [[BUILDING for y in range(25)] for x in range(25)]
-        self.graph = nx.DiGraph()
+        self.graph = GraphBuilder()
         self.parking_spots = {} 
-        self.traffic_lights = [] 
         
-        # Construimos el mapa base
+        # Rutas por par como nx.shortest_path: mismas rutas que la versión original del mapa
+        self.pairwise_routes = True
+
+        # Construimos el mapa base y lo congelamos en CSR (ver csr.py)
         self.build_city_graph()
+        self.graph = self.graph.to_csr(self.grid.width, self.grid.height)
         
         # --- DEFINICIÓN MANUAL DE INTERSECCIONES (STOP SIGNS) ---
         # Estas son las coordenadas JUSTO ANTES de entrar a un cruce sin semáforo.
@@ -50,63 +181,33 @@ class TrafficModel(Model):
         ]
         
         # --- CONFIGURACIÓN DE ROTONDA ---
-        self.roundabout_ring = {
+        ring = {
             (8,8), (8,9), (8,10), (8,11), (8,12),
             (9,8), (9,12), (10,8), (10,12), (11,8), (11,12),
             (12,8), (12,9), (12,10), (12,11), (12,12)
         }
 
         # Puntos donde los vehículos deben ceder antes de entrar
-        self.roundabout_entries = {
+        entries = {
             (8, 7), (9, 7),    # Desde arriba
             (7, 11), (7, 12),  # Desde la izquierda
             (11, 13), (12, 13), # Desde abajo
             (13, 8), (13, 9)   # Desde la derecha
         }
-
-        self.roundabout_capacity = 4  # Máximo de coches dentro
-        
+        self.setup_roundabouts([(ring, entries)])
 
         # ===================================================
-        #       1. GESTORES DE TRÁFICO
+        #       1. GESTORES DE TRÁFICO Y SEMÁFOROS
         # ===================================================
-        # ... (EL RESTO DE TU CÓDIGO DE MANAGERS SIGUE IGUAL) ...
-        # Copia aquí el resto de tu __init__ original (Managers, Semáforos, Parking, DataCollector)
-        
-        # --- GRUPO 1 ---
-        m1_1 = TrafficManagerAgent("Manager1.1", self, green_time=40)
-        m1_2 = TrafficManagerAgent("Manager1.2", self, green_time=40)
-        m1_1.set_next(m1_2); m1_2.set_next(m1_1); m1_1.activate()
-        
-        m2_1 = TrafficManagerAgent("Manager2.1", self, green_time=40)
-        m2_2 = TrafficManagerAgent("Manager2.2", self, green_time=40)
-        m2_1.set_next(m2_2); m2_2.set_next(m2_1); m2_1.activate()
-        
-        m3_1 = TrafficManagerAgent("Manager3.1", self, green_time=40)
-        m3_2 = TrafficManagerAgent("Manager3.2", self, green_time=40)
-        m3_1.set_next(m3_2); m3_2.set_next(m3_1); m3_1.activate()
-        
-        m4_1 = TrafficManagerAgent("Manager4.1", self, green_time=40)
-        m4_2 = TrafficManagerAgent("Manager4.2", self, green_time=40)
-        m4_1.set_next(m4_2); m4_2.set_next(m4_1); m4_1.activate()
-        
-        self.agents_list.extend([m1_1, m1_2, m2_1, m2_2, m3_1, m3_2, m4_1, m4_2])
-        
-        # --- SEMAFOROS ---
-        light_position = [
-            (0, 3, m1_1), (1, 3, m1_1), (2, 4, m1_2), (2, 5, m1_2), (2, 8, m1_2), (2, 9, m1_2),
-            (7, 23, m2_1), (7, 24, m2_1), (8, 22, m2_2), (9, 22, m2_2),
-            (16, 23, m2_1), (16, 24, m2_1), (17, 22, m2_2), (18, 22, m2_2),
-            (11, 2, m3_1), (12, 2, m3_1), (13, 0, m3_2), (13, 1, m3_2),
-            (22, 4, m4_1), (22, 5, m4_1), (22, 11, m4_1), (22, 12, m4_1),
-            (23, 6, m4_2), (24, 6, m4_2), (23, 13, m4_2), (24, 13, m4_2),
-        ]
-        for (x, y, manager) in light_position:
-            pos = (x, y)
-            tl_agent = TrafficLightAgent(f"TL_{x}_{y}", self, manager)
-            self.grid.place_agent(tl_agent, pos)
-            self.agents_list.append(tl_agent)
-            self.traffic_lights.append(tl_agent)
+        # (x, y, grupo, fase): los gestores de un grupo se alternan en orden de fase
+        self.create_signals([
+            (0, 3, 0, 0), (1, 3, 0, 0), (2, 4, 0, 1), (2, 5, 0, 1), (2, 8, 0, 1), (2, 9, 0, 1),
+            (7, 23, 1, 0), (7, 24, 1, 0), (8, 22, 1, 1), (9, 22, 1, 1),
+            (16, 23, 1, 0), (16, 24, 1, 0), (17, 22, 1, 1), (18, 22, 1, 1),
+            (11, 2, 2, 0), (12, 2, 2, 0), (13, 0, 2, 1), (13, 1, 2, 1),
+            (22, 4, 3, 0), (22, 5, 3, 0), (22, 11, 3, 0), (22, 12, 3, 0),
+            (23, 6, 3, 1), (24, 6, 3, 1), (23, 13, 3, 1), (24, 13, 3, 1),
+        ])
 
         # --- PARKINGS ---
         self.parking_spots = {
@@ -115,77 +216,472 @@ class TrafficModel(Model):
              9: (3, 3), 10: (7, 6), 11: (14, 3), 12: (15, 6), 13: (20, 7),
              14: (6, 15), 15: (6, 18), 16: (15, 15), 17: (19, 20)
         }
-        for pid in self.parking_spots:
-            self.parking_schedule[pid] = -self.spawn_cooldown
-            
-        self.datacollector = DataCollector(
-            model_reporters={
-                "Total_Vehicles": lambda m: sum(1 for a in m.agents_list if isinstance(a, VehicleAgent)),
-                "Arrived": lambda m: m.vehicles_spawned - sum(1 for a in m.agents_list if isinstance(a, VehicleAgent))
-            }
-        )
-        self.spawn_vehicles()
-        
-        # --- DEBUG: Ver nodos con múltiples salidas ---
-        # print("Nodos con 2+ salidas (posibles bifurcaciones):")
-        # for node in self.graph.nodes:
-        #     successors = list(self.graph.successors(node))
-        #     if len(successors) >= 2:
-        #         print(f"  {node} → {successors}")
+
+    def load_city(self, city):
+        """Carga una ciudad generada (city.CityPlan); el grafo se comparte, no se copia"""
+        self.city_layout = [list(column) for column in city.city_layout]
+        self.graph = city.graph
+        self.node_index = GridNodeIndex(self.grid.width, self.grid.height, self.graph.nodes)
+        self.stop_lines = list(city.stop_lines)
+        self.setup_roundabouts(city.roundabouts)
+        self.create_signals(city.signals)
+        self.parking_spots = dict(city.parking_spots)
+        if city.routes is not None:
+            self.route_table = dict(city.routes)
+
+    def setup_roundabouts(self, roundabouts):
+        """
+        roundabouts: lista de (celdas del anillo, celdas de entrada).
+        Cada rotonda tiene su propio conteo de ocupación.
+        """
+        self.roundabout_ring = set()
+        self.roundabout_entries = set()
+        self.roundabout_id = {}     # celda del anillo o de entrada -> índice de rotonda
+        self.roundabout_watch = {}  # entrada -> celdas de su anillo a distancia Manhattan <= 2
+        for rid, (ring, entries) in enumerate(roundabouts):
+            self.roundabout_ring |= set(ring)
+            self.roundabout_entries |= set(entries)
+            for cell in ring: self.roundabout_id[cell] = rid
+            for entry in entries:
+                self.roundabout_id[entry] = rid
+                self.roundabout_watch[entry] = tuple(
+                    c for c in ring if abs(c[0] - entry[0]) + abs(c[1] - entry[1]) <= 2)
+        # Ocupación incremental del anillo (se actualiza en move_vehicle / remove_vehicle)
+        self.roundabout_cells = {}  # celda del anillo -> número de vehículos en ella
+        self.roundabout_counts = [0] * len(roundabouts)
+
+    def create_signals(self, signals):
+        """
+        Crea un TrafficManagerAgent por (grupo, fase) y un TrafficLightAgent por posición.
+        signals: lista de (x, y, grupo, fase).
+        """
+        self.signals = list(signals)
+        phases = {}
+        for (_, _, group, phase) in signals:
+            phases[group] = max(phases.get(group, 0), phase + 1)
+        managers = {}
+        self.managers = []
+        for group, count in phases.items():
+            cycle = [TrafficManagerAgent(f"Manager{group + 1}.{phase + 1}", self, green_time=self.green_time)
+                     for phase in range(count)]
+            for phase, manager in enumerate(cycle):
+                manager.group = group
+                manager.set_next(cycle[(phase + 1) % count])
+                managers[(group, phase)] = manager
+            cycle[0].activate()
+            self.managers.extend(cycle)
         
+        # --- SEMAFOROS ---
+        for (x, y, group, phase) in signals:
+            pos = (x, y)
+            manager = managers[(group, phase)]
+            tl_agent = TrafficLightAgent(f"TL_{x}_{y}", self, manager)
+            self.grid.place_agent(tl_agent, pos)
+            manager.add_light(tl_agent)
+            self.traffic_lights.append(tl_agent)
 
-    
     def get_nearest_node(self, pos):
-        return min(self.graph.nodes, key=lambda n: (n[0]-pos[0])**2 + (n[1]-pos[1])**2)
+        return self.node_index.nearest(pos)
+
+    def move_vehicle(self, vehicle, pos):
+        """Mueve un vehículo en la grilla manteniendo los índices de ocupación"""
+        self._leave_cell(vehicle.pos)
+        self.grid.move_agent(vehicle, pos)
+        self._enter_cell(pos)
+
+    def remove_vehicle(self, vehicle):
+        """Saca de la grilla un vehículo que llegó a su destino"""
+        self._leave_cell(vehicle.pos)
+        self.grid.remove_agent(vehicle)
+        self._arrivals.append(vehicle)
+        vehicle.arrival_step = self.step_count + 1
+        self.record_arrivals(1, vehicle.arrival_step - vehicle.spawn_step)
+        start_id, dest_id = vehicle.route_key
+        self.record_trips([vehicle.vehicle_id], [start_id], [dest_id], [vehicle.spawn_step],
+                          [vehicle.blocked_steps], [vehicle.yield_steps])
+
+    def record_arrivals(self, count, travel_time):
+        """
+        Registra llegadas; travel_time es la suma de pasos desde el spawn.
+        Una llegada durante el paso k cuenta como ocurrida en k + 1.
+        """
+        self.vehicles_arrived += count
+        self.vehicles_active -= count
+        self.total_travel_time += travel_time
+        self.last_arrival_step = self.step_count + 1
+
+    def record_trips(self, vehicle_ids, origins, destinations, spawn_steps, blocked_steps, yield_steps):
+        """
+        Viajes individuales que llegan en este paso (secuencias alineadas): se pliegan
+        en trip_stats y, con metrics, se exportan.
+        """
+        arrival = self.step_count + 1
+        travel = [arrival - int(s) for s in spawn_steps]
+        self.trip_stats.add_many([int(o) for o in origins], [int(d) for d in destinations], travel,
+                                 [int(b) for b in blocked_steps], [int(y) for y in yield_steps])
+        if self.metrics is not None:
+            self.metrics.trips(vehicle_ids, origins, destinations, spawn_steps, arrival,
+                               blocked_steps, yield_steps)
+
+    def is_finished(self):
+        """Todos los vehículos se generaron y llegaron a su destino"""
+        return self.vehicles_spawned >= self.num_vehicles and self.vehicles_arrived >= self.vehicles_spawned
+
+    def _enter_cell(self, pos):
+        self.vehicle_occupancy[pos] += 1
+        if pos in self.roundabout_ring:
+            self.roundabout_cells[pos] = self.roundabout_cells.get(pos, 0) + 1
+            self.roundabout_counts[self.roundabout_id[pos]] += 1
+
+    def _leave_cell(self, pos):
+        self.vehicle_occupancy[pos] -= 1
+        if pos in self.roundabout_cells:
+            self.roundabout_cells[pos] -= 1
+            if self.roundabout_cells[pos] == 0:
+                del self.roundabout_cells[pos]
+            self.roundabout_counts[self.roundabout_id[pos]] -= 1
+
+    def build_route_table(self):
+        """
+        Precalcula la ruta más corta entre cada par de estacionamientos.
+        route_table[(origen, destino)] es una tupla de nodos, o None si no hay camino.
+        En ciudades con muchos estacionamientos la tabla se llena bajo demanda (get_route).
+        """
+        self.parking_nodes = {pid: self.get_nearest_node(pos) for pid, pos in self.parking_spots.items()}
+        if self.route_table is not None:
+            return  # Rutas precalculadas por la ciudad
+        self.route_table = {}
+        if len(self.parking_spots) > EAGER_ROUTE_LIMIT:
+            return
+        for start_id in self.parking_spots:
+            if self.pairwise_routes:
+                for dest_id in self.parking_spots:
+                    if dest_id != start_id:
+                        self._build_route(start_id, dest_id)
+            else:
+                self._build_routes_from(start_id)
+
+    def _build_route(self, start_id, dest_id):
+        """
+        Dijkstra bidireccional por par, como nx.shortest_path: con costos empatados
+        elige el mismo camino (un árbol desde el origen desempata distinto)
+        """
+        path = self.graph.shortest_path(self.parking_nodes[start_id], self.parking_nodes[dest_id])
+        self.route_table[(start_id, dest_id)] = path
+        return path
+
+    def _build_routes_from(self, start_id):
+        """
+        Un Dijkstra desde el origen llena las rutas a todos los demás estacionamientos.
+        Es lo que usan las ciudades generadas: una búsqueda por par costaría O(pares).
+        """
+        start_node = self.parking_nodes[start_id]
+        # Se detiene al fijar todos los destinos: sus rutas ya no cambian
+        _, pred = self.graph.dijkstra(start_node, targets=self.parking_nodes.values())
+        for dest_id, dest_node in self.parking_nodes.items():
+            if dest_id == start_id: continue
+            self.route_table[(start_id, dest_id)] = self.graph.path_from_tree(pred, start_node, dest_node)
+
+    def get_route(self, start_id, dest_id):
+        """Ruta entre dos estacionamientos (la calcula si falta)"""
+        key = (start_id, dest_id)
+        if key not in self.route_table:
+            if self.pairwise_routes:
+                return self._build_route(start_id, dest_id)
+            self._build_routes_from(start_id)
+        return self.route_table[key]
 
     def spawn_vehicles(self):
-        # (TU CÓDIGO DE SPAWN_VEHICLES ORIGINAL AQUÍ - SIN CAMBIOS)
-        # Por brevedad no lo repito, pero asegúrate de mantenerlo
         if self.vehicles_spawned >= self.num_vehicles: return
-        parking_ids = list(self.parking_spots.keys())
-        free_spots = []
-        for pid in parking_ids:
-            last_used_step = self.parking_schedule.get(pid, -999)
-            if (self.step_count - last_used_step) < self.spawn_cooldown: continue 
-            pos = self.parking_spots[pid]
-            cell_contents = self.grid.get_cell_list_contents([pos])
-            is_free = not any(isinstance(agent, VehicleAgent) for agent in cell_contents)
-            if is_free: free_spots.append(pid)
+        demand = self.demand
+        if demand is not None:
+            demand.poll(self.step_count, self.random)
+        # Con demanda solo se miran los orígenes listos que tienen viajes en cola
+        origins = None if demand is None else demand.waiting_origins()
+        free_spots = [pid for pid in self.spawner.ready_spots(self.step_count, origins)
+                      if not self.vehicle_occupancy[self.parking_spots[pid]]]
         self.random.shuffle(free_spots) 
         for start_id in free_spots:
             if self.vehicles_spawned >= self.num_vehicles: break
-            dest_id = self.random.choice([pid for pid in parking_ids if pid != start_id])
+            if demand is not None:
+                dest_id = demand.pop_trip(start_id)
+            else:
+                # Destino uniforme entre los demás (mismo sorteo que random.choice sobre la lista)
+                k = self.random.randrange(len(self.parking_ids) - 1)
+                if k >= self.parking_order[start_id]: k += 1
+                dest_id = self.parking_ids[k]
+            path_nodes = self.get_route(start_id, dest_id)
+            if path_nodes is None: continue  # Par sin camino conocido
             start_pos = self.parking_spots[start_id]
-            dest_pos = self.parking_spots[dest_id]
-            start_node = self.get_nearest_node(start_pos)
-            dest_node = self.get_nearest_node(dest_pos)
-            try:
-                path_nodes = nx.shortest_path(self.graph, start_node, dest_node, weight='weight')
+            if self.engine is not None:
+                self.engine.add_vehicle(self.vehicles_spawned, start_id, dest_id, start_pos)
+            else:
+                start_node = self.parking_nodes[start_id]
+                dest_node = self.parking_nodes[dest_id]
                 vehicle = VehicleAgent(f"Car_{self.vehicles_spawned}", self, start_node, dest_node)
+                vehicle.vehicle_id = self.vehicles_spawned
+                vehicle.route_key = (start_id, dest_id)
                 vehicle.path = list(path_nodes)
                 self.grid.place_agent(vehicle, start_pos)
-                self.agents_list.append(vehicle)
-                self.vehicles_spawned += 1
-                self.parking_schedule[start_id] = self.step_count
-            except nx.NetworkXNoPath: continue
+                self._enter_cell(start_pos)
+                self._register_vehicle(vehicle)
+            self.vehicles_spawned += 1
+            self.vehicles_active += 1
+            self.parking_schedule[start_id] = self.step_count
+            self.spawner.release(start_id, self.step_count)
+            if self.metrics is not None:
+                self.metrics.departure(start_id)
+
+    @property
+    def agents_list(self):
+        """Todos los agentes (gestores, semáforos y vehículos activos); solo lectura"""
+        return self.managers + self.traffic_lights + self.vehicles
+
+    def _register_vehicle(self, vehicle):
+        vehicle.index = len(self.vehicles)
+        self.vehicles.append(vehicle)
+
+    def _drop_arrivals(self):
+        """Quita los vehículos llegados con swap-remove y los da de baja en Mesa"""
+        vehicles = self.vehicles
+        for vehicle in self._arrivals:
+            last = vehicles.pop()
+            if last is not vehicle:
+                vehicles[vehicle.index] = last
+                last.index = vehicle.index
+            vehicle.remove()
+        self._arrivals.clear()
+
+    def count_active_vehicles(self):
+        """Vehículos en circulación (o esperando en su estacionamiento)"""
+        return self.vehicles_active
+
+    def vehicle_positions(self):
+        """Celdas (x, y) de los vehículos en la grilla como arreglo (N, 2)"""
+        if self.engine is not None:
+            return self.engine.positions()
+        cells = [v.pos for v in self.vehicles]
+        return np.array(cells, dtype=np.int64).reshape(-1, 2)
+
+    def sync_vehicle_agents(self):
+        """
+        En modo "batch" refleja la flota en la grilla como VehicleAgent para visualizarla.
+        En modo "agents" no hace nada (los agentes ya son la fuente de verdad).
+        """
+        if self.engine is None:
+            return
+        self.vehicles = self.engine.sync_agents()
 
     def step(self):
-        self.spawn_vehicles()
-        self.agents_list = [a for a in self.agents_list if getattr(a, "state", "") != "ARRIVED"]
-        self.datacollector.collect(self)
-        self.random.shuffle(self.agents_list)
-        for agent in self.agents_list: agent.step()
-        for agent in self.agents_list: 
-            if hasattr(agent, "advance"): agent.advance()     
+        prof = self.profiler
+        prof.begin_step(self.step_count)
+        if self.engine is not None:
+            self._step_batch(prof)
+        else:
+            self._step_agents(prof)
+        if prof.enabled:
+            prof.count("roundabout_yield", self.vehicles_yielding)
+            prof.count("blocked_move", self.vehicles_blocked)
         self.step_count += 1
-        
-        # DEBUG
-        vehicles = [a for a in self.agents_list if isinstance(a, VehicleAgent)]
-        print(f"Step {self.step_count}: {len(vehicles)} vehicles")
-        if vehicles:
-            v = vehicles[0]
-            print(f"  Vehicle 0 pos: {v.pos}, path length: {len(v.path)}, state: {v.state}")
-            
+        if self.recorder is not None:
+            with prof.phase("record"):
+                self.recorder.record_model(self)
+        if self.metrics is not None:
+            with prof.phase("metrics"):
+                self.metrics.record_step(self)
+        prof.end_step()
+
+    # --- AVANCE RÁPIDO ---
+    def run_until(self, target_step):
+        """
+        Avanza hasta step_count == target_step con el mismo resultado que llamar step().
+
+        Sin vehículos activos los únicos eventos son los cambios de fase de los gestores
+        y el fin del cooldown de algún estacionamiento; los tramos entre eventos se saltan
+        de una vez. Si además el ciclo de semáforos se repite sin eventos de spawn
+        pendientes, se saltan ciclos completos (solo sin grabación de trayectorias).
+        """
+        seen = {}   # estado de los gestores -> paso, dentro del tramo ocioso actual
+        while self.step_count < target_step:
+            horizon = self._idle_horizon(target_step)
+            if horizon == 0:
+                seen.clear()
+                self.step()
+                continue
+            k = min([horizon] + [m.time_remaining - 1 for m in self.managers if m.state != "RED"])
+            if k > 0:
+                self._skip_idle(k)
+                continue
+            # Paso con cambio de fase: buscar un ciclo completo de semáforos ya visto
+            if self.recorder is None:
+                key = tuple((m.state, m.time_remaining) for m in self.managers)
+                period = self.step_count - seen.get(key, self.step_count)
+                if period > 0 and horizon >= period:
+                    jump = (horizon // period) * period
+                    self.datacollector.collect_many(self, jump)
+                    if self.metrics is not None:
+                        self.metrics.record_idle(self, jump)
+                    self.step_count += jump
+                    seen.clear()
+                    continue
+                seen[key] = self.step_count
+            self.step()
+
+    def _idle_horizon(self, target_step):
+        """Pasos que se pueden saltar sin mirar a los gestores (0 si hay algo que simular)"""
+        if self.vehicles_active or self.vehicles_blocked or self.vehicles_yielding:
+            return 0
+        horizon = target_step - self.step_count
+        if self.vehicles_spawned < self.num_vehicles and self.parking_spots:
+            # El siguiente spawn posible: el primer estacionamiento que termina su cooldown
+            # (con demanda: la siguiente llegada o un origen con viajes en cola)
+            if self.demand is None:
+                next_spawn = self.spawner.next_ready_step(self.step_count)
+            else:
+                next_spawn = min(self.demand.next_event_step(), self.spawner.next_ready_step(
+                    self.step_count, self.demand.waiting_origins()))
+            horizon = min(horizon, next_spawn - self.step_count)
+        return max(horizon, 0)
+
+    def _skip_idle(self, k):
+        """k pasos sin vehículos ni cambios de fase: solo corren los temporizadores"""
+        for manager in self.managers:
+            if manager.state != "RED":
+                manager.time_remaining -= k
+        self.datacollector.collect_many(self, k)
+        if self.recorder is not None:
+            empty = np.zeros(0, dtype=np.int64)
+            lights = [LIGHT_CODES.get(light.state, LIGHT_CODES["RED"]) for light in self.traffic_lights]
+            for _ in range(k):
+                self.recorder.record(empty, lights)
+        if self.metrics is not None:
+            self.metrics.record_idle(self, k)
+        if self.engine_name == "sharded":
+            # Los gestores de cada región se descuentan en el próximo plan
+            self.engine.skip_idle(k)
+        self.step_count += k
+
+    # --- CHECKPOINTS (ver checkpoint.py) ---
+    def save_checkpoint(self, path):
+        """Guarda el estado dinámico del modelo en un archivo binario compacto"""
+        return checkpoint.save_checkpoint(self, path)
+
+    @classmethod
+    def from_checkpoint(cls, path, city=None, **overrides):
+        """Modelo restaurado desde path; overrides cambia parámetros (green_time, ...)"""
+        return checkpoint.load_checkpoint(path, city=city, **overrides)
+
+    def close(self):
+        """Cierra la grabación, las métricas y, con engine="sharded", los procesos de las regiones"""
+        self.close_recording()
+        self.close_metrics()
+        if hasattr(self.engine, "close"):
+            self.engine.close()
+
+    def close_recording(self):
+        """Escribe lo pendiente de la grabación y cierra sus archivos"""
+        if self.recorder is not None:
+            self.recorder.close()
+            self.recorder = None
+
+    def close_metrics(self):
+        """Espera a que el escritor de métricas vacíe la cola y cierra sus archivos"""
+        if self.metrics is not None:
+            self.metrics.close()
+            self.metrics = None
+
+    def _step_agents(self, prof):
+        with prof.phase("spawn"):
+            self.spawn_vehicles()
+        with prof.phase("collect"):
+            self.datacollector.collect(self)
+        with prof.phase("managers"):
+            self._step_managers(prof)
+        if self.router is not None and self.step_count % self.router.interval == 0:
+            with prof.phase("reroute"):
+                self.router.update()
+        if self.update == "reservation":
+            self._step_reservation(prof)
+            return
+        with prof.phase("shuffle"):
+            # Se baraja una copia: self.vehicles conserva los índices para el swap-remove
+            order = self.vehicles[:]
+            self.random.shuffle(order)
+        with prof.phase("step"):
+            self.vehicles_blocked = self.vehicles_yielding = 0
+            if prof.enabled:
+                # Costo de step() por vehículo (solo con el perfilador encendido)
+                clock = time.perf_counter
+                for vehicle in order:
+                    t0 = clock()
+                    vehicle.step()
+                    prof.add_agent_time("VehicleAgent", clock() - t0)
+            else:
+                for vehicle in order: vehicle.step()
+        with prof.phase("remove"):
+            self._drop_arrivals()
+
+    def _step_managers(self, prof):
+        if prof.enabled:
+            # Costo de step() por gestor, igual que por vehículo
+            clock = time.perf_counter
+            for manager in self.managers:
+                t0 = clock()
+                manager.step()
+                prof.add_agent_time("TrafficManagerAgent", clock() - t0)
+        else:
+            for manager in self.managers: manager.step()
+
+    def reserve(self, vehicle, cell):
+        """Fase 1: reserva cell para vehicle; entre varios gana el menor vehicle_id"""
+        holder = self.reservations.get(cell)
+        if holder is None or vehicle.vehicle_id < holder.vehicle_id:
+            self.reservations[cell] = vehicle
+
+    def _step_reservation(self, prof):
+        """Paso síncrono del modo "agents": step() reserva, advance() aplica los ganadores"""
+        with prof.phase("step"):
+            self.vehicles_blocked = self.vehicles_yielding = 0
+            self.reservations.clear()
+            for vehicle in self.vehicles: vehicle.step()
+            requests = sum(1 for v in self.vehicles if v.reserved is not None)
+        with prof.phase("resolve"):
+            winners = sorted(self.reservations.values(), key=lambda v: v.vehicle_id)
+            # Entradas a rotondas: solo las que caben en la capacidad al inicio del paso
+            room = [self.roundabout_capacity - count for count in self.roundabout_counts]
+            movers = []
+            for vehicle in winners:
+                target = vehicle.reserved
+                if vehicle.pos in self.roundabout_entries and target in self.roundabout_ring:
+                    rid = self.roundabout_id[vehicle.pos]
+                    if room[rid] <= 0: continue
+                    room[rid] -= 1
+                movers.append(vehicle)
+            self.vehicles_blocked += requests - len(movers)
+            moved = set(movers)
+            for vehicle in self.vehicles:
+                if vehicle.reserved is not None and vehicle not in moved:
+                    vehicle.blocked_steps += 1
+        with prof.phase("advance"):
+            for vehicle in movers: vehicle.advance()
+        with prof.phase("remove"):
+            self._drop_arrivals()
+
+    def _step_batch(self, prof):
+        """Paso del modo "batch": gestores de semáforos en Python, flota en lote"""
+        with prof.phase("spawn"):
+            self.spawn_vehicles()
+        with prof.phase("collect"):
+            self.datacollector.collect(self)
+        with prof.phase("managers"):
+            self._step_managers(prof)
+        with prof.phase("engine"):
+            self.vehicles_blocked = self.vehicles_yielding = 0
+            if self.update == "reservation":
+                self.engine.step_reservation()
+            else:
+                self.engine.step()
+
     def build_city_graph(self):
         # (TU CÓDIGO DE GRAFO ORIGINAL AQUÍ - SIN CAMBIOS)
         # Mantén todo el método build_city_graph exactamente como estaba
@@ -462,10 +958,16 @@ class TrafficModel(Model):
         # ---------------------------------------------------
         # 6. CONEXIÓN DE ESTACIONAMIENTOS
         # ---------------------------------------------------
-        road_nodes = list(self.graph.nodes)
+        # Índice espacial de nodos (consultas de nodo más cercano). Hacen falta dos: cada
+        # estacionamiento se conecta a la calle más cercana (road_index, solo calles, como
+        # la lista road_nodes original), mientras que get_nearest_node también debe ver los
+        # estacionamientos que se van agregando; node_index es una copia que sí los recibe.
+        road_index = GridNodeIndex(self.grid.width, self.grid.height, self.graph.nodes)
+        self.node_index = road_index.copy()
         for pid, pos in self.parking_spots.items():
             self.graph.add_node(pos)
+            self.node_index.add(pos)
             self.city_layout[pos[0]][pos[1]] = PARKING
-            nearest = min(road_nodes, key=lambda n: (n[0]-pos[0])**2 + (n[1]-pos[1])**2)
+            nearest = road_index.nearest(pos)
             self.graph.add_edge(pos, nearest, weight=1)
             self.graph.add_edge(nearest, pos, weight=1)
\ No newline at end of file
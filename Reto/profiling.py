@@ -0,0 +1,113 @@
+import time
+from collections import deque
+from contextlib import nullcontext
+
+_NULL_PHASE = nullcontext()
+
+
+class _Phase:
+    """Context manager reutilizable que acumula el tiempo de una fase"""
+    __slots__ = ("profiler", "name", "start")
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+        self.start = 0.0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.profiler._add_phase(self.name, time.perf_counter() - self.start)
+        return False
+
+
+class StepProfiler:
+    """
+    Instrumentación por paso de TrafficModel.
+
+    Registra tiempo de pared por fase (spawn, collect, managers, shuffle, step, remove),
+    costo de step() por tipo de agente y conteo de eventos (cesiones en rotonda,
+    movimientos bloqueados). Apagado por defecto: phase() devuelve un contexto nulo
+    y count() retorna de inmediato. Con maxlen, timeline guarda solo los últimos
+    maxlen pasos (los totales cubren toda la corrida).
+    """
+    def __init__(self, enabled=False, maxlen=None):
+        self.enabled = enabled
+        self.maxlen = maxlen
+        self._phases = {}
+        self.reset()
+
+    def reset(self):
+        self.steps = 0
+        self.phase_totals = {}
+        self.agent_totals = {}   # tipo -> [segundos, llamadas]
+        self.events = {}
+        self.timeline = deque(maxlen=self.maxlen)   # {"step": n, "phases": {fase: segundos}} por paso
+        self._current = None
+
+    def phase(self, name):
+        if not self.enabled:
+            return _NULL_PHASE
+        phase = self._phases.get(name)
+        if phase is None:
+            phase = self._phases[name] = _Phase(self, name)
+        return phase
+
+    def begin_step(self, step):
+        if self.enabled:
+            self._current = {"step": step, "phases": {}}
+
+    def end_step(self):
+        if self.enabled and self._current is not None:
+            self.timeline.append(self._current)
+            self._current = None
+            self.steps += 1
+
+    def _add_phase(self, name, seconds):
+        self.phase_totals[name] = self.phase_totals.get(name, 0.0) + seconds
+        if self._current is not None:
+            phases = self._current["phases"]
+            phases[name] = phases.get(name, 0.0) + seconds
+
+    def add_agent_time(self, agent_type, seconds):
+        totals = self.agent_totals.get(agent_type)
+        if totals is None:
+            totals = self.agent_totals[agent_type] = [0.0, 0]
+        totals[0] += seconds
+        totals[1] += 1
+
+    def count(self, event, n=1):
+        if self.enabled:
+            self.events[event] = self.events.get(event, 0) + n
+
+    def summary(self):
+        """Totales acumulados como dict serializable"""
+        steps = max(self.steps, 1)
+        return {
+            "steps": self.steps,
+            "phases": {name: {"total_s": total, "mean_ms": 1000 * total / steps}
+                       for name, total in self.phase_totals.items()},
+            "agents": {name: {"total_s": total, "calls": calls,
+                              "mean_us": 1e6 * total / calls if calls else 0.0}
+                       for name, (total, calls) in self.agent_totals.items()},
+            "events": dict(self.events),
+        }
+
+    def report(self):
+        """Resumen legible del perfil"""
+        summary = self.summary()
+        total = sum(self.phase_totals.values()) or 1.0
+        lines = [f"Perfil de {summary['steps']} pasos"]
+        lines.append(f"  {'fase':<10} {'total (s)':>10} {'ms/paso':>9} {'%':>6}")
+        for name, data in sorted(summary["phases"].items(), key=lambda kv: -kv[1]["total_s"]):
+            lines.append(f"  {name:<10} {data['total_s']:>10.4f} {data['mean_ms']:>9.3f} "
+                         f"{100 * data['total_s'] / total:>6.1f}")
+        if summary["agents"]:
+            lines.append(f"  {'agente':<22} {'llamadas':>9} {'us/llamada':>11}")
+            for name, data in sorted(summary["agents"].items()):
+                lines.append(f"  {name:<22} {data['calls']:>9} {data['mean_us']:>11.2f}")
+        for name, n in sorted(summary["events"].items()):
+            lines.append(f"  evento {name}: {n}")
+        return "\n".join(lines)
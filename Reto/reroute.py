@@ -0,0 +1,129 @@
+import numpy as np
+
+from csr import manhattan
+
+
+class CongestionRouter:
+    """
+    Reruteo de vehículos según la congestión (solo modo "agents").
+
+    Cada interval pasos:
+      - dwell cuenta cuántos pasos lleva detenido el vehículo de cada celda: un vehículo
+        está detenido si en todo el intervalo no avanzó (sus blocked_steps + yield_steps
+        crecieron interval), así una fila que avanza despacio no cuenta como congestión
+      - el costo de las aristas que entran a celdas cuyo dwell cambió se actualiza
+        a peso + penalty * dwell / interval (los pesos del grafo no se tocan)
+      - solo se replanifican los vehículos cuya ruta restante pasa por una celda con
+        dwell >= threshold, con A* (heurística Manhattan, admisible: cada arista
+        cuesta al menos su distancia Manhattan), y se cambia la ruta solo si mejora
+    Las búsquedas se cachean por (celda, destino); una entrada se descarta cuando cambia
+    el costo de alguna celda de su ruta (índice celda -> claves), así los coches de una
+    misma fila hacia el mismo destino comparten resultado entre actualizaciones. Si solo
+    bajó el costo fuera de la ruta, la entrada sigue valiendo hasta que algo la toque;
+    el cambio de ruta igual exige que mejore con los costos actuales.
+    """
+    def __init__(self, model, interval=10, threshold=20, penalty=1.0):
+        self.model = model
+        self.graph = model.graph
+        self.interval = interval
+        self.threshold = threshold
+        self.penalty = penalty
+        shape = model.vehicle_occupancy.shape
+        self.dwell = np.zeros(shape, dtype=np.int64)
+        self.last_waits = {}   # vehicle_id -> blocked_steps + yield_steps en la última actualización
+        self.cost_level = np.zeros(shape, dtype=np.int64)   # dwell ya reflejado en 'cost'
+        self.cache = {}
+        self.cache_cells = {}   # celda -> claves de cache cuya ruta entra a la celda
+        self.reroutes = 0
+        # Costos propios por id de arista (el grafo de un CityPlan se comparte entre modelos)
+        self.cost = self.graph.weights.tolist()
+
+    def update(self):
+        """Actualiza costos y replanifica a los vehículos afectados; devuelve cuántos cambiaron"""
+        dwell = np.zeros_like(self.dwell)
+        waits = {}
+        for vehicle in self.model.vehicles:
+            total = vehicle.blocked_steps + vehicle.yield_steps
+            waits[vehicle.vehicle_id] = total
+            if total - self.last_waits.get(vehicle.vehicle_id, 0) >= self.interval:
+                dwell[vehicle.pos] = self.dwell[vehicle.pos] + self.interval
+        self.dwell = dwell
+        self.last_waits = waits
+
+        changed = np.argwhere(self.dwell != self.cost_level)
+        if changed.size:
+            weights = self.graph.weights
+            for x, y in changed.tolist():
+                cell = (x, y)
+                if cell not in self.graph:
+                    continue
+                self._invalidate(cell)
+                extra = self.penalty * self.dwell[cell] / self.interval
+                for e in self.graph.in_edges(cell).tolist():
+                    self.cost[e] = weights[e] + extra
+            self.cost_level = self.dwell.copy()
+
+        congested = self.dwell >= self.threshold
+        if not congested.any():
+            return 0
+        rerouted = 0
+        for vehicle in self.model.vehicles:
+            path = vehicle.path
+            if len(path) < 2 or vehicle.pos not in self.graph:
+                continue
+            # La celda siguiente no cuenta: si ya está bloqueada no hay a dónde esquivar
+            if not any(congested[cell] for cell in path[1:]):
+                continue
+            new_path = self.plan(vehicle.pos, path[-1])
+            if new_path is None or new_path == path:
+                continue
+            if self.path_cost(vehicle.pos, new_path) < self.path_cost(vehicle.pos, path):
+                vehicle.path = list(new_path)
+                rerouted += 1
+        self.reroutes += rerouted
+        return rerouted
+
+    def plan(self, source, target):
+        """Ruta de menor costo actual desde source (sin incluirla) hasta target"""
+        key = (source, target)
+        if key not in self.cache:
+            path = self._cached_suffix(source, target)
+            if path is None:
+                nodes = self.graph.astar(source, target, weights=self.cost, heuristic=manhattan)
+                path = nodes[1:] if nodes is not None else None
+            self.cache[key] = path
+            # Sin camino no se indexa: los costos nunca vuelven alcanzable un destino
+            for cell in path or ():
+                self.cache_cells.setdefault(cell, set()).add(key)
+        return self.cache[key]
+
+    def _cached_suffix(self, source, target):
+        """
+        Tramo desde source de una ruta cacheada hacia target que pasa por source: el
+        tramo de un camino mínimo también es mínimo, así los coches de una fila lo comparten
+        """
+        for other in self.cache_cells.get(source, ()):
+            if other[1] == target:
+                path = self.cache[other]
+                return path[path.index(source) + 1:]
+        return None
+
+    def _invalidate(self, cell):
+        """Descarta las búsquedas cacheadas cuya ruta entra a cell"""
+        for key in self.cache_cells.pop(cell, ()):
+            path = self.cache.pop(key, None)
+            for other in path or ():
+                if other != cell:
+                    self.cache_cells[other].discard(key)
+
+    def path_cost(self, source, path):
+        graph = self.graph
+        cost = 0.0
+        prev = source
+        for node in path:
+            e = graph.edge_id(prev, node)
+            if e < 0:
+                return float("inf")
+            cost += self.cost[e]
+            prev = node
+        return cost
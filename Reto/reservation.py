@@ -0,0 +1,88 @@
+"""
+Reglas de actualización síncrona por reservas (modo update="reservation").
+
+A diferencia del modo secuencial, todo se decide con el estado al inicio del paso,
+así que el resultado no depende del orden en que se recorren los vehículos:
+  1. Intención: cada vehículo que no cede en la rotonda y cuya celda siguiente
+     no está en rojo ni ocupada reserva esa celda.
+  2. Resolución: por cada celda gana la reserva de menor vehicle_id; en cada rotonda
+     solo entran (por vehicle_id) los que caben en su capacidad restante.
+  3. Aplicación: se mueven los ganadores; una celda liberada en el paso no se
+     puede ocupar hasta el siguiente (como la regla 184).
+
+ReservationRules implementa la resolución vectorizada sobre ids de celda planos
+(x * height + y); la usan BatchVehicleEngine y la ejecución por regiones.
+"""
+import numpy as np
+
+
+class ReservationRules:
+    """Tablas de rotondas en ids de celda planos y resolución de reservas en lote"""
+    def __init__(self, model):
+        self.height = model.grid.height
+        n_cells = model.grid.width * model.grid.height
+        ring_cells = sorted(model.roundabout_ring)
+        self.ring_ids = np.array([self.cell_id(c) for c in ring_cells], dtype=np.int64)
+        self.ring_rid = np.array([model.roundabout_id[c] for c in ring_cells], dtype=np.int64)
+        self.num_roundabouts = len(model.roundabout_counts)
+        self.ring_mask = np.zeros(n_cells, dtype=bool)
+        self.ring_mask[self.ring_ids] = True
+        ring_slot = {cid: i for i, cid in enumerate(self.ring_ids.tolist())}
+        entries = sorted(model.roundabout_entries)
+        self.entry_index = np.full(n_cells, -1, dtype=np.int64)
+        self.entry_rid = np.array([model.roundabout_id[e] for e in entries], dtype=np.int64)
+        self.watch = np.zeros((len(entries), len(self.ring_ids)), dtype=np.int32)
+        for e, entry in enumerate(entries):
+            self.entry_index[self.cell_id(entry)] = e
+            for cell in model.roundabout_watch[entry]:
+                self.watch[e, ring_slot[self.cell_id(cell)]] = 1
+
+    def cell_id(self, pos):
+        return pos[0] * self.height + pos[1]
+
+    def roundabout_counts(self, occ):
+        """Vehículos dentro de cada rotonda según la ocupación occ"""
+        return np.bincount(self.ring_rid, weights=occ[self.ring_ids], minlength=self.num_roundabouts)
+
+    def yielding(self, cur, occ, capacity, counts=None):
+        """Máscara de vehículos en cur que deben ceder en la entrada de una rotonda"""
+        yielding = np.zeros(cur.size, dtype=bool)
+        entry = self.entry_index[cur]
+        at_entry = entry >= 0
+        if at_entry.any():
+            ring_occ = occ[self.ring_ids]
+            if counts is None:
+                counts = self.roundabout_counts(occ)
+            near = (self.watch @ (ring_occ > 0)) > 0
+            e_idx = entry[at_entry]
+            inside = counts[self.entry_rid[e_idx]] - self.ring_mask[cur[at_entry]]
+            yielding[at_entry] = (inside >= capacity) | near[e_idx]
+        return yielding
+
+    def resolve(self, cur, nxt, priority, occ, red, capacity):
+        """
+        Devuelve (movers, yielding): índices (en cur/nxt) de los vehículos que se mueven
+        este paso y la máscara de los que cedieron en una rotonda.
+        occ y red son el estado al inicio del paso; priority menor gana los conflictos.
+        """
+        counts = self.roundabout_counts(occ)
+        yielding = self.yielding(cur, occ, capacity, counts)
+        ok = np.flatnonzero(~yielding & ~red[nxt] & (occ[nxt] == 0))
+        if ok.size == 0:
+            return ok, yielding
+        # Tabla de reservas: una por celda destino, gana la menor prioridad
+        ok = ok[np.argsort(priority[ok], kind="stable")]
+        _, first = np.unique(nxt[ok], return_index=True)
+        movers = ok[np.sort(first)]
+
+        # Entradas a una rotonda: solo las que caben, en orden de prioridad
+        entry = self.entry_index[cur[movers]]
+        entering = np.flatnonzero((entry >= 0) & self.ring_mask[nxt[movers]])
+        if entering.size:
+            keep = np.ones(movers.size, dtype=bool)
+            rids = self.entry_rid[entry[entering]]
+            for rid in np.unique(rids).tolist():
+                allowed = max(capacity - int(counts[rid]), 0)
+                keep[entering[rids == rid][allowed:]] = False
+            movers = movers[keep]
+        return movers, yielding
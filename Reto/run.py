@@ -1,9 +1,9 @@
 from model import TrafficModel
-from agents import VehicleAgent, TrafficLightAgent
+from agents import TrafficLightAgent
 
-def run_simulation(steps=100):
+def run_simulation(steps=100, seed=None):
     print("--- Initializing Traffic Jam Model (Mesa 3.0 Compatible) ---")
-    traffic_model = TrafficModel(num_vehicles=5)
+    traffic_model = TrafficModel(num_vehicles=5, seed=seed)
     
     # Pick a light to monitor
     monitored_light = None
@@ -23,19 +23,17 @@ def run_simulation(steps=100):
             print(f"\n--- Step {i} ---")
             
             # 1. Global Stats
-            # Note: We access vars directly from datacollector dataframe or just print manual check
-            # Stopped cars logic:
-            stopped = sum(1 for a in traffic_model.agents_list if isinstance(a, VehicleAgent) and a.speed < 0.01)
-            print(f"Global Stats: Stopped Cars: {stopped}")
+            active = traffic_model.count_active_vehicles()
+            print(f"Global Stats: Active Cars: {active} | Arrived: {traffic_model.vehicles_arrived}")
 
             # 2. Track Car_0
             car_0 = next((a for a in traffic_model.agents_list if a.unique_id == "Car_0"), None)
             if car_0:
-                print(f"Car_0 Status: Pos {car_0.pos} | Speed {car_0.speed:.2f}")
+                print(f"Car_0 Status: Pos {car_0.pos} | Remaining Path: {len(car_0.path)} | State: {car_0.state}")
             
-            # 3. Track Light
+            # 3. Track Light (the timer lives in its manager)
             if monitored_light:
-                 print(f"Light {monitored_light.unique_id} State: {monitored_light.state} | Timer: {monitored_light.time_remaining}")
+                 print(f"Light {monitored_light.unique_id} State: {monitored_light.state} | Timer: {monitored_light.manager.time_remaining}")
 
     print("\n--- Simulation Finished ---")
 
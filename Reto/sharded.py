@@ -0,0 +1,396 @@
+"""
+Ejecución de una sola ciudad repartida en regiones rectangulares, una por proceso.
+
+TrafficModel(engine="sharded", regions=(rx, ry)) usa ShardedEngine en lugar de
+BatchVehicleEngine. El modelo principal (coordinador) sigue generando vehículos,
+recolectando series y contando llegadas; cada región mueve solo a sus vehículos
+con las reglas por reservas de reservation.py, que no dependen del orden, así que
+el resultado es idéntico al de engine="batch", update="reservation" con la misma semilla.
+
+Cada paso son dos rondas de mensajes por región:
+  1. plan: la región saca a los vehículos que salieron en el paso anterior, agrega
+     los nuevos, descuenta los pasos ociosos que el coordinador saltó desde el plan
+     anterior (run_until), avanza los gestores de los cruces que tiene y manda al coordinador
+     las reservas que caen en celdas de otra región.
+  2. resolve: cada región resuelve todas las reservas de sus celdas (propias y de
+     vecinas) y aplica los movimientos; los vehículos ganadores que venían de otra
+     región se crean aquí con su ruta y cursor (el traspaso por la frontera).
+Los cortes entre regiones nunca parten una rotonda (anillo y entradas quedan juntos),
+así que ceder y la capacidad de la rotonda se deciden sin salir de la región.
+"""
+import multiprocessing as mp
+
+import numpy as np
+
+# Columnas de una reserva o traspaso entre regiones
+_REQUEST_FIELDS = ("vehicle_id", "target", "start_id", "dest_id", "cursor", "spawn_step",
+                   "blocked_steps", "yield_steps", "origin")
+
+
+def region_cuts(size, parts, spans):
+    """
+    Posiciones de corte (la región k cubre [cuts[k], cuts[k + 1])) lo más parejas posible
+    sin cortar ningún intervalo [lo, hi] de spans.
+    """
+    blocked = set()
+    for lo, hi in spans:
+        blocked.update(range(lo + 1, hi + 1))
+    cuts = [0]
+    for k in range(1, parts):
+        ideal = round(k * size / parts)
+        for delta in range(size):
+            options = [c for c in (ideal - delta, ideal + delta)
+                       if cuts[-1] < c < size and c not in blocked]
+            if options:
+                cuts.append(options[0])
+                break
+    cuts.append(size)
+    return cuts
+
+
+def region_owner(model, regions):
+    """Arreglo (width * height) con la región dueña de cada celda (id plano x * height + y)"""
+    rx, ry = regions
+    width, height = model.grid.width, model.grid.height
+    xspans, yspans = [], []
+    for rid in range(len(model.roundabout_counts)):
+        cells = [c for c, r in model.roundabout_id.items() if r == rid]
+        xs = [c[0] for c in cells]
+        ys = [c[1] for c in cells]
+        xspans.append((min(xs), max(xs)))
+        yspans.append((min(ys), max(ys)))
+    xcuts = region_cuts(width, rx, xspans)
+    ycuts = region_cuts(height, ry, yspans)
+    col = np.searchsorted(xcuts, np.arange(width), side="right") - 1
+    row = np.searchsorted(ycuts, np.arange(height), side="right") - 1
+    return (col[:, None] * (len(ycuts) - 1) + row[None, :]).reshape(-1).astype(np.int64)
+
+
+class _Region:
+    """Estado de una región dentro de su proceso: réplica del modelo con motor batch"""
+    def __init__(self, city, params, index, owner):
+        from model import TrafficModel
+        self.model = TrafficModel(num_vehicles=0, engine="batch", update="reservation",
+                                  city=city, **params)
+        self.engine = self.model.engine
+        self.rules = self.engine.rules
+        self.index = index
+        self.owner = owner
+        self.slots = {}   # vehicle_id -> slot
+        self._trips = []  # viajes terminados en el paso: se pliegan en el modelo principal
+        self.model.record_trips = lambda *trip: self._trips.append(trip)
+        self._outgoing = np.zeros(0, dtype=np.int64)   # vehicle_id con reserva hacia otra región
+        # Gestores de los cruces con algún semáforo en la región (el ciclo completo del grupo)
+        height = self.model.grid.height
+        groups = {g for x, y, g, _ in self.model.signals if owner[x * height + y] == index}
+        self.managers = [m for m in self.model.managers if m.group in groups]
+        self.parking = np.array(sorted(self.engine.cell_id(p) for p in self.model.parking_spots.values()
+                                       if owner[self.engine.cell_id(p)] == index), dtype=np.int64)
+
+    def _add(self, vehicle_id, start_id, dest_id, cid, cursor, spawn_step, blocked=0, yielded=0):
+        engine = self.engine
+        slot = engine.add_vehicle(vehicle_id, start_id, dest_id, engine.cell_pos(cid))
+        engine.cursor[slot] += cursor
+        engine.spawn_step[slot] = spawn_step
+        engine.blocked_steps[slot] = blocked
+        engine.yield_steps[slot] = yielded
+        self.slots[vehicle_id] = slot
+        return slot
+
+    def _remove(self, vehicle_ids):
+        engine = self.engine
+        for vid in vehicle_ids:
+            slot = self.slots.pop(vid)
+            engine.occupancy[engine.pos[slot]] -= 1
+            engine.active[slot] = False
+            engine.num_active -= 1
+            engine.route_keys.pop(slot, None)
+            engine.free_slots.append(slot)
+
+    def _arrive(self, slots):
+        engine = self.engine
+        done = slots[engine.cursor[slots] >= engine.route_end[slots]]
+        for slot in done.tolist():
+            del self.slots[int(engine.vehicle_id[slot])]
+        engine._arrive(done)
+
+    def plan(self, step, departed, spawns, idle=0):
+        model, engine = self.model, self.engine
+        model.step_count = step
+        self._remove(departed)
+        # Pasos saltados por el coordinador: solo corren los temporizadores (ver TrafficModel._skip_idle)
+        for manager in self.managers:
+            if manager.state != "RED":
+                manager.time_remaining -= idle
+        # Reservas del paso anterior hacia otra región que no se aceptaron
+        for vid in self._outgoing.tolist():
+            slot = self.slots.get(vid)
+            if slot is not None:
+                engine.blocked_steps[slot] += 1
+        for vid, start_id, dest_id, cid in spawns:
+            self._add(vid, start_id, dest_id, cid, 0, step)
+        for manager in self.managers: manager.step()
+
+        active = np.flatnonzero(engine.active)
+        cur = engine.pos[active]
+        nxt = engine.route_cells[engine.cursor[active]]
+        yielding = self.rules.yielding(cur, engine.occupancy, model.roundabout_capacity)
+        engine.yield_steps[active[yielding]] += 1
+        local = self.owner[nxt] == self.index
+        self._pending = (active, cur, nxt, yielding, local)
+
+        # Reservas hacia otras regiones: las resuelve la región dueña de la celda
+        out = np.flatnonzero(~yielding & ~local)
+        slots = active[out]
+        keys = [engine.route_keys[s] for s in slots.tolist()]
+        starts = np.array([engine.route_offsets[k][0] for k in keys], dtype=np.int64)
+        requests = {
+            "vehicle_id": engine.vehicle_id[slots],
+            "target": nxt[out],
+            "start_id": np.array([k[0] for k in keys], dtype=np.int64),
+            "dest_id": np.array([k[1] for k in keys], dtype=np.int64),
+            "cursor": engine.cursor[slots] - starts,
+            "spawn_step": engine.spawn_step[slots],
+            "blocked_steps": engine.blocked_steps[slots],
+            "yield_steps": engine.yield_steps[slots],
+            "origin": cur[out],
+        }
+        self._outgoing = requests["vehicle_id"]
+        return active.size, int(yielding.sum()), requests
+
+    def resolve(self, incoming):
+        model, engine = self.model, self.engine
+        active, cur, nxt, yielding, local = self._pending
+        occ, red = engine.occupancy, engine.red
+        arrived, travel = model.vehicles_arrived, model.total_travel_time
+
+        mine = np.flatnonzero(~yielding & local)
+        mine = mine[~red[nxt[mine]] & (occ[nxt[mine]] == 0)]
+        targets = incoming["target"]
+        foreign = np.flatnonzero(~red[targets] & (occ[targets] == 0))
+
+        # Tabla de reservas combinada: gana el menor vehicle_id por celda
+        vids = np.concatenate((engine.vehicle_id[active[mine]], incoming["vehicle_id"][foreign]))
+        cells = np.concatenate((nxt[mine], targets[foreign]))
+        source = np.concatenate((mine, -1 - foreign))   # >= 0: índice local; < 0: reserva externa
+        order = np.argsort(vids, kind="stable")
+        _, first = np.unique(cells[order], return_index=True)
+        winners = source[order[np.sort(first)]]
+
+        # Capacidad de las rotondas (solo entradas locales: las rotondas no cruzan cortes)
+        local_w = winners[winners >= 0]
+        entry = self.rules.entry_index[cur[local_w]]
+        entering = np.flatnonzero((entry >= 0) & self.rules.ring_mask[nxt[local_w]])
+        if entering.size:
+            counts = self.rules.roundabout_counts(occ)
+            keep = np.ones(local_w.size, dtype=bool)
+            rids = self.rules.entry_rid[entry[entering]]
+            for rid in np.unique(rids).tolist():
+                allowed = max(model.roundabout_capacity - int(counts[rid]), 0)
+                keep[entering[rids == rid][allowed:]] = False
+            local_w = local_w[keep]
+        accepted = -1 - winners[winners < 0]
+
+        # Movimientos locales
+        stalled = ~yielding & local
+        stalled[local_w] = False
+        engine.blocked_steps[active[stalled]] += 1
+        movers = active[local_w]
+        targets_w = nxt[local_w]
+        np.subtract.at(occ, engine.pos[movers], 1)
+        occ[targets_w] += 1
+        engine.pos[movers] = targets_w
+        engine.cursor[movers] += 1
+        self._arrive(movers)
+
+        # Traspasos: vehículos de otras regiones que entran por la frontera
+        handed = np.array([self._add(int(incoming["vehicle_id"][i]), int(incoming["start_id"][i]),
+                                     int(incoming["dest_id"][i]), int(incoming["target"][i]),
+                                     int(incoming["cursor"][i]) + 1, int(incoming["spawn_step"][i]),
+                                     int(incoming["blocked_steps"][i]), int(incoming["yield_steps"][i]))
+                           for i in accepted.tolist()], dtype=np.int64)
+        if handed.size:
+            self._arrive(handed)
+
+        self._pending = None
+        trips = [np.concatenate(col) for col in zip(*self._trips)] if self._trips else None
+        self._trips = []
+        return {
+            "trips": trips,
+            "moved": int(movers.size + accepted.size),
+            "accepted": {name: incoming[name][accepted] for name in ("vehicle_id", "origin")},
+            "arrived": model.vehicles_arrived - arrived,
+            "travel": model.total_travel_time - travel,
+            "parking": (self.parking, occ[self.parking].copy()),
+        }
+
+    def positions(self, departed):
+        self._remove(departed)
+        return self.engine.positions()
+
+    def mirror(self, departed):
+        """(vehicle_id, (origen, destino), celda, celdas restantes) de cada vehículo de la región"""
+        self._remove(departed)
+        engine = self.engine
+        fleet = []
+        for slot in np.flatnonzero(engine.active).tolist():
+            key = engine.route_keys[slot]
+            end = engine.route_offsets[key][1]
+            fleet.append((int(engine.vehicle_id[slot]), key, int(engine.pos[slot]),
+                          engine.route_cells[engine.cursor[slot]:end].copy()))
+        return fleet
+
+
+def _region_worker(conn, city, params, index, owner):
+    region = _Region(city, params, index, owner)
+    conn.send("ready")
+    while True:
+        command, *args = conn.recv()
+        if command == "stop":
+            break
+        conn.send(getattr(region, command)(*args))
+    conn.close()
+
+
+class ShardedEngine:
+    """
+    Motor del coordinador: reparte la flota entre procesos por región.
+    Tiene la interfaz que TrafficModel usa de BatchVehicleEngine (add_vehicle,
+    step_reservation, positions, sync_agents, num_active) más skip_idle.
+    """
+    def __init__(self, model, city, params, regions=(2, 1)):
+        self.model = model
+        self.height = model.grid.height
+        self.owner = region_owner(model, regions)
+        self.num_regions = int(self.owner.max()) + 1
+        self.num_active = 0
+        self._spawns = [[] for _ in range(self.num_regions)]
+        self._departed = [[] for _ in range(self.num_regions)]
+        self._idle = 0     # pasos saltados por run_until que las regiones aún no descuentan
+        self.agents = {}   # vehicle_id -> VehicleAgent espejo (solo tras sync_agents)
+        ctx = mp.get_context()
+        self._conns, self._procs = [], []
+        for index in range(self.num_regions):
+            parent, child = ctx.Pipe()
+            proc = ctx.Process(target=_region_worker, args=(child, city, params, index, self.owner),
+                               name=f"traffic-region-{index}", daemon=True)
+            proc.start()
+            self._conns.append(parent)
+            self._procs.append(proc)
+        for conn in self._conns:
+            conn.recv()
+
+    def cell_id(self, pos):
+        return pos[0] * self.height + pos[1]
+
+    def cell_pos(self, cid):
+        return (int(cid) // self.height, int(cid) % self.height)
+
+    def _call_all(self, command, args_per_region):
+        for conn, args in zip(self._conns, args_per_region):
+            conn.send((command, *args))
+        return [conn.recv() for conn in self._conns]
+
+    def add_vehicle(self, vehicle_id, start_id, dest_id, start_pos):
+        cid = self.cell_id(start_pos)
+        self._spawns[self.owner[cid]].append((vehicle_id, start_id, dest_id, cid))
+        self.model.vehicle_occupancy[start_pos] += 1
+        self.num_active += 1
+
+    def skip_idle(self, k):
+        """El coordinador saltó k pasos ociosos: se avisa a las regiones con el próximo plan"""
+        self._idle += k
+
+    def step_reservation(self):
+        model = self.model
+        step = model.step_count
+        plans = self._call_all("plan", [(step, self._departed[r], self._spawns[r], self._idle)
+                                        for r in range(self.num_regions)])
+        self._idle = 0
+        self._spawns = [[] for _ in range(self.num_regions)]
+        self._departed = [[] for _ in range(self.num_regions)]
+
+        # Reenvío de reservas a la región dueña de cada celda destino
+        active = sum(p[0] for p in plans)
+        yields = sum(p[1] for p in plans)
+        requests = {name: np.concatenate([p[2][name] for p in plans]) for name in _REQUEST_FIELDS}
+        dest = self.owner[requests["target"]]
+        incoming = [{name: col[dest == r] for name, col in requests.items()} for r in range(self.num_regions)]
+        results = self._call_all("resolve", [(incoming[r],) for r in range(self.num_regions)])
+
+        moved = arrived = travel = 0
+        occ = model.vehicle_occupancy.reshape(-1)
+        for res in results:
+            moved += res["moved"]
+            arrived += res["arrived"]
+            travel += res["travel"]
+            cells, counts = res["parking"]
+            occ[cells] = counts
+        for res in results:
+            # El vehículo que cruzó sigue en su región de origen hasta el próximo plan
+            origins = res["accepted"]["origin"]
+            for vid, origin in zip(res["accepted"]["vehicle_id"].tolist(), origins.tolist()):
+                self._departed[self.owner[origin]].append(vid)
+            np.subtract.at(occ, origins, self._parking_mask()[origins])
+        model.vehicles_yielding += yields
+        model.vehicles_blocked += active - moved - yields
+        if arrived:
+            self.num_active -= arrived
+            model.record_arrivals(arrived, travel)
+            for res in results:
+                if res["trips"] is not None:
+                    model.record_trips(*res["trips"])
+
+    def _parking_mask(self):
+        mask = getattr(self, "_parking", None)
+        if mask is None:
+            mask = np.zeros(self.owner.size, dtype=np.int32)
+            for pos in self.model.parking_spots.values():
+                mask[self.cell_id(pos)] = 1
+            self._parking = mask
+        return mask
+
+    def positions(self):
+        parts = self._call_all("positions", [(self._departed[r],) for r in range(self.num_regions)])
+        self._departed = [[] for _ in range(self.num_regions)]
+        return np.concatenate(parts) if parts else np.zeros((0, 2), dtype=np.int64)
+
+    def sync_agents(self):
+        """
+        Refleja la flota de todas las regiones en la grilla del coordinador con
+        VehicleAgent espejo, como BatchVehicleEngine.sync_agents (solo para visualizar)
+        """
+        from agents import VehicleAgent
+        model, grid = self.model, self.model.grid
+        parts = self._call_all("mirror", [(self._departed[r],) for r in range(self.num_regions)])
+        self._departed = [[] for _ in range(self.num_regions)]
+        fleet = {vid: rest for part in parts for vid, *rest in part}
+        for vid in [vid for vid in self.agents if vid not in fleet]:
+            proxy = self.agents.pop(vid)
+            grid.remove_agent(proxy)
+            proxy.remove()
+        for vid, (key, cid, route) in fleet.items():
+            pos = self.cell_pos(cid)
+            proxy = self.agents.get(vid)
+            if proxy is None:
+                start_id, dest_id = key
+                proxy = VehicleAgent(f"Car_{vid}", model, model.parking_nodes[start_id],
+                                     model.parking_nodes[dest_id])
+                proxy.vehicle_id = vid
+                proxy.route_key = key
+                grid.place_agent(proxy, pos)
+                self.agents[vid] = proxy
+            elif proxy.pos != pos:
+                grid.move_agent(proxy, pos)
+            proxy.path = [self.cell_pos(c) for c in route.tolist()]
+        return list(self.agents.values())
+
+    def close(self):
+        for conn in self._conns:
+            try:
+                conn.send(("stop",))
+            except (BrokenPipeError, OSError):
+                pass
+        for proc in self._procs:
+            proc.join(timeout=5)
+        self._conns, self._procs = [], []
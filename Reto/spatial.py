@@ -0,0 +1,62 @@
+class GridNodeIndex:
+    """
+    Índice espacial de nodos del grafo sobre la grilla.
+    Cada nodo ocupa una celda entera, así que se indexa por celda y la búsqueda
+    del más cercano recorre anillos alrededor de la posición consultada.
+    """
+    def __init__(self, width, height, nodes=()):
+        self.width = width
+        self.height = height
+        self.cells = {}     # (x, y) -> orden de inserción (desempate igual que min())
+        for node in nodes:
+            self.add(node)
+
+    def copy(self):
+        """Índice independiente con los mismos nodos (sin volver a recorrer el grafo)"""
+        other = GridNodeIndex(self.width, self.height)
+        other.cells = dict(self.cells)
+        return other
+
+    def add(self, node):
+        if node not in self.cells:
+            self.cells[node] = len(self.cells)
+
+    def __len__(self):
+        return len(self.cells)
+
+    def nearest(self, pos):
+        """Nodo más cercano (distancia euclidiana) a pos, o None si el índice está vacío."""
+        if not self.cells:
+            return None
+        px, py = pos
+        if (px, py) in self.cells:
+            return (px, py)
+        best = None
+        best_key = None
+        max_radius = max(self.width, self.height)
+        r = 1
+        while r <= max_radius:
+            # Ningún nodo del anillo r puede estar a menos de r
+            if best_key is not None and r * r > best_key[0]:
+                break
+            for node in self._ring(px, py, r):
+                order = self.cells.get(node)
+                if order is None: continue
+                key = ((node[0] - px) ** 2 + (node[1] - py) ** 2, order)
+                if best_key is None or key < best_key:
+                    best, best_key = node, key
+            r += 1
+        return best
+
+    def _ring(self, px, py, r):
+        """Celdas del anillo de Chebyshev de radio r (solo dentro de la grilla)."""
+        x0, x1 = max(px - r, 0), min(px + r, self.width - 1)
+        y0, y1 = max(py - r, 0), min(py + r, self.height - 1)
+        if py - r >= 0:
+            for x in range(x0, x1 + 1): yield (x, py - r)
+        if py + r < self.height:
+            for x in range(x0, x1 + 1): yield (x, py + r)
+        if px - r >= 0:
+            for y in range(max(py - r + 1, 0), min(py + r - 1, self.height - 1) + 1): yield (px - r, y)
+        if px + r < self.width:
+            for y in range(max(py - r + 1, 0), min(py + r - 1, self.height - 1) + 1): yield (px + r, y)
@@ -0,0 +1,151 @@
+"""
+Estadísticas de viaje en memoria constante.
+
+Al llegar, cada vehículo se pliega en acumuladores por par origen-destino
+(ids de estacionamiento) y en uno global; no se guarda el historial por vehículo.
+    RunningStats  media y varianza con el algoritmo de Welford
+    P2Quantile    cuantil aproximado con el algoritmo P² (Jain y Chlamtac): 5 marcadores
+"""
+import math
+from bisect import bisect_right, insort
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+class RunningStats:
+    """Conteo, media y varianza muestral en una pasada (Welford)"""
+    __slots__ = ("n", "mean", "m2")
+
+    def __init__(self):
+        self.n = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+
+    def add(self, x):
+        self.n += 1
+        delta = x - self.mean
+        self.mean += delta / self.n
+        self.m2 += delta * (x - self.mean)
+
+    @property
+    def variance(self):
+        return self.m2 / (self.n - 1) if self.n > 1 else math.nan
+
+
+class P2Quantile:
+    """
+    Estimador P² del cuantil p: guarda 5 alturas de marcadores y sus posiciones y
+    las ajusta con interpolación parabólica a cada observación. Con 5 o menos
+    observaciones el valor es exacto.
+    """
+    __slots__ = ("p", "heights", "positions", "desired", "increments")
+
+    def __init__(self, p):
+        self.p = p
+        self.heights = []
+        self.positions = [1, 2, 3, 4, 5]
+        self.desired = [1.0, 1 + 2 * p, 1 + 4 * p, 3 + 2 * p, 5.0]
+        self.increments = (0.0, p / 2, p, (1 + p) / 2, 1.0)
+
+    def add(self, x):
+        q = self.heights
+        if len(q) < 5:
+            insort(q, x)
+            return
+        if x < q[0]:
+            q[0] = x
+            k = 0
+        elif x >= q[4]:
+            q[4] = x
+            k = 3
+        else:
+            k = bisect_right(q, x) - 1
+        n = self.positions
+        for i in range(k + 1, 5):
+            n[i] += 1
+        desired = self.desired
+        for i in range(5):
+            desired[i] += self.increments[i]
+        # Ajuste de los tres marcadores centrales
+        for i in (1, 2, 3):
+            d = desired[i] - n[i]
+            if (d >= 1 and n[i + 1] - n[i] > 1) or (d <= -1 and n[i - 1] - n[i] < -1):
+                d = 1 if d > 0 else -1
+                qp = q[i] + d / (n[i + 1] - n[i - 1]) * (
+                    (n[i] - n[i - 1] + d) * (q[i + 1] - q[i]) / (n[i + 1] - n[i])
+                    + (n[i + 1] - n[i] - d) * (q[i] - q[i - 1]) / (n[i] - n[i - 1]))
+                if not q[i - 1] < qp < q[i + 1]:
+                    # Fuera de orden: ajuste lineal hacia el vecino
+                    qp = q[i] + d * (q[i + d] - q[i]) / (n[i + d] - n[i])
+                q[i] = qp
+                n[i] += d
+
+    def value(self):
+        q = self.heights
+        if not q:
+            return math.nan
+        if len(q) < 5 or self.positions[4] == 5:
+            return float(q[min(int(self.p * len(q)), len(q) - 1)])
+        return float(q[2])
+
+
+class TripAccumulator:
+    """Acumuladores de un conjunto de viajes: tiempo de viaje, espera bloqueado y cediendo"""
+    __slots__ = ("travel", "blocked", "yielded", "quantiles")
+
+    def __init__(self, quantiles=QUANTILES):
+        self.travel = RunningStats()
+        self.blocked = RunningStats()
+        self.yielded = RunningStats()
+        self.quantiles = [P2Quantile(p) for p in quantiles]
+
+    def add(self, travel, blocked, yielded):
+        self.travel.add(travel)
+        self.blocked.add(blocked)
+        self.yielded.add(yielded)
+        for sketch in self.quantiles:
+            sketch.add(travel)
+
+    def summary(self):
+        row = {
+            "trips": self.travel.n,
+            "travel_mean": self.travel.mean,
+            "travel_std": math.sqrt(self.travel.variance) if self.travel.n > 1 else math.nan,
+        }
+        for sketch in self.quantiles:
+            row[f"travel_p{round(sketch.p * 100)}"] = sketch.value()
+        row["blocked_mean"] = self.blocked.mean
+        row["yield_mean"] = self.yielded.mean
+        return row
+
+
+class TripStats:
+    """Estadísticas de viajes terminados por (origen, destino) y para toda la flota"""
+    def __init__(self, quantiles=QUANTILES):
+        self.quantiles = tuple(quantiles)
+        self.total = TripAccumulator(self.quantiles)
+        self.pairs = {}   # (origen, destino) -> TripAccumulator
+
+    def add(self, origin, destination, travel, blocked, yielded):
+        acc = self.pairs.get((origin, destination))
+        if acc is None:
+            acc = self.pairs[(origin, destination)] = TripAccumulator(self.quantiles)
+        acc.add(travel, blocked, yielded)
+        self.total.add(travel, blocked, yielded)
+
+    def add_many(self, origins, destinations, travel, blocked, yielded):
+        """Varios viajes como secuencias alineadas (p. ej. arreglos del motor batch)"""
+        for row in zip(origins, destinations, travel, blocked, yielded):
+            self.add(*row)
+
+    def summary(self, origin=None, destination=None):
+        """Resumen de un par origen-destino, o de toda la flota sin argumentos"""
+        if origin is None and destination is None:
+            return self.total.summary()
+        acc = self.pairs.get((origin, destination))
+        return acc.summary() if acc is not None else TripAccumulator(self.quantiles).summary()
+
+    def get_pairs_dataframe(self):
+        import pandas as pd
+        rows = [{"origin": o, "destination": d, **acc.summary()} for (o, d), acc in sorted(self.pairs.items())]
+        return pd.DataFrame(rows).set_index(["origin", "destination"]) if rows else pd.DataFrame()
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Los módulos de Reto se importan planos (from model import TrafficModel)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,68 @@
+import pytest
+
+from demand import DemandModel
+from model import TrafficModel
+
+
+def test_checkpoint_round_trip_with_reroute(tmp_path):
+    model = TrafficModel(num_vehicles=400, seed=3, reroute=True)
+    for _ in range(150):
+        model.step()
+    path = model.save_checkpoint(tmp_path / "warm.ckpt")
+    restored = TrafficModel.from_checkpoint(path)
+    assert restored.router is not None
+    for _ in range(150):
+        model.step()
+        restored.step()
+    assert model.router.reroutes > 0
+    assert restored.router.reroutes == model.router.reroutes
+    assert restored.router.cache == model.router.cache
+    assert restored.datacollector.get_model_vars_dataframe().equals(model.datacollector.get_model_vars_dataframe())
+    assert sorted((v.vehicle_id, v.pos, tuple(v.path)) for v in restored.vehicles) == \
+        sorted((v.vehicle_id, v.pos, tuple(v.path)) for v in model.vehicles)
+
+
+def test_checkpoint_rejects_unpicklable_demand_profile(tmp_path):
+    ids = TrafficModel(num_vehicles=0).parking_ids
+    peak = 2.0
+    demand = DemandModel.uniform(ids, 0.5, profile=lambda t: peak if t % 200 < 50 else 1.0, max_factor=peak)
+    model = TrafficModel(num_vehicles=50, seed=1, demand=demand)
+    model.step()
+    with pytest.raises(ValueError, match="demand.profile"):
+        model.save_checkpoint(tmp_path / "peak.ckpt")
+
+
+@pytest.mark.parametrize("engine", ["agents", "batch"])
+def test_checkpoint_engine_override(tmp_path, engine):
+    model = TrafficModel(num_vehicles=100, seed=4, engine=engine)
+    for _ in range(40):
+        model.step()
+    path = model.save_checkpoint(tmp_path / "warm.ckpt")
+    restored = TrafficModel.from_checkpoint(path, engine=engine)
+    assert restored.engine_name == engine
+    assert sorted(map(tuple, restored.vehicle_positions().tolist())) == \
+        sorted(map(tuple, model.vehicle_positions().tolist()))
+    other = "batch" if engine == "agents" else "agents"
+    with pytest.raises(ValueError, match=f'engine="{other}"'):
+        TrafficModel.from_checkpoint(path, engine=other)
+
+
+@pytest.mark.parametrize("saved, restored", [(None, 10), (None, 200), (20, None), (20, 10)])
+def test_checkpoint_series_maxlen_override(tmp_path, saved, restored):
+    model = TrafficModel(num_vehicles=100, seed=4, series_maxlen=saved)
+    for _ in range(50):
+        model.step()
+    expected = model.datacollector.get_model_vars_dataframe()
+    path = model.save_checkpoint(tmp_path / "warm.ckpt")
+    branch = TrafficModel.from_checkpoint(path, series_maxlen=restored)
+    series = branch.datacollector
+    keep = slice(-restored if restored is not None else None, None)
+    assert series.maxlen == restored
+    assert series.get_model_vars_dataframe().equals(expected.iloc[keep])
+    # La serie copiada sigue creciendo (o rotando) en orden
+    for _ in range(15):
+        model.step()
+        branch.step()
+    n = min(len(series), len(model.datacollector))
+    assert series.get_model_vars_dataframe().iloc[-n:].equals(
+        model.datacollector.get_model_vars_dataframe().iloc[-n:])
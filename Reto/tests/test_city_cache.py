@@ -0,0 +1,46 @@
+import inspect
+import os
+
+import city_cache
+from model import TrafficModel
+
+
+def test_source_key_tracks_only_city_code(monkeypatch):
+    key = city_cache.source_key({"seed": 1})
+    assert city_cache.source_key({"seed": 1}) == key
+    assert city_cache.source_key({"seed": 2}) != key
+
+    original = inspect.getsource
+
+    def edited(names):
+        def getsource(obj):
+            text = original(obj)
+            return text + "# editado\n" if obj.__name__ in names else text
+        return getsource
+
+    # Editar la lógica de pasos no invalida la caché; editar el armado del mapa sí
+    assert "step" not in city_cache.MODEL_METHODS
+    monkeypatch.setattr(city_cache.inspect, "getsource", edited({"step", "_step_batch"}))
+    assert city_cache.source_key({"seed": 1}) == key
+    monkeypatch.setattr(city_cache.inspect, "getsource", edited({"build_city_graph"}))
+    assert city_cache.source_key({"seed": 1}) != key
+
+
+def test_generated_city_round_trip(tmp_path, monkeypatch):
+    monkeypatch.setattr(city_cache, "CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr(city_cache, "_memo", {})
+    params = dict(width=30, height=30, block_size=4, roundabouts=1, seed=3)
+    plan = city_cache.generated_city(**params)
+    (artifact,) = os.listdir(tmp_path)
+    fresh = TrafficModel(num_vehicles=0, city=city_cache.generate_city(**params))
+    cached = TrafficModel(num_vehicles=0, city=plan)
+    assert cached.city_layout == fresh.city_layout
+    assert cached.parking_spots == fresh.parking_spots
+    assert cached.route_table == fresh.route_table
+
+    # Otro proceso (memo vacío) reutiliza el artefacto sin recompilar
+    mtime = os.path.getmtime(tmp_path / artifact)
+    monkeypatch.setattr(city_cache, "_memo", {})
+    city_cache.generated_city(**params)
+    assert os.listdir(tmp_path) == [artifact]
+    assert os.path.getmtime(tmp_path / artifact) == mtime
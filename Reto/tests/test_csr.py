@@ -0,0 +1,67 @@
+import random
+
+import networkx as nx
+import pytest
+
+from city import generate_city
+from csr import CSRGraph, manhattan
+from model import TrafficModel
+
+
+def graphs():
+    yield "default", TrafficModel(num_vehicles=0).graph
+    yield "generated", generate_city(30, 30, block_size=4, roundabouts=1, seed=2).graph
+
+
+def pairs(graph, n, seed):
+    rng = random.Random(seed)
+    nodes = list(graph.nodes)
+    return [tuple(rng.sample(nodes, 2)) for _ in range(n)]
+
+
+@pytest.mark.parametrize("name, graph", list(graphs()))
+def test_to_networkx_keeps_edge_order(name, graph):
+    # Mismo orden de sucesores y de predecesores: de ahí salen los desempates
+    back = CSRGraph.from_networkx(graph.to_networkx(), graph.width, graph.height)
+    assert back.indices.tolist() == graph.indices.tolist()
+    assert back.rev_edges.tolist() == graph.rev_edges.tolist()
+
+
+@pytest.mark.parametrize("name, graph", list(graphs()))
+def test_shortest_path_matches_networkx(name, graph):
+    reference = graph.to_networkx()
+    for source, target in pairs(graph, 400, seed=1):
+        try:
+            expected = tuple(nx.shortest_path(reference, source, target, weight="weight"))
+        except nx.NetworkXNoPath:
+            expected = None
+        assert graph.shortest_path(source, target) == expected, (source, target)
+
+
+@pytest.mark.parametrize("name, graph", list(graphs()))
+def test_astar_matches_networkx_with_custom_costs(name, graph):
+    # Costos como los del router: peso + penalización en algunas celdas
+    rng = random.Random(3)
+    cost = [w + rng.choice((0, 0, 0, 0.5, 2.0)) for w in graph.weights.tolist()]
+    reference = graph.to_networkx()
+    for e, (u, v, _) in enumerate(graph.edges()):
+        reference[u][v]["cost"] = cost[e]
+    for source, target in pairs(graph, 400, seed=2):
+        try:
+            expected = nx.astar_path(reference, source, target, heuristic=manhattan, weight="cost")
+        except nx.NetworkXNoPath:
+            expected = None
+        assert graph.astar(source, target, weights=cost) == expected, (source, target)
+
+
+@pytest.mark.parametrize("name, graph", list(graphs()))
+def test_dijkstra_tree_matches_networkx(name, graph):
+    reference = graph.to_networkx()
+    for source, _ in pairs(graph, 20, seed=3):
+        dist, pred = graph.dijkstra(source)
+        expected = nx.single_source_dijkstra_path_length(reference, source, weight="weight")
+        got = {node: dist[graph.node(node)] for node in graph.nodes if dist[graph.node(node)] < float("inf")}
+        assert got == expected
+        for target in expected:
+            assert graph.path_from_tree(pred, source, target) == \
+                tuple(nx.dijkstra_path(reference, source, target, weight="weight"))
@@ -0,0 +1,102 @@
+import random
+from collections import Counter
+
+import pytest
+
+from demand import DemandModel, SpawnScheduler
+from model import TrafficModel
+
+
+# Series de referencia (semilla 11, 300 pasos): vehículos activos cada 25 pasos,
+# llegados y suma de Blocked / Yielding. Cambian solo si cambian las reglas del modelo
+EXPECTED = {
+    ("agents", None): ([17, 50, 55, 34, 18, 5, 2, 0, 0, 0, 0, 0], 60, 1645, 196),
+    ("agents", 0.4): ([0, 35, 47, 34, 16, 9, 1, 0, 0, 0, 0, 0], 60, 1490, 112),
+    ("batch", None): ([17, 50, 52, 35, 18, 8, 4, 1, 0, 0, 0, 0], 60, 1821, 135),
+    ("batch", 0.4): ([0, 36, 53, 33, 16, 9, 4, 2, 0, 0, 0, 0], 60, 1703, 75),
+}
+
+
+@pytest.mark.parametrize("engine, rate", list(EXPECTED))
+def test_same_seed_series_is_fixed(engine, rate):
+    ids = TrafficModel(num_vehicles=0).parking_ids
+    demand = None if rate is None else DemandModel.uniform(ids, rate)
+    model = TrafficModel(num_vehicles=60, engine=engine, seed=11, spawn_cooldown=12, demand=demand)
+    for _ in range(300):
+        model.step()
+    df = model.datacollector.get_model_vars_dataframe()
+    got = (df["Total_Vehicles"].iloc[::25].tolist(), model.vehicles_arrived,
+           int(df["Blocked"].sum()), int(df["Yielding"].sum()))
+    assert got == EXPECTED[(engine, rate)]
+
+
+def test_scheduler_matches_full_scan():
+    rng = random.Random(5)
+    ids = [3, 9, 1, 7, 4, 12, 8]
+    cooldown = 6
+    schedule = {pid: -cooldown for pid in ids}
+    scheduler = SpawnScheduler(ids, cooldown, schedule)
+    for step in range(400):
+        # Referencia: escaneo completo en orden de ids
+        expected = [pid for pid in ids if schedule[pid] + cooldown <= step]
+        assert scheduler.ready_spots(step) == expected
+        origins = set(rng.sample(ids, rng.randint(0, len(ids))))
+        assert scheduler.ready_spots(step, origins) == [pid for pid in expected if pid in origins]
+        assert scheduler.next_ready_step(step) == (step if expected else min(
+            schedule[pid] + cooldown for pid in ids))
+        for pid in expected:
+            if rng.random() < 0.3:
+                schedule[pid] = step
+                scheduler.release(pid, step)
+
+
+def test_demand_queues_trips_per_origin():
+    od = {(1, 2): 0.2, (1, 3): 0.6, (2, 1): 0.1, (3, 3): 5.0, (4, 1): 0.0}
+    demand = DemandModel(od)
+    rng = random.Random(2)
+    # Sin spawns los viajes se acumulan en su origen (el primer poll fija el origen del tiempo)
+    demand.poll(0, rng)
+    demand.poll(2000, rng)
+    assert set(demand.pending) == {1, 2}   # tasas nulas y viajes a sí mismo no cuentan
+    assert demand.waiting_origins() == {1, 2}
+    assert len(demand.pending[1]) == pytest.approx(0.8 * 2000, rel=0.1)
+    assert len(demand.pending[2]) == pytest.approx(0.1 * 2000, rel=0.25)
+    dests = Counter(demand.pending[1])
+    assert set(dests) == {2, 3}
+    assert dests[3] / len(demand.pending[1]) == pytest.approx(0.75, abs=0.05)
+    assert set(demand.pending[2]) == {1}
+
+    # pop_trip saca en orden de llegada y vacía waiting_origins al agotarse
+    queued = list(demand.pending[2])
+    assert [demand.pop_trip(2) for _ in queued] == queued
+    assert not demand.has_trip(2)
+    assert demand.waiting_origins() == {1}
+
+
+def test_demand_thinning_follows_profile():
+    rng = random.Random(7)
+    # La tasa se duplica en la mitad de cada ciclo de 100 pasos
+    demand = DemandModel({(1, 2): 0.5}, profile=lambda t: 2.0 if t % 100 < 50 else 1.0, max_factor=2.0)
+    demand.poll(0, rng)
+    arrivals = Counter()
+    for step in range(1, 20001):
+        before = len(demand.pending[1])
+        demand.poll(step, rng)
+        arrivals[(step - 1) % 100 < 50] += len(demand.pending[1]) - before
+    assert arrivals[True] == pytest.approx(1.0 * 10000, rel=0.05)
+    assert arrivals[False] == pytest.approx(0.5 * 10000, rel=0.05)
+
+
+def test_demand_state_survives_checkpoint(tmp_path):
+    ids = TrafficModel(num_vehicles=0).parking_ids
+    model = TrafficModel(num_vehicles=200, seed=9, demand=DemandModel.uniform(ids, 1.5))
+    for _ in range(60):
+        model.step()
+    assert model.demand.waiting_origins()
+    restored = TrafficModel.from_checkpoint(model.save_checkpoint(tmp_path / "demand.ckpt"))
+    assert restored.demand.pending == model.demand.pending
+    assert restored.demand.waiting_origins() == model.demand.waiting_origins()
+    for _ in range(100):
+        model.step()
+        restored.step()
+    assert restored.datacollector.get_model_vars_dataframe().equals(model.datacollector.get_model_vars_dataframe())
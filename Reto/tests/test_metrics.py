@@ -0,0 +1,58 @@
+import os
+
+import numpy as np
+import pytest
+
+from metrics import FORMATS, TABLES, MetricsStream, read_table
+from model import TrafficModel
+
+STEPS = 900
+
+
+def run(path, format, fast):
+    # Pocos vehículos: tramos ociosos largos que run_until salta (record_idle en bloques de 16)
+    model = TrafficModel(num_vehicles=12, seed=3, metrics=MetricsStream(str(path), format, batch_steps=16))
+    if fast:
+        model.run_until(STEPS)
+    else:
+        for _ in range(STEPS):
+            model.step()
+    model.close_metrics()
+    return model
+
+
+@pytest.mark.parametrize("format", FORMATS)
+def test_metrics_run_until_matches_stepping(tmp_path, format):
+    fast_model = run(tmp_path / "fast", format, True)
+    slow_model = run(tmp_path / "slow", format, False)
+    assert fast_model.vehicles_arrived == slow_model.vehicles_arrived == 12
+
+    for name in TABLES:
+        fast = read_table(str(tmp_path / "fast"), name)
+        slow = read_table(str(tmp_path / "slow"), name)
+        assert list(fast) == list(TABLES[name])
+        for col in TABLES[name]:
+            assert np.array_equal(fast[col], slow[col]), (name, col)
+        if format != "npz":
+            # Texto: los archivos son idénticos byte a byte
+            with open(tmp_path / "fast" / f"{name}.{format}", "rb") as f1, \
+                    open(tmp_path / "slow" / f"{name}.{format}", "rb") as f2:
+                assert f1.read() == f2.read(), name
+
+    steps = read_table(str(tmp_path / "fast"), "steps")
+    assert steps["step"].tolist() == list(range(1, STEPS + 1))
+    assert steps["arrived"][-1] == 12 and steps["spawned"][-1] == 12
+    lights = read_table(str(tmp_path / "fast"), "lights")
+    assert lights["step"].size == STEPS * len(fast_model.traffic_lights)
+    trips = read_table(str(tmp_path / "fast"), "trips")
+    assert sorted(trips["vehicle_id"].tolist()) == list(range(12))
+    assert np.array_equal(trips["travel_time"], trips["arrival_step"] - trips["spawn_step"])
+    parking = read_table(str(tmp_path / "fast"), "parking")
+    assert parking["departures"].sum() == parking["arrivals"].sum() == 12
+
+
+def test_read_table_without_rows(tmp_path):
+    stream = MetricsStream(str(tmp_path), "npz")
+    stream.close()
+    assert all(col.size == 0 for col in read_table(str(tmp_path), "trips").values())
+    assert not os.listdir(tmp_path)
@@ -0,0 +1,24 @@
+import pytest
+
+from model import TrafficModel
+
+
+@pytest.mark.parametrize("engine", ["agents", "batch"])
+def test_profiler_timeline_maxlen_and_agent_types(engine):
+    model = TrafficModel(num_vehicles=50, engine=engine, seed=1, profile=True, profile_maxlen=5)
+    for _ in range(20):
+        model.step()
+    profiler = model.profiler
+    assert profiler.steps == 20
+    assert [entry["step"] for entry in profiler.timeline] == list(range(15, 20))
+    agents = profiler.summary()["agents"]
+    assert agents["TrafficManagerAgent"]["calls"] == 20 * len(model.managers)
+    if engine == "agents":
+        assert agents["VehicleAgent"]["calls"] > 0
+
+
+def test_profiler_timeline_unbounded_by_default():
+    model = TrafficModel(num_vehicles=5, seed=1, profile=True)
+    for _ in range(30):
+        model.step()
+    assert len(model.profiler.timeline) == 30
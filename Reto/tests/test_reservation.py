@@ -0,0 +1,90 @@
+import numpy as np
+import pytest
+
+from agents import VehicleAgent
+from model import TrafficModel
+
+# Mapa por defecto: (12, 0) y (12, 1) llegan ambas a (11, 0); tres entradas de la
+# rotonda central, cada una hacia una celda distinta del anillo
+CONTESTED = ((12, 0), (12, 1)), (11, 0)
+ENTRIES = [((7, 11), (8, 11)), ((11, 13), (11, 12)), ((13, 8), (12, 8))]
+
+
+def place(model, vehicle_id, cell, path):
+    """Vehículo del modo "agents" en cell con la ruta restante path"""
+    vehicle = VehicleAgent(f"Car_{vehicle_id}", model, cell, path[-1] if path else cell)
+    vehicle.vehicle_id = vehicle_id
+    vehicle.route_key = (1, 2)
+    vehicle.path = list(path)
+    model.grid.place_agent(vehicle, cell)
+    model._enter_cell(cell)
+    model._register_vehicle(vehicle)
+    model.vehicles_active += 1
+    return vehicle
+
+
+def route(model, cell, length=3):
+    """cell seguida de length - 1 sucesores (para que el vehículo no llegue en un paso)"""
+    path = [cell]
+    while len(path) < length:
+        path.append(model.graph.successors(path[-1])[0])
+    return path
+
+
+@pytest.mark.parametrize("ids", [(4, 9), (9, 4)])
+def test_lowest_vehicle_id_wins_contested_cell(ids):
+    model = TrafficModel(num_vehicles=0, update="reservation", seed=1)
+    sources, target = CONTESTED
+    vehicles = [place(model, vid, cell, route(model, target)) for vid, cell in zip(ids, sources)]
+    model.step()
+    assert not model.red_cells[target]
+    winner = min(vehicles, key=lambda v: v.vehicle_id)
+    loser = max(vehicles, key=lambda v: v.vehicle_id)
+    assert winner.pos == target
+    assert loser.pos in sources and loser.blocked_steps == 1
+    assert model.vehicles_blocked == 1
+
+
+def test_lowest_priority_wins_in_reservation_rules():
+    model = TrafficModel(num_vehicles=0, engine="batch", update="reservation")
+    rules = model.engine.rules
+    sources, target = CONTESTED
+    cur = np.array([rules.cell_id(c) for c in sources], dtype=np.int64)
+    nxt = np.full(2, rules.cell_id(target), dtype=np.int64)
+    occ = np.zeros(model.grid.width * model.grid.height, dtype=np.int32)
+    occ[cur] = 1
+    red = np.zeros(occ.size, dtype=bool)
+    for priority, expected in (([7, 3], [1]), ([3, 7], [0])):
+        movers, yielding = rules.resolve(cur, nxt, np.array(priority), occ, red, capacity=4)
+        assert movers.tolist() == expected
+        assert not yielding.any()
+
+
+@pytest.mark.parametrize("capacity", [1, 2])
+def test_roundabout_capacity_in_priority_order(capacity):
+    ids = [5, 1, 3]
+    model = TrafficModel(num_vehicles=0, update="reservation", roundabout_capacity=capacity, seed=1)
+    vehicles = [place(model, vid, entry, route(model, ring)) for vid, (entry, ring) in zip(ids, ENTRIES)]
+    model.step()
+    inside = sorted(v.vehicle_id for v in vehicles if v.pos in model.roundabout_ring)
+    assert inside == sorted(ids)[:capacity]
+
+    # Mismas reglas en lote (BatchVehicleEngine y regiones)
+    batch = TrafficModel(num_vehicles=0, engine="batch", update="reservation")
+    rules = batch.engine.rules
+    cur = np.array([rules.cell_id(e) for e, _ in ENTRIES], dtype=np.int64)
+    nxt = np.array([rules.cell_id(r) for _, r in ENTRIES], dtype=np.int64)
+    occ = np.zeros(batch.grid.width * batch.grid.height, dtype=np.int32)
+    occ[cur] = 1
+    red = np.zeros(occ.size, dtype=bool)
+    movers, _ = rules.resolve(cur, nxt, np.array(ids), occ, red, capacity)
+    assert sorted(ids[i] for i in movers.tolist()) == sorted(ids)[:capacity]
+
+
+def test_reserve_without_path_arrives():
+    model = TrafficModel(num_vehicles=0, update="reservation", seed=1)
+    vehicle = place(model, 0, (12, 0), [])
+    model.step()
+    assert vehicle.state == "ARRIVED"
+    assert model.vehicles_arrived == 1
+    assert not model.vehicles
@@ -0,0 +1,52 @@
+import pytest
+
+from demand import DemandModel
+from model import TrafficModel
+
+
+def run(engine, steps, fast, **params):
+    """Series y posiciones finales tras steps pasos con run_until (fast) o step() uno a uno"""
+    ids = TrafficModel(num_vehicles=0).parking_ids
+    # Demanda baja: tramos ociosos entre viajes que run_until salta
+    model = TrafficModel(engine=engine, demand=DemandModel.uniform(ids, 0.02), **params)
+    try:
+        if fast:
+            model.run_until(steps)
+        else:
+            for _ in range(steps):
+                model.step()
+        positions = sorted(map(tuple, model.vehicle_positions().tolist()))
+        return model.datacollector.get_model_vars_dataframe(), positions
+    finally:
+        model.close()
+
+
+@pytest.mark.parametrize("engine", ["agents", "batch", "sharded"])
+def test_run_until_matches_stepping(engine):
+    fast_series, fast_positions = run(engine, 600, True, num_vehicles=100, seed=2)
+    series, positions = run(engine, 600, False, num_vehicles=100, seed=2)
+    assert series["Arrived"].iloc[-1] > 0
+    assert fast_series.equals(series)
+    assert fast_positions == positions
+
+
+def test_sharded_requires_reservation():
+    with pytest.raises(ValueError, match="reservation"):
+        TrafficModel(num_vehicles=0, engine="sharded", update="sequential")
+
+
+def test_sharded_sync_agents_mirrors_fleet():
+    sharded = TrafficModel(num_vehicles=200, engine="sharded", seed=6)
+    batch = TrafficModel(num_vehicles=200, engine="batch", update="reservation", seed=6)
+    try:
+        for _ in range(80):
+            sharded.step()
+            batch.step()
+        sharded.sync_vehicle_agents()
+        batch.sync_vehicle_agents()
+        assert sharded.vehicles
+        mirror = lambda model: sorted((v.vehicle_id, v.pos, tuple(v.path)) for v in model.vehicles)
+        assert mirror(sharded) == mirror(batch)
+        assert all(v in sharded.grid.get_cell_list_contents([v.pos]) for v in sharded.vehicles)
+    finally:
+        sharded.close()
@@ -0,0 +1,76 @@
+import math
+import random
+
+import numpy as np
+import pytest
+
+from model import TrafficModel
+from stats import P2Quantile, RunningStats, TripStats
+
+
+@pytest.mark.parametrize("seed", [0, 1])
+def test_running_stats_matches_numpy(seed):
+    rng = np.random.default_rng(seed)
+    values = rng.gamma(2.0, 30.0, size=5000) + 1e6   # desplazadas: Welford no pierde precisión
+    stats = RunningStats()
+    for x in values:
+        stats.add(x)
+    assert stats.n == values.size
+    assert stats.mean == pytest.approx(values.mean(), rel=1e-12)
+    assert stats.variance == pytest.approx(np.var(values, ddof=1), rel=1e-9)
+    assert math.isnan(RunningStats().variance)
+
+
+@pytest.mark.parametrize("p", [0.5, 0.95, 0.99])
+def test_p2_quantile_close_to_numpy(p):
+    rng = np.random.default_rng(4)
+    values = rng.lognormal(4.0, 0.5, size=20000)
+    sketch = P2Quantile(p)
+    for x in values:
+        sketch.add(x)
+    assert sketch.value() == pytest.approx(np.quantile(values, p), rel=0.02)
+
+
+def test_p2_quantile_exact_with_few_values():
+    sketch = P2Quantile(0.5)
+    for x in (7, 1, 5):
+        sketch.add(x)
+    assert sketch.value() == 5.0
+    assert math.isnan(P2Quantile(0.5).value())
+
+
+def test_trip_stats_per_pair_and_total():
+    rng = random.Random(2)
+    trips = [(rng.choice((1, 2)), rng.choice((3, 4)), rng.randint(10, 90), rng.randint(0, 9), rng.randint(0, 3))
+             for _ in range(500)]
+    stats = TripStats()
+    stats.add_many(*zip(*trips))
+    total = stats.summary()
+    assert total["trips"] == 500
+    assert total["travel_mean"] == pytest.approx(np.mean([t[2] for t in trips]))
+    assert total["travel_std"] == pytest.approx(np.std([t[2] for t in trips], ddof=1))
+    assert total["blocked_mean"] == pytest.approx(np.mean([t[3] for t in trips]))
+    for pair in {(t[0], t[1]) for t in trips}:
+        rows = [t for t in trips if (t[0], t[1]) == pair]
+        assert stats.summary(*pair)["trips"] == len(rows)
+        assert stats.summary(*pair)["yield_mean"] == pytest.approx(np.mean([t[4] for t in rows]))
+    assert stats.summary(9, 9)["trips"] == 0
+    assert len(stats.get_pairs_dataframe()) == 4
+
+
+@pytest.mark.parametrize("engine, update", [("agents", "sequential"), ("batch", "sequential"),
+                                            ("agents", "reservation"), ("batch", "reservation")])
+def test_vehicle_waits_add_up_to_step_totals(engine, update):
+    model = TrafficModel(num_vehicles=80, engine=engine, update=update, seed=6, spawn_cooldown=5)
+    while model.vehicles_arrived < model.num_vehicles:
+        model.step()
+        assert model.step_count < 3000
+    summary = model.trip_stats.summary()
+    df = model.datacollector.get_model_vars_dataframe()
+    # collect() guarda los contadores del paso anterior: falta el último paso
+    blocked = df["Blocked"].sum() + model.vehicles_blocked
+    yielded = df["Yielding"].sum() + model.vehicles_yielding
+    assert summary["trips"] == 80
+    assert summary["blocked_mean"] * 80 == pytest.approx(blocked)
+    assert summary["yield_mean"] * 80 == pytest.approx(yielded)
+    assert blocked > 0
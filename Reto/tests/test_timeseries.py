@@ -0,0 +1,75 @@
+import numpy as np
+import pytest
+
+from timeseries import TimeSeriesCollector
+
+
+class Counter:
+    """Modelo mínimo: step_count y dos contadores"""
+    def __init__(self):
+        self.step_count = 0
+        self.a = 0
+        self.b = 0
+
+    def advance(self):
+        self.step_count += 1
+        self.a += 1
+        self.b = self.step_count % 7
+
+
+def collect_steps(series, model, n):
+    for _ in range(n):
+        series.collect(model)
+        model.advance()
+
+
+def test_grows_past_initial_capacity():
+    series = TimeSeriesCollector({"A": "a", "B": "b"}, capacity=4)
+    model = Counter()
+    collect_steps(series, model, 11)
+    df = series.get_model_vars_dataframe()
+    assert len(series) == 11
+    assert df.index.tolist() == list(range(11))
+    assert df["A"].tolist() == list(range(11))
+    assert df["B"].tolist() == [s % 7 for s in range(11)]
+
+
+def test_collect_many_grows_from_partial_buffer():
+    # Crecer con el buffer a medio llenar no debe perder filas
+    series = TimeSeriesCollector({"A": "a"}, capacity=4)
+    model = Counter()
+    collect_steps(series, model, 3)
+    series.collect_many(model, 10)
+    assert len(series) == 13
+    assert series.column("A").tolist() == [0, 1, 2] + [3] * 10
+    assert series.get_model_vars_dataframe().index.tolist() == list(range(13))
+
+
+@pytest.mark.parametrize("maxlen", [5, 8])
+def test_maxlen_wraps_in_chronological_order(maxlen):
+    series = TimeSeriesCollector({"A": "a", "B": "b"}, maxlen=maxlen)
+    model = Counter()
+    collect_steps(series, model, 23)
+    df = series.get_model_vars_dataframe()
+    assert len(series) == maxlen
+    assert df.index.tolist() == list(range(23 - maxlen, 23))
+    assert df["A"].tolist() == list(range(23 - maxlen, 23))
+    assert series.latest() == {"A": 22, "B": 22 % 7}
+
+
+@pytest.mark.parametrize("maxlen, before, n", [(None, 3, 10), (None, 0, 2000), (6, 4, 3), (6, 4, 20), (6, 9, 1)])
+def test_collect_many_matches_repeated_collect(maxlen, before, n):
+    fast = TimeSeriesCollector({"A": "a", "B": "b"}, capacity=4, maxlen=maxlen)
+    slow = TimeSeriesCollector({"A": "a", "B": "b"}, capacity=4, maxlen=maxlen)
+    model = Counter()
+    for series in (fast, slow):
+        model.__init__()
+        collect_steps(series, model, before)
+    fast.collect_many(model, n)
+    # collect_many no avanza el modelo: collect() n veces con los mismos contadores
+    for _ in range(n):
+        slow.collect(model)
+        model.step_count += 1
+    assert len(fast) == len(slow)
+    assert fast.get_model_vars_dataframe().equals(slow.get_model_vars_dataframe())
+    assert np.array_equal(fast.column("A"), slow.column("A"))
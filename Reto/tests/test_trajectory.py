@@ -0,0 +1,48 @@
+import numpy as np
+import pytest
+
+from model import TrafficModel
+from trajectory import LIGHT_CODES, TrajectoryReader
+
+
+def light_codes(model):
+    return [LIGHT_CODES[light.state] for light in model.traffic_lights]
+
+
+@pytest.mark.parametrize("engine", ["agents", "batch"])
+def test_recording_round_trip(tmp_path, engine):
+    # 300 pasos: un bloque de 256 escrito en record() y el resto en close_recording()
+    model = TrafficModel(num_vehicles=150, engine=engine, seed=4, record=str(tmp_path))
+    expected = [(model.vehicle_positions().copy(), light_codes(model))]
+    for _ in range(300):
+        model.step()
+        expected.append((model.vehicle_positions().copy(), light_codes(model)))
+    model.close_recording()
+
+    reader = TrajectoryReader(str(tmp_path))
+    assert len(reader) == len(expected) == 301
+    assert reader.light_positions == [light.pos for light in model.traffic_lights]
+    for i, (positions, lights) in enumerate(expected):
+        got_positions, got_lights = reader.frame(i)
+        assert np.array_equal(got_positions, positions), i
+        assert got_lights.tolist() == lights, i
+    with pytest.raises(IndexError):
+        reader.frame(len(expected))
+
+
+def test_recording_run_until_matches_stepping(tmp_path):
+    readers = []
+    for name, fast in (("fast", True), ("slow", False)):
+        model = TrafficModel(num_vehicles=10, seed=2, record=str(tmp_path / name))
+        if fast:
+            model.run_until(700)
+        else:
+            for _ in range(700):
+                model.step()
+        model.close_recording()
+        readers.append(TrajectoryReader(str(tmp_path / name)))
+    fast, slow = readers
+    assert len(fast) == len(slow) == 701
+    assert np.array_equal(fast.offsets, slow.offsets)
+    assert np.array_equal(fast.cells, slow.cells)
+    assert np.array_equal(fast.lights, slow.lights)
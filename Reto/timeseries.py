@@ -0,0 +1,104 @@
+import numpy as np
+
+
+class TimeSeriesCollector:
+    """
+    Reemplazo de mesa.DataCollector para series por paso del modelo.
+
+    model_reporters: {columna: nombre del atributo del modelo}; collect() solo lee
+    esos atributos (contadores que el modelo mantiene al día), así que cuesta O(1).
+    Los valores van a arreglos NumPy preasignados de tipo dtype que crecen al doble
+    cuando se llenan; con maxlen se vuelven un buffer circular que guarda solo
+    los últimos maxlen pasos.
+    """
+    def __init__(self, model_reporters, dtype=np.int64, capacity=1024, maxlen=None):
+        self.model_reporters = dict(model_reporters)
+        self.columns = list(self.model_reporters)
+        self.maxlen = maxlen
+        size = maxlen if maxlen is not None else capacity
+        self.steps = np.zeros(size, dtype=np.int64)
+        self.data = np.zeros((size, len(self.columns)), dtype=dtype)
+        self.total = 0   # filas recolectadas desde el inicio (incluye las descartadas)
+
+    def __len__(self):
+        return min(self.total, self.data.shape[0]) if self.maxlen is not None else self.total
+
+    def collect(self, model):
+        row = self.total
+        if self.maxlen is not None:
+            row %= self.maxlen
+        elif row == self.data.shape[0]:
+            self._grow()
+        self.steps[row] = model.step_count
+        for j, attr in enumerate(self.model_reporters.values()):
+            self.data[row, j] = getattr(model, attr)
+        self.total += 1
+
+    def collect_many(self, model, n):
+        """
+        Equivale a n llamadas a collect() en los pasos step_count .. step_count + n - 1
+        con los mismos valores (para avanzar rápido por tramos sin eventos).
+        """
+        if n <= 0:
+            return
+        values = [getattr(model, attr) for attr in self.model_reporters.values()]
+        rows = self.total + np.arange(n)
+        steps = model.step_count + np.arange(n)
+        if self.maxlen is not None:
+            # Solo sobreviven las últimas maxlen filas
+            keep = slice(max(n - self.maxlen, 0), n)
+            rows, steps = rows[keep] % self.maxlen, steps[keep]
+        else:
+            while self.total + n > self.data.shape[0]:
+                self._grow()
+        self.steps[rows] = steps
+        self.data[rows] = values
+        self.total += n
+
+    def resized(self, maxlen):
+        """
+        Copia con otro maxlen (None: sin límite) y las mismas filas en orden; si
+        maxlen es menor que las filas guardadas quedan los últimos maxlen pasos
+        """
+        order = self._order()
+        if maxlen is not None:
+            order = order[max(order.size - maxlen, 0):]
+        n = order.size
+        series = TimeSeriesCollector(self.model_reporters, dtype=self.data.dtype,
+                                     capacity=max(n, 1024), maxlen=maxlen)
+        series.steps[:n] = self.steps[order]
+        series.data[:n] = self.data[order]
+        series.total = n
+        return series
+
+    def _grow(self):
+        old = self.data.shape[0]
+        data = np.zeros((2 * old, self.data.shape[1]), dtype=self.data.dtype)
+        data[:old] = self.data
+        steps = np.zeros(2 * old, dtype=np.int64)
+        steps[:old] = self.steps
+        self.data, self.steps = data, steps
+
+    def _order(self):
+        """Índices de las filas guardadas en orden cronológico"""
+        n = len(self)
+        if self.maxlen is None or self.total <= self.maxlen:
+            return np.arange(n)
+        return (np.arange(n) + self.total) % self.maxlen
+
+    def column(self, name):
+        """Serie de una columna (copia, en orden cronológico)"""
+        return self.data[self._order(), self.columns.index(name)]
+
+    def latest(self):
+        """Última fila como dict, o None si aún no se recolecta nada"""
+        if self.total == 0:
+            return None
+        row = (self.total - 1) % self.data.shape[0] if self.maxlen is not None else self.total - 1
+        return dict(zip(self.columns, self.data[row].tolist()))
+
+    def get_model_vars_dataframe(self):
+        import pandas as pd
+        order = self._order()
+        return pd.DataFrame(self.data[order], columns=self.columns,
+                            index=pd.Index(self.steps[order], name="Step"))
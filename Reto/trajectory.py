@@ -0,0 +1,123 @@
+"""
+Grabación compacta de trayectorias para reproducirlas sin volver a simular.
+
+Una grabación es un directorio con archivos binarios columnares (little-endian)
+que se leen con np.memmap:
+
+    offsets.bin  int64  (pasos + 1)        inicio de cada paso en cells.bin
+    cells.bin    int32  (total vehículos)  id de celda plano x * height + y
+    lights.bin   uint8  (pasos, semáforos) código de estado (LIGHT_CODES)
+    meta.json    tamaño de la grilla, posiciones de semáforos y pasos grabados
+
+El cuadro i es el estado después de i pasos (el 0 es el estado inicial).
+"""
+import json
+import os
+
+import numpy as np
+
+FORMAT_VERSION = 1
+LIGHT_CODES = {"GREEN": 0, "YELLOW": 1, "RED": 2}
+
+
+class TrajectoryRecorder:
+    """Acumula cuadros en memoria y los agrega a disco en bloques de chunk_steps"""
+    def __init__(self, path, width, height, light_positions, chunk_steps=256):
+        self.path = path
+        self.width = width
+        self.height = height
+        self.light_positions = [tuple(int(v) for v in p) for p in light_positions]
+        self.chunk_steps = chunk_steps
+        self.num_steps = 0
+        self.total_cells = 0
+        os.makedirs(path, exist_ok=True)
+        self._files = {name: open(os.path.join(path, f"{name}.bin"), "wb")
+                       for name in ("offsets", "cells", "lights")}
+        self._files["offsets"].write(np.zeros(1, dtype="<i8").tobytes())
+        self._reset_buffers()
+
+    def _reset_buffers(self):
+        self._offsets = []
+        self._cells = []
+        self._lights = []
+
+    @classmethod
+    def for_model(cls, model, path, chunk_steps=256):
+        return cls(path, model.grid.width, model.grid.height,
+                   [light.pos for light in model.traffic_lights], chunk_steps)
+
+    def record_model(self, model):
+        """Graba el estado actual de model como el siguiente cuadro"""
+        positions = model.vehicle_positions()
+        lights = [LIGHT_CODES.get(light.state, LIGHT_CODES["RED"]) for light in model.traffic_lights]
+        self.record(positions[:, 0] * self.height + positions[:, 1], lights)
+
+    def record(self, cells, lights):
+        cells = np.asarray(cells, dtype="<i4")
+        self.total_cells += cells.size
+        self._offsets.append(self.total_cells)
+        self._cells.append(cells)
+        self._lights.append(np.asarray(lights, dtype=np.uint8))
+        self.num_steps += 1
+        if len(self._offsets) >= self.chunk_steps:
+            self.flush()
+
+    def flush(self):
+        """Escribe el bloque pendiente y actualiza meta.json (la grabación queda legible)"""
+        if self._offsets:
+            self._files["offsets"].write(np.array(self._offsets, dtype="<i8").tobytes())
+            self._files["cells"].write(np.concatenate(self._cells).astype("<i4", copy=False).tobytes())
+            self._files["lights"].write(np.stack(self._lights).tobytes())
+            self._reset_buffers()
+        for f in self._files.values():
+            f.flush()
+        meta = {
+            "version": FORMAT_VERSION,
+            "width": self.width,
+            "height": self.height,
+            "light_positions": self.light_positions,
+            "num_steps": self.num_steps,
+        }
+        tmp = os.path.join(self.path, "meta.json.tmp")
+        with open(tmp, "w") as f:
+            json.dump(meta, f)
+        os.replace(tmp, os.path.join(self.path, "meta.json"))
+
+    def close(self):
+        self.flush()
+        for f in self._files.values():
+            f.close()
+
+
+class TrajectoryReader:
+    """Acceso aleatorio a una grabación vía memmap; frame(i) no lee los pasos anteriores"""
+    def __init__(self, path):
+        with open(os.path.join(path, "meta.json")) as f:
+            meta = json.load(f)
+        if meta["version"] != FORMAT_VERSION:
+            raise ValueError(f"{path}: versión {meta['version']}, se esperaba {FORMAT_VERSION}")
+        self.path = path
+        self.width = meta["width"]
+        self.height = meta["height"]
+        self.light_positions = [tuple(p) for p in meta["light_positions"]]
+        self.num_steps = meta["num_steps"]
+        n_lights = len(self.light_positions)
+        self.offsets = self._map("offsets", "<i8", (self.num_steps + 1,))
+        self.cells = self._map("cells", "<i4", (int(self.offsets[-1]),))
+        self.lights = self._map("lights", np.uint8, (self.num_steps, n_lights))
+
+    def _map(self, name, dtype, shape):
+        if 0 in shape:
+            return np.zeros(shape, dtype=dtype)
+        return np.memmap(os.path.join(self.path, f"{name}.bin"), dtype=dtype, mode="r", shape=shape)
+
+    def __len__(self):
+        return self.num_steps
+
+    def frame(self, i):
+        """(posiciones (N, 2), códigos de semáforo) del cuadro i, como CityRenderer.snapshot"""
+        if not 0 <= i < self.num_steps:
+            raise IndexError(f"cuadro {i} fuera de rango (0..{self.num_steps - 1})")
+        cells = np.asarray(self.cells[self.offsets[i]:self.offsets[i + 1]], dtype=np.int64)
+        positions = np.column_stack((cells // self.height, cells % self.height))
+        return positions, np.array(self.lights[i], dtype=np.int8)
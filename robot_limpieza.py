@@ -0,0 +1,209 @@
+"""
+Modelo de Robot de Limpieza Reactivo
+Simulación de agentes (robots) que limpian una habitación con celdas sucias
+
+Versión importable del modelo de Robot_Limpieza_Mesa.ipynb:
+
+    from robot_limpieza import CleaningModel
+    modelo = CleaningModel(num_agentes=5, width=10, height=10, porcentaje_sucias=0.4, seed=42)
+    modelo.run_model()
+
+El estado de la habitación vive en un arreglo booleano de NumPy (sucias[x, y]) y el
+modelo lleva un contador de celdas sucias que actualizan limpiar / ensuciar, así que
+ningún paso recorre las W·H celdas. Los vecinos de Moore se calculan al moverse en
+lugar de construir una grilla de objetos Cell, lo que permite habitaciones de
+1000x1000 con miles de robots.
+"""
+
+import mesa
+import numpy as np
+
+# Desplazamientos de Moore en el mismo orden que OrthogonalMooreGrid (mismo sorteo)
+MOORE_OFFSETS = (
+    (-1, -1), (-1, 0), (-1, 1),
+    (0, -1),           (0, 1),
+    (1, -1), (1, 0), (1, 1),
+)
+
+
+class RobotLimpieza(mesa.Agent):
+    """
+    Un agente robot que limpia celdas sucias o se mueve aleatoriamente.
+    """
+    def __init__(self, model, pos):
+        """
+        Inicializa un robot de limpieza.
+
+        Args:
+            model: Instancia del modelo
+            pos: Tupla (x, y) donde inicia el robot
+        """
+        super().__init__(model)
+        self.pos = pos
+        self.movimientos = 0
+
+    def limpiar_celda_actual(self):
+        """
+        Limpia la celda actual si está sucia.
+
+        Returns:
+            True si limpió, False si ya estaba limpia
+        """
+        return self.model.limpiar(self.pos)
+
+    def vecinos(self):
+        """Celdas vecinas (8 vecinos - Moore) dentro de la habitación."""
+        x, y = self.pos
+        width, height = self.model.width, self.model.height
+        return [(x + dx, y + dy) for dx, dy in MOORE_OFFSETS
+                if 0 <= x + dx < width and 0 <= y + dy < height]
+
+    def mover(self):
+        """
+        Mueve el robot a una celda vecina aleatoria (8 vecinos - Moore).
+        """
+        vecinos = self.vecinos()
+
+        if vecinos:
+            self.pos = self.random.choice(vecinos)
+            self.movimientos += 1
+            self.model.movimientos_totales += 1
+
+    def step(self):
+        """
+        Ejecuta un paso del robot:
+        1. Si la celda está sucia -> limpia
+        2. Si la celda está limpia -> se mueve
+        """
+        if self.model.sucias[self.pos]:
+            self.limpiar_celda_actual()
+        else:
+            self.mover()
+
+
+def obtener_celdas_sucias(model):
+    """Cuenta cuántas celdas están sucias (contador del modelo, O(1))."""
+    return model.num_sucias
+
+
+def calcular_porcentaje_limpio(model):
+    """Calcula el porcentaje de celdas limpias."""
+    total_celdas = model.width * model.height
+    celdas_limpias = total_celdas - model.num_sucias
+    return (celdas_limpias / total_celdas) * 100
+
+
+def contar_movimientos_totales(model):
+    """Suma todos los movimientos de todos los robots (contador del modelo, O(1))."""
+    return model.movimientos_totales
+
+
+class CleaningModel(mesa.Model):
+    """Modelo de limpieza con robots reactivos."""
+
+    def __init__(self, num_agentes=5, width=10, height=10,
+                 porcentaje_sucias=0.3, max_steps=1000, seed=None, agent_reporters=True):
+        """
+        Args:
+            num_agentes: Número de robots (todos inician en [0, 0])
+            width, height: Tamaño de la habitación
+            porcentaje_sucias: Fracción de celdas inicialmente sucias
+            max_steps: Máximo de pasos de simulación
+            seed: Semilla para reproducibilidad
+            agent_reporters: Si es False no se guardan los movimientos por robot en
+                cada paso (con miles de robots es la parte más pesada del DataCollector)
+        """
+        super().__init__(seed=seed)
+
+        self.num_agentes = num_agentes
+        self.width = width
+        self.height = height
+        self.max_steps = max_steps
+        self.terminado = False
+
+        # Estado de las celdas: True = sucia; num_sucias se mantiene en limpiar / ensuciar
+        self.sucias = np.zeros((width, height), dtype=bool)
+        self.num_sucias = 0
+        self.movimientos_totales = 0
+
+        # Ensuciar aleatoriamente (mismo sorteo que sobre la lista de posiciones x-major)
+        total_celdas = width * height
+        num_sucias = int(total_celdas * porcentaje_sucias)
+        indices = self.random.sample(range(total_celdas), num_sucias)
+        self.sucias.reshape(-1)[indices] = True
+        self.num_sucias = num_sucias
+
+        # Crear robots en posición inicial [0, 0]
+        RobotLimpieza.create_agents(self, self.num_agentes, [(0, 0)] * self.num_agentes)
+
+        # DataCollector
+        self.datacollector = mesa.DataCollector(
+            model_reporters={
+                "Celdas Sucias": obtener_celdas_sucias,
+                "Porcentaje Limpio": calcular_porcentaje_limpio,
+                "Movimientos Totales": contar_movimientos_totales
+            },
+            agent_reporters={"Movimientos": "movimientos"} if agent_reporters else None
+        )
+
+        self.datacollector.collect(self)
+
+    def limpiar(self, pos):
+        """
+        Limpia la celda pos.
+
+        Returns:
+            True si estaba sucia, False si ya estaba limpia
+        """
+        if not self.sucias[pos]:
+            return False
+        self.sucias[pos] = False
+        self.num_sucias -= 1
+        return True
+
+    def ensuciar(self, pos):
+        """
+        Ensucia la celda pos.
+
+        Returns:
+            True si estaba limpia, False si ya estaba sucia
+        """
+        if self.sucias[pos]:
+            return False
+        self.sucias[pos] = True
+        self.num_sucias += 1
+        return True
+
+    def step(self):
+        """Ejecuta un paso del modelo (mesa incrementa self.steps antes de llamarlo)."""
+        self.agents.shuffle_do("step")
+        self.datacollector.collect(self)
+
+        if self.num_sucias == 0:
+            self.terminado = True
+            print(f"¡Todas las celdas limpias en {self.steps} pasos!")
+
+        if self.steps >= self.max_steps:
+            self.terminado = True
+            print(f"Máximo de pasos alcanzado ({self.max_steps})")
+
+    def run_model(self, max_steps=None):
+        """Ejecuta el modelo hasta terminar."""
+        if max_steps is None:
+            max_steps = self.max_steps
+
+        for i in range(max_steps):
+            if self.terminado:
+                break
+            self.step()
+
+
+if __name__ == "__main__":
+    modelo = CleaningModel(num_agentes=5, width=10, height=10,
+                           porcentaje_sucias=0.4, max_steps=500, seed=42)
+    modelo.run_model()
+
+    print(f"\nPasos usados: {modelo.steps}")
+    print(f"Celdas sucias finales: {obtener_celdas_sucias(modelo)}")
+    print(f"% Limpio: {calcular_porcentaje_limpio(modelo):.2f}%")
+    print(f"Movimientos totales: {contar_movimientos_totales(modelo)}")
@@ -0,0 +1,40 @@
+import pytest
+
+from robot_limpieza import CleaningModel
+
+
+def test_contador_coincide_con_la_habitacion():
+    modelo = CleaningModel(num_agentes=20, width=30, height=20, porcentaje_sucias=0.5, seed=3)
+    assert modelo.num_sucias == modelo.sucias.sum() == 300
+    for paso in range(200):
+        modelo.step()
+        if paso % 7 == 0:
+            # ensuciar sobre una celda ya sucia no debe contar dos veces
+            modelo.ensuciar((paso % 30, paso % 20))
+            modelo.ensuciar((paso % 30, paso % 20))
+        assert modelo.num_sucias == modelo.sucias.sum()
+    assert modelo.movimientos_totales == sum(r.movimientos for r in modelo.agents)
+    df = modelo.datacollector.get_model_vars_dataframe()
+    assert len(df) == modelo.steps + 1
+    assert df["Celdas Sucias"].iloc[-1] == modelo.sucias.sum()
+
+
+@pytest.mark.parametrize("max_steps", [1, 25])
+def test_corrida_se_detiene_en_max_steps(max_steps):
+    # Un robot no alcanza a limpiar 400 celdas: termina por max_steps
+    modelo = CleaningModel(num_agentes=1, width=20, height=20, porcentaje_sucias=0.9,
+                           max_steps=max_steps, seed=1)
+    modelo.run_model(max_steps=max_steps + 50)
+    assert modelo.terminado
+    assert modelo.steps == max_steps
+    assert modelo.num_sucias > 0
+
+
+def test_corrida_se_detiene_al_limpiar_todo():
+    modelo = CleaningModel(num_agentes=10, width=5, height=5, porcentaje_sucias=0.4,
+                           max_steps=10000, seed=42)
+    modelo.run_model()
+    assert modelo.terminado
+    assert modelo.num_sucias == modelo.sucias.sum() == 0
+    assert modelo.steps < 10000
+    assert modelo.datacollector.get_model_vars_dataframe()["Porcentaje Limpio"].iloc[-1] == 100